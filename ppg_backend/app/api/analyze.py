@@ -1,11 +1,15 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+import inspect
 import tempfile
 import os
+import time
 from fastapi.logger import logger
-from typing import Callable, Any, Optional
-from app.schemas.task import TaskCreateResponse, TaskStatusResponse, TaskStatus
-from app.services.utils import get_max_file_size
-from app.services.exceptions import AIServiceError, DBServiceError
+from typing import AsyncIterator, Callable, Any, Optional
+from app.schemas.task import TaskCreateResponse, TaskStatusResponse, TaskStatus, TaskInput
+from app.services.utils import get_max_file_size, get_config_option
+from app.services.exceptions import AIServiceError, DBServiceError, QueueFullError
+from app.services.cache_service import hash_bytes
 
 
 MAX_FILE_SIZE = get_max_file_size()
@@ -26,10 +30,36 @@ def get_create_task_fn() -> Callable[..., Any]:
 
 
 def get_enqueue_fn() -> Callable[..., Any]:
+    """FastAPI dependency returning the enqueue function of the configured task backend.
+
+    With ``task_backend: "postgres"`` uploads go to the shared `tasks` table
+    (claimed by any worker node) instead of the in-process queue.
+    """
+    from app.services.task.pg_task_store import task_backend
+    if task_backend() == "postgres":
+        from app.services.task.task_service import get_default_store
+        return get_default_store().enqueue
     from app.services.queue_service import enqueue
     return enqueue
 
 
+def get_admission_fn() -> Callable[..., Any]:
+    """FastAPI dependency returning the queue admission check of the configured task backend.
+
+    The returned callable is `check_admission(content_hash, client_id)` (or,
+    with ``task_backend: "postgres"``, the coroutine function
+    `check_shared_admission(content_hash, client_id)`) and raises
+    `QueueFullError` when the analysis queue, or the caller's share of it,
+    is full.
+    """
+    from app.services.task.pg_task_store import task_backend
+    if task_backend() == "postgres":
+        from app.services.queue_service import check_shared_admission
+        return check_shared_admission
+    from app.services.queue_service import check_admission
+    return check_admission
+
+
 def get_run_task_fn() -> Callable[..., Any]:
     from app.services.queue_service import run_analysis_task
     return run_analysis_task
@@ -40,6 +70,61 @@ def get_task_fn() -> Callable[..., Any]:
     return get_task
 
 
+def get_wait_fn() -> Callable[..., Any]:
+    """FastAPI dependency returning ``wait_for_task_update(task_id, seen, timeout)``.
+
+    It returns as soon as the task store replaces or removes the task, so
+    long-polls and event streams are woken by status changes, not timers.
+    """
+    from app.services.task.task_service import wait_for_task_update
+    return wait_for_task_update
+
+
+_FINAL_STATUSES = (TaskStatus.completed, TaskStatus.failed)
+
+
+def get_save_result_fn() -> Callable[..., Any]:
+    from app.services.task.task_service import save_task_result
+    return save_task_result
+
+
+def get_result_cache_fn() -> Any:
+    """FastAPI dependency returning the content-addressed result cache."""
+    from app.services.cache_service import get_result_cache
+    return get_result_cache()
+
+
+def client_id_for(request: Request) -> str:
+    """Identify the caller for fair-share scheduling: API key if sent, else client IP.
+
+    API keys are hashed so they never reach logs or metrics.
+    """
+    api_key = request.headers.get("X-API-Key")
+    if api_key:
+        return "key:" + hash_bytes(api_key.encode())[:16]
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+def effective_priority(client_id: str, priority: int) -> int:
+    """Return `priority` for clients listed in `queue_priority_clients`, 0 for everyone else.
+
+    Priority levels are served strictly before lower ones, so an
+    unauthenticated caller must not be able to jump the fair-share queue.
+    """
+    if priority and client_id in (get_config_option("queue_priority_clients", []) or []):
+        return priority
+    return 0
+
+
+def queue_full_response(e: QueueFullError) -> HTTPException:
+    logger.warning("Rejecting upload: analysis queue full (retry after %ds)", e.retry_after)
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy. Please retry later.",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
 def validate_image_file(file: UploadFile, contents: bytes) -> None:
     """Validate uploaded file is an image and under the size limit.
 
@@ -62,24 +147,57 @@ def validate_image_file(file: UploadFile, contents: bytes) -> None:
         202: {"description": "Task created."},
         400: {"description": "Invalid file type."},
         413: {"description": "File too large."},
-        500: {"description": "Internal server error."}
+        500: {"description": "Internal server error."},
+        503: {"description": "Analysis queue full; retry after the `Retry-After` seconds."}
     }
 )
 async def analyze_image(
+    request: Request,
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    priority: int = Query(
+        0, ge=0, le=9,
+        description="Scheduling priority; higher is served first. Ignored unless the caller is listed in `queue_priority_clients`.",
+    ),
     create_task_fn: Callable[..., Any] = Depends(get_create_task_fn),
     enqueue_fn: Callable[..., Any] = Depends(get_enqueue_fn),
     run_task_fn: Callable[..., Any] = Depends(get_run_task_fn),
+    save_result_fn: Callable[..., Any] = Depends(get_save_result_fn),
+    result_cache: Any = Depends(get_result_cache_fn),
+    admission_fn: Callable[..., Any] = Depends(get_admission_fn),
 ) -> TaskCreateResponse:
     """Accept an image upload, create a task id and schedule analysis.
 
-    The uploaded bytes are written to a temporary file path which is passed to
-    the queue/workers to avoid keeping large blobs in memory.
+    The upload is hashed first; when the result for identical bytes is cached
+    the task is completed immediately without enqueueing. Otherwise the
+    queue admission check runs before any task or temp file is created, and
+    a full queue is answered with 503 and `Retry-After`. Admitted uploads are
+    written to a temporary file path which is passed to the queue/workers to
+    avoid keeping large blobs in memory. The caller's identity, `priority`
+    (honored only for trusted clients, see `effective_priority`) and the
+    upload size travel with the task for the fair-share scheduler.
     """
     contents = await file.read()
     validate_image_file(file, contents)
-    task_id = await create_task_fn({"filename": file.filename, "content_type": file.content_type})
+    content_hash = hash_bytes(contents)
+    input_meta = {"filename": file.filename, "content_type": file.content_type, "content_hash": content_hash}
+
+    cached = await result_cache.get(content_hash)
+    if cached is not None:
+        task_id = await create_task_fn(input_meta)
+        await save_result_fn(task_id, cached)
+        logger.info("Result cache hit for task %s", task_id)
+        return TaskCreateResponse(taskId=task_id)
+
+    client_id = client_id_for(request)
+    try:
+        admitted = admission_fn(content_hash, client_id)
+        if inspect.isawaitable(admitted):
+            await admitted
+    except QueueFullError as e:
+        raise queue_full_response(e)
+
+    task_id = await create_task_fn(input_meta)
 
     tmp_path: Optional[str] = None
     suffix = os.path.splitext(file.filename)[-1] if file.filename else None
@@ -89,17 +207,32 @@ async def analyze_image(
             tmp.flush()
             tmp_path = tmp.name
 
-        # enqueue a small tuple (tmp_path, original filename, content_type)
+        # enqueue a small tuple (tmp_path, original filename, content_type, content_hash, scheduling fields)
+        task_input = TaskInput(
+            tmp_path, file.filename, file.content_type, content_hash,
+            client_id=client_id, priority=effective_priority(client_id, priority), size=len(contents),
+        )
         try:
-            await enqueue_fn(task_id, (tmp_path, file.filename, file.content_type))
+            await enqueue_fn(task_id, task_input)
+        except QueueFullError:
+            # the queue filled up since the admission check
+            await save_result_fn(task_id, None, error="queue full")
+            raise
         except (AIServiceError, DBServiceError) as e:
             logger.warning("Enqueue failed due to domain error, falling back to background task: %s", str(e))
-            background_tasks.add_task(run_task_fn, task_id, (tmp_path, file.filename, file.content_type))
+            background_tasks.add_task(run_task_fn, task_id, task_input)
         except Exception as e:
             logger.exception("Unexpected error while enqueueing task %s : %s", task_id, str(e))
             # Fallback to background task execution; the background task will
             # be responsible for cleaning up the temp file when done.
-            background_tasks.add_task(run_task_fn, task_id, (tmp_path, file.filename, file.content_type))
+            background_tasks.add_task(run_task_fn, task_id, task_input)
+    except QueueFullError as e:
+        if tmp_path and os.path.exists(tmp_path):
+            try:
+                os.unlink(tmp_path)
+            except Exception as cleanup_error:
+                logger.warning("Failed to remove temp file after queue rejection: %s : %s", tmp_path, str(cleanup_error))
+        raise queue_full_response(e)
     except Exception as e:
         logger.exception("Unexpected error while processing file %s : %s", file.filename, str(e))
         # cleanup on failure
@@ -124,16 +257,32 @@ async def analyze_image(
 )
 async def get_task_status(
         task_id: str,
-        get_task_fn: Callable[..., Any] = Depends(get_task_fn)
+        wait: float = Query(0, ge=0, description="Long-poll: seconds to wait for the task to finish (capped by task_wait_max_seconds)."),
+        get_task_fn: Callable[..., Any] = Depends(get_task_fn),
+        wait_fn: Callable[..., Any] = Depends(get_wait_fn),
     ) -> TaskStatusResponse:
     """Get task status using an injectable get_task function (overridable in tests).
 
     The default dependency imports `get_task` from `app.services.task.task_service`.
+    With ``?wait=<seconds>`` the response is held until the task completes or
+    fails, or the wait elapses, whichever comes first.
     """
     task = await get_task_fn(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found.")
+    if wait > 0:
+        deadline = time.monotonic() + min(wait, float(get_config_option("task_wait_max_seconds", 30)))
+        while task and task.get("status") not in _FINAL_STATUSES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            task = await wait_fn(task_id, task, remaining)
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found.")
+    return _status_response(task)
+
 
+def _status_response(task: Any) -> TaskStatusResponse:
     # Coerce stored status to TaskStatus enum if needed
     stored_status = task.get("status")
     try:
@@ -148,3 +297,56 @@ async def get_task_status(
     elif status_enum == TaskStatus.failed:
         resp.detail = task.get("detail")
     return resp
+
+
+@router.get(
+    "/task/{task_id}/events",
+    summary="Stream analysis task status as Server-Sent Events",
+    response_class=StreamingResponse,
+    responses={
+        200: {"description": "`text/event-stream` of `status` events; closes once the task completes or fails."},
+        404: {"description": "Task not found."}
+    }
+)
+async def task_events(
+        task_id: str,
+        request: Request,
+        get_task_fn: Callable[..., Any] = Depends(get_task_fn),
+        wait_fn: Callable[..., Any] = Depends(get_wait_fn),
+    ) -> StreamingResponse:
+    """Stream the task's status: one `status` event now and one per status change.
+
+    Each event's data is the `TaskStatusResponse` JSON of `GET /api/task/{task_id}`.
+    The stream ends after the completed/failed event; an `error` event is
+    sent if the task disappears. Idle streams get a comment line every
+    `task_events_heartbeat_seconds` so proxies keep them open.
+    """
+    task = await get_task_fn(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found.")
+    heartbeat = max(1.0, float(get_config_option("task_events_heartbeat_seconds", 15)))
+    return StreamingResponse(
+        _status_events(task_id, task, request, wait_fn, heartbeat),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _status_events(task_id: str, task: Any, request: Request, wait_fn: Callable[..., Any], heartbeat: float) -> AsyncIterator[str]:
+    sent = None
+    while True:
+        if not task:
+            yield 'event: error\ndata: {"detail": "Task not found."}\n\n'
+            return
+        status = task.get("status")
+        if status != sent:
+            sent = status
+            yield f"event: status\ndata: {_status_response(task).model_dump_json()}\n\n"
+            if status in _FINAL_STATUSES:
+                return
+        seen = task
+        task = await wait_fn(task_id, seen, heartbeat)
+        if task is seen or task == seen:  # nothing changed within the heartbeat interval
+            if await request.is_disconnected():
+                return
+            yield ": keep-alive\n\n"
@@ -0,0 +1,33 @@
+from fastapi import APIRouter
+
+router = APIRouter(
+    prefix="/api"
+)
+
+
+@router.get("/metrics", summary="Runtime metrics", status_code=200)
+async def metrics():
+    """Returns in-process counters for monitoring (cache, queue, workers)."""
+    from app.services.cache_service import get_result_cache
+    from app.services.queue_service import get_inflight_registry, get_default_queue_manager
+    from app.services.poison_matcher import get_poison_matcher
+    from app.services.db_service import db_stats
+    from app.services.queue_service import search_batching_enabled, get_search_batcher
+    from app.services.queue_service import pipeline_enabled, get_analysis_pipeline
+    from app.services.worker_service import get_worker_supervisor
+    from app.services.stage_meter import stage_meters
+    from app.services.task.task_service import get_default_store
+    supervisor = get_worker_supervisor()
+    store = get_default_store()
+    return {
+        "queue": get_default_queue_manager().stats(),
+        "tasks": store.stats() if hasattr(store, "stats") else None,
+        "workers": supervisor.stats() if supervisor is not None else None,
+        "stages": {name: meter.stats() for name, meter in stage_meters().items()},
+        "result_cache": get_result_cache().stats(),
+        "single_flight": get_inflight_registry().stats(),
+        "poison_matcher": get_poison_matcher().stats(),
+        "db": db_stats(),
+        "search_batcher": get_search_batcher().stats() if search_batching_enabled() else None,
+        "pipeline": get_analysis_pipeline().stats() if pipeline_enabled() else None,
+    }
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, String, Integer, JSON, Text, ARRAY
+from sqlalchemy import Column, String, Integer, JSON, Text, ARRAY, Boolean, DateTime, LargeBinary, func
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
 from pgvector.sqlalchemy import Vector
 from sqlalchemy.orm import declarative_base
 Base = declarative_base()
@@ -21,19 +23,34 @@ class PetPoison(Base):
     poison_description = Column(Text)
     desktop_thumb = Column(Text)
 
-# TODO : Migrate from in-memory task management to DB-backed task management
-# # Task model for async analysis jobs
-# from sqlalchemy import DateTime, func
-# from sqlalchemy.dialects.postgresql import UUID
-# import uuid
+class RecipePoison(Base):
+    # first matching poison per recipe, materialized by ppg_database/load_tables.py
+    __tablename__ = 'recipe_poisons'
+    recipe_id = Column(String, primary_key=True)
+    poison_id = Column(Integer, nullable=False)
 
-# class Task(Base):
-#     __tablename__ = 'tasks'
-#     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-#     status = Column(String, nullable=False, default='pending')
-#     input_meta = Column(JSON)
-#     result = Column(JSON, nullable=True)
-#     retries = Column(Integer, default=0)
-#     last_error = Column(Text, nullable=True)
-#     created_at = Column(DateTime(timezone=True), server_default=func.now())
-#     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+class VectorMeta(Base):
+    # how each vector table was loaded, recorded by ppg_database/load_tables.py
+    __tablename__ = 'vector_meta'
+    table_name = Column(Text, primary_key=True)
+    normalized = Column(Boolean, nullable=False)
+    dim = Column(Integer)
+
+# Durable task store/queue used with task_backend "postgres"
+# (see app/services/task/pg_task_store.py and ppg_database/10_create_tables.sql)
+class Task(Base):
+    __tablename__ = 'tasks'
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    status = Column(String, nullable=False, default='pending')
+    input_meta = Column(JSON)
+    # uploaded image while the task is queued; cleared once it finishes
+    input_blob = Column(LargeBinary, nullable=True)
+    priority = Column(Integer, nullable=False, default=0)
+    result = Column(JSON, nullable=True)
+    detail = Column(Text, nullable=True)
+    retries = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    claimed_by = Column(Text, nullable=True)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
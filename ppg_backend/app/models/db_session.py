@@ -1,4 +1,6 @@
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy import event
+from pgvector.asyncpg import register_vector
 import os
 
 DB_USER = os.getenv('POSTGRES_USER', 'postgres')
@@ -13,6 +15,16 @@ engine = create_async_engine(
     DATABASE_URL, 
     echo=False
     )
+
+
+# Register the pgvector binary codecs on every asyncpg connection so numpy
+# embeddings are sent as a binary buffer (see db_service.VectorParam) instead
+# of a Python list rendered as a text literal.
+@event.listens_for(engine.sync_engine, "connect")
+def _register_vector_codec(dbapi_connection, connection_record):
+    dbapi_connection.run_async(register_vector)
+
+
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
     expire_on_commit=False,
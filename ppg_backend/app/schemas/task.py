@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from enum import Enum
-from typing import Any, Optional
+from typing import Any, NamedTuple, Optional
 
 class TaskStatus(str, Enum):
     pending = "pending"
@@ -15,3 +15,26 @@ class TaskStatusResponse(BaseModel):
     status: TaskStatus
     data: Optional[Any] = None
     detail: Optional[str] = None
+
+
+class TaskInput(NamedTuple):
+    """Queue payload for one upload.
+
+    It is a tuple, so code that unpacks the legacy
+    ``(tmp_path, filename, content_type)`` triple via ``file_tuple[:3]`` keeps
+    working. Optional fields are read with ``getattr`` so plain tuples are
+    still accepted.
+
+    `client_id`, `priority` and `size` (upload bytes) are only read by the
+    fair-share scheduler (`app.services.scheduler`). `claimed_by` is the DB
+    worker that claimed the task from the shared `tasks` table; its final
+    writes only apply while it still holds the claim.
+    """
+    tmp_path: str
+    filename: Optional[str]
+    content_type: Optional[str]
+    content_hash: Optional[str] = None
+    client_id: Optional[str] = None
+    priority: int = 0
+    size: int = 0
+    claimed_by: Optional[str] = None
@@ -1,9 +1,13 @@
 import time
 import asyncio
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
 from types import SimpleNamespace
 
-from .utils import load_config_as_namespace
+from .utils import load_config_as_namespace, get_config_option
+from .batch_service import MicroBatcher
+from .process_executor import ProcessInferenceExecutor
+from .preprocess import get_preprocessor
 
 import numpy as np
 import torch
@@ -12,15 +16,17 @@ from torch import nn
 from fastapi.logger import logger
 from .exceptions import AIServiceError
 
-from PIL import Image, UnidentifiedImageError
-import torchvision.transforms as transforms
-
 from .encoders.trijoint import im2recipe
 
 # Module-level state
 model: Optional[nn.Module] = None
 device: Optional[torch.device] = None
 _opts: Optional[SimpleNamespace] = None
+_embedding_batcher: Optional[MicroBatcher] = None
+_process_executor: Optional[ProcessInferenceExecutor] = None
+# thread pools of the staged pipeline: image decoding and model forwards
+_decode_executor: Optional[ThreadPoolExecutor] = None
+_model_executor: Optional[ThreadPoolExecutor] = None
 
 
 def _get_opts(config_path: Optional[str] = None) -> SimpleNamespace:
@@ -112,44 +118,219 @@ def image_to_embedding(image_path: str) -> np.ndarray:
     Raises AIServiceError for any domain-specific problems so callers can
     uniformly handle AI failures.
     """
-    normalize = transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-    transform = transforms.Compose([
-        transforms.Resize(256),
-        transforms.CenterCrop(224),
-        transforms.ToTensor(),
-        normalize,
-    ])
+    img_tensor = load_image_tensor(image_path)
+    return embed_batch(img_tensor.unsqueeze(0))[0]
+
+
+def load_image_tensor(image_path: str) -> torch.Tensor:
+    """Decode an image file and return the normalized (3, 224, 224) input tensor.
+
+    Uses the shared :class:`~app.services.preprocess.ImagePreprocessor`, which
+    decodes JPEGs at reduced size and rejects oversized images up front.
+
+    Raises:
+        AIServiceError: when the file is missing, too large or cannot be decoded.
+    """
     logger.info("Loading and transforming image: %s", image_path)
     t0 = time.time()
-    try:
-        img = Image.open(image_path).convert("RGB")
-    except FileNotFoundError as e:
-        logger.error("Image file not found: %s", image_path)
-        raise AIServiceError(f"Image file not found: {image_path}") from e
-    except UnidentifiedImageError as e:
-        logger.error("Cannot identify image file: %s", image_path)
-        raise AIServiceError(f"Cannot identify image file: {image_path}") from e
-    except Exception as e:
-        logger.exception("Unexpected error opening image %s", image_path)
-        raise AIServiceError(str(e)) from e
+    img_tensor = get_preprocessor().load(image_path)
+    logger.info("Image loaded and transformed. (elapsed: %.2fs)", time.time() - t0)
+    return img_tensor
+
 
-    img_tensor = transform(img)
-    if not isinstance(img_tensor, torch.Tensor):
-        raise AIServiceError("Transform did not return a tensor")
+def embed_batch(img_batch: torch.Tensor) -> np.ndarray:
+    """Run the vision encoder on a (B, 3, 224, 224) batch.
+
+    Returns:
+        A (B, embDim) numpy array, one L2-normalized embedding per input row.
 
+    Raises:
+        AIServiceError: when the model is not loaded or the forward pass fails.
+    """
     if device is None or model is None:
         raise AIServiceError("Model is not loaded. Call load_model() before inference.")
 
-    img_tensor = img_tensor.unsqueeze(0).to(device)
-    logger.info("Image loaded and transformed. (elapsed: %.2fs)", time.time() - t0)
-    logger.info("Running model to extract vision embedding only...")
+    logger.info("Running model to extract vision embedding only... (batch=%d)", img_batch.shape[0])
     t0 = time.time()
     try:
         with torch.no_grad():
-            visual_emb = model(img_tensor)
+            visual_emb = model(img_batch.to(device))
     except Exception as e:
         logger.exception("Model inference failed: %s", e)
         raise AIServiceError(str(e)) from e
 
     logger.info("Vision embedding extracted. (elapsed: %.2fs)", time.time() - t0)
-    return visual_emb.cpu().numpy()[0]
+    return visual_emb.cpu().numpy()
+
+
+async def _embed_tensors(tensors: List[torch.Tensor]) -> List[np.ndarray]:
+    """Stack tensors from several callers and embed them in one forward pass on the model pool."""
+    loop = asyncio.get_running_loop()
+    embs = await loop.run_in_executor(_stage_executor("infer"), embed_batch, torch.stack(tensors))
+    return list(embs)
+
+
+async def _embed_paths_in_process(paths: List[str]) -> List[Any]:
+    """Decode and embed a batch of image files inside one inference process.
+
+    An image that cannot be decoded yields its `AIServiceError` in place of
+    an embedding, so the micro-batcher fails only that caller.
+    """
+    return await get_process_executor().embed_paths(paths)
+
+
+def inference_mode() -> str:
+    """Return the configured `inference_mode`: ``"thread"`` (default) or ``"process"``."""
+    mode = str(get_config_option("inference_mode", "thread"))
+    if mode not in ("thread", "process"):
+        logger.warning("Unknown inference_mode %r; falling back to 'thread'", mode)
+        return "thread"
+    return mode
+
+
+def get_embedding_batcher() -> MicroBatcher:
+    """Return the process-wide micro-batcher for image embeddings.
+
+    The batch size and wait are read from `inference_batch_size` and
+    `inference_batch_wait_ms` in the config file. In ``"process"`` mode the
+    batcher collects file paths, so decoding also happens in the workers;
+    otherwise it collects preprocessed tensors.
+    """
+    global _embedding_batcher
+    if _embedding_batcher is None:
+        run_batch = _embed_paths_in_process if inference_mode() == "process" else _embed_tensors
+        _embedding_batcher = MicroBatcher(
+            run_batch,
+            max_batch_size=int(get_config_option("inference_batch_size", 1)),
+            max_wait_ms=float(get_config_option("inference_batch_wait_ms", 5.0)),
+            name="embedding",
+        )
+    return _embedding_batcher
+
+
+def batching_enabled() -> bool:
+    """True when the config asks for inference batches larger than one."""
+    return int(get_config_option("inference_batch_size", 1)) > 1
+
+
+def get_process_executor() -> ProcessInferenceExecutor:
+    """Return the process-pool executor, raising if it was not started.
+
+    Raises:
+        AIServiceError: when `start_process_executor` has not been called.
+    """
+    if _process_executor is None:
+        raise AIServiceError("Process inference executor is not started")
+    return _process_executor
+
+
+def start_process_executor(config_path: Optional[str] = None) -> ProcessInferenceExecutor:
+    """Spawn the inference worker processes configured by `inference_processes`.
+
+    Each worker loads its own model, so the API process does not need to call
+    :func:`load_model` in ``"process"`` mode.
+    """
+    global _process_executor
+    if _process_executor is None:
+        _process_executor = ProcessInferenceExecutor(
+            num_workers=int(get_config_option("inference_processes", 2)),
+            torch_threads=int(get_config_option("inference_torch_threads", 1)),
+            max_batch_size=max(1, int(get_config_option("inference_batch_size", 1))),
+            emb_dim=int(get_config_option("embDim", 1024)),
+            config_path=config_path,
+        )
+        _process_executor.start()
+    return _process_executor
+
+
+def shutdown_process_executor() -> None:
+    """Stop the inference worker processes, if any."""
+    global _process_executor
+    if _process_executor is not None:
+        _process_executor.shutdown()
+        _process_executor = None
+
+
+async def embed_image(image_path: str) -> np.ndarray:
+    """Embed one image through the configured batching / executor mode.
+
+    - ``"process"`` mode: decode and forward run in a worker process.
+    - batching enabled: tensors (or paths) from concurrent callers share one
+      forward pass via the micro-batcher.
+
+    Raises:
+        AIServiceError: on decode or inference failure.
+    """
+    if batching_enabled():
+        if inference_mode() == "process":
+            return await get_embedding_batcher().submit(image_path)
+        loop = asyncio.get_running_loop()
+        img_tensor = await loop.run_in_executor(None, load_image_tensor, image_path)
+        return await get_embedding_batcher().submit(img_tensor)
+    if inference_mode() == "process":
+        return await get_process_executor().embed_path(image_path)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, image_to_embedding, image_path)
+
+
+def _stage_executor(kind: str) -> ThreadPoolExecutor:
+    global _decode_executor, _model_executor
+    if kind == "decode":
+        if _decode_executor is None:
+            _decode_executor = ThreadPoolExecutor(
+                max_workers=max(1, int(get_config_option("pipeline_decode_concurrency", 2))),
+                thread_name_prefix="ppg-decode",
+            )
+        return _decode_executor
+    if _model_executor is None:
+        _model_executor = ThreadPoolExecutor(
+            max_workers=max(1, int(get_config_option("pipeline_infer_concurrency", 1))),
+            thread_name_prefix="ppg-infer",
+        )
+    return _model_executor
+
+
+async def decode_image(image_path: str) -> Any:
+    """Decode stage: turn an image file into model input on the decode pool.
+
+    In ``"process"`` mode the inference workers decode, so the path is
+    passed through unchanged.
+
+    Raises:
+        AIServiceError: when the file cannot be decoded.
+    """
+    if inference_mode() == "process":
+        return image_path
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_stage_executor("decode"), load_image_tensor, image_path)
+
+
+async def embed_decoded_batch(decoded: List[Any]) -> List[Any]:
+    """Inference stage: embed several outputs of :func:`decode_image` in one forward pass.
+
+    The pipeline's infer runners hand over whatever is waiting, up to
+    `inference_batch_size` items; the forward pass runs on the model pool
+    (or, in ``"process"`` mode, in one worker process, where an image that
+    cannot be decoded yields its `AIServiceError` in place of an embedding).
+
+    Raises:
+        AIServiceError: on inference failure (the whole batch fails).
+    """
+    if inference_mode() == "process":
+        return await get_process_executor().embed_paths(decoded)
+    return await _embed_tensors(decoded)
+
+
+def shutdown_stage_executors() -> None:
+    """Stop the decode and model thread pools, if started."""
+    global _decode_executor, _model_executor
+    for executor in (_decode_executor, _model_executor):
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    _decode_executor = _model_executor = None
+
+
+async def stop_embedding_batcher() -> None:
+    """Stop the embedding batcher's collector task if it was started."""
+    if _embedding_batcher is not None:
+        await _embedding_batcher.stop()
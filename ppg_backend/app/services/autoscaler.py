@@ -0,0 +1,132 @@
+"""Scaling policy for the in-process worker pool.
+
+`ScalingPolicy.decide` is called once per sampling interval with the queue
+and stage measurements and returns how many workers to add (> 0) or retire
+(< 0). It is deliberately sticky so the pool does not thrash:
+
+- scale up only under backlog (queue non-empty and its oldest task waiting
+  at least `up_wait` seconds, or more tasks waiting than workers) while
+  workers are busy (utilization >= `up_utilization`), for `up_samples`
+  consecutive samples; the pool then grows by half its size;
+- scale down only when the queue is empty and utilization is below
+  `down_utilization`, for `down_samples` consecutive samples, one worker
+  at a time;
+- no change within `cooldown` seconds of the previous one;
+- no scale-up while a capacity-limited stage (e.g. the serialized embedding
+  step) is saturated: more workers would only queue in front of it.
+
+The supervisor applying the decisions lives in `worker_service`.
+"""
+
+import os
+from typing import Optional, Tuple
+
+from .utils import get_config_option
+
+
+class ScalingPolicy:
+    """Hysteresis policy bounding the worker count to ``[min_workers, max_workers]``.
+
+    Args:
+        min_workers: Lower bound (>= 1).
+        max_workers: Upper bound (>= min_workers).
+        up_wait: Queue age in seconds that counts as backlog.
+        up_utilization: Worker utilization required to scale up.
+        down_utilization: Worker utilization below which the pool shrinks.
+        up_samples: Consecutive backlog samples before scaling up.
+        down_samples: Consecutive idle samples before scaling down.
+        cooldown: Minimum seconds between two changes.
+
+    Examples:
+        >>> policy = ScalingPolicy(1, 8)
+        >>> policy.decide(size=2, depth=10, oldest_wait=1.0, utilization=1.0, now=0.0)
+        (0, '')
+        >>> policy.decide(size=2, depth=10, oldest_wait=1.2, utilization=1.0, now=1.0)
+        (1, 'backlog: 10 queued, oldest 1.2s, utilization 1.00')
+    """
+
+    def __init__(
+        self,
+        min_workers: int,
+        max_workers: int,
+        up_wait: float = 0.25,
+        up_utilization: float = 0.75,
+        down_utilization: float = 0.3,
+        up_samples: int = 2,
+        down_samples: int = 10,
+        cooldown: float = 5.0,
+    ) -> None:
+        if min_workers < 1 or max_workers < min_workers:
+            raise ValueError("require 1 <= min_workers <= max_workers")
+        if not 0 <= down_utilization < up_utilization <= 1:
+            raise ValueError("require 0 <= down_utilization < up_utilization <= 1")
+        self.min_workers = int(min_workers)
+        self.max_workers = int(max_workers)
+        self.up_wait = float(up_wait)
+        self.up_utilization = float(up_utilization)
+        self.down_utilization = float(down_utilization)
+        self.up_samples = max(1, int(up_samples))
+        self.down_samples = max(1, int(down_samples))
+        self.cooldown = float(cooldown)
+        self._up_streak = 0
+        self._down_streak = 0
+        self._last_change: Optional[float] = None
+
+    def clamp(self, size: int) -> int:
+        return max(self.min_workers, min(self.max_workers, size))
+
+    def decide(
+        self,
+        size: int,
+        depth: int,
+        oldest_wait: float,
+        utilization: float,
+        now: float,
+        saturated_stage: Optional[str] = None,
+    ) -> Tuple[int, str]:
+        """Return ``(delta, reason)``; `delta` is 0 (and `reason` may be empty) to hold."""
+        if size != self.clamp(size):
+            return self.clamp(size) - size, f"outside bounds [{self.min_workers}, {self.max_workers}]"
+
+        backlog = depth > 0 and (oldest_wait >= self.up_wait or depth > size)
+        busy = utilization >= self.up_utilization
+        idle = depth == 0 and utilization < self.down_utilization
+        self._up_streak = self._up_streak + 1 if backlog and busy else 0
+        self._down_streak = self._down_streak + 1 if idle else 0
+
+        if self._last_change is not None and now - self._last_change < self.cooldown:
+            return 0, ""
+        if self._up_streak >= self.up_samples and size < self.max_workers:
+            if saturated_stage is not None:
+                return 0, f"held: stage {saturated_stage!r} saturated"
+            delta = min(self.max_workers - size, max(1, size // 2))
+            reason = f"backlog: {depth} queued, oldest {oldest_wait:.1f}s, utilization {utilization:.2f}"
+        elif self._down_streak >= self.down_samples and size > self.min_workers:
+            delta = -1
+            reason = f"idle: utilization {utilization:.2f}"
+        else:
+            return 0, ""
+        self._up_streak = self._down_streak = 0
+        self._last_change = now
+        return delta, reason
+
+
+def autoscale_enabled() -> bool:
+    return bool(get_config_option("autoscale_workers", False))
+
+
+def policy_from_config() -> ScalingPolicy:
+    """Build the policy from the ``autoscale_*`` options.
+
+    `autoscale_max_workers` 0 means twice the CPU count.
+    """
+    min_workers = max(1, int(get_config_option("autoscale_min_workers", 1)))
+    max_workers = int(get_config_option("autoscale_max_workers", 0)) or 2 * (os.cpu_count() or 1)
+    return ScalingPolicy(
+        min_workers,
+        max(min_workers, max_workers),
+        up_wait=float(get_config_option("autoscale_up_wait_ms", 250)) / 1000.0,
+        up_utilization=float(get_config_option("autoscale_up_utilization", 0.75)),
+        down_utilization=float(get_config_option("autoscale_down_utilization", 0.3)),
+        cooldown=float(get_config_option("autoscale_cooldown_seconds", 5)),
+    )
@@ -0,0 +1,174 @@
+"""Dynamic micro-batching for work submitted by concurrent coroutines.
+
+`MicroBatcher` collects items submitted by independent callers (e.g. queue
+workers), waits at most `max_wait_ms` for a batch to fill up to
+`max_batch_size`, runs a single batch callable and resolves each caller's
+future with its own result.
+
+The batcher is bound to the event loop it was first used on. When it is used
+from a new loop (tests create one loop per `asyncio.run`) it transparently
+restarts its collector task on that loop.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from fastapi.logger import logger
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """Gather concurrently submitted items into batches for one batched call.
+
+    Args:
+        run_batch: Async callable receiving a list of items and returning a
+            sequence of results of the same length and order. A result that
+            is an exception instance fails only that item's caller; raising
+            fails the whole batch.
+        max_batch_size: Upper bound of items passed to one `run_batch` call.
+        max_wait_ms: Maximum time the first item of a batch waits for more
+            items before the batch is dispatched.
+        name: Name used in logs and stats.
+
+    Examples:
+        >>> async def double(items):
+        ...     return [i * 2 for i in items]
+        >>> batcher = MicroBatcher(double, max_batch_size=4, max_wait_ms=2)
+        >>> await batcher.submit(21)
+        42
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[T]], Awaitable[Sequence[R]]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+        name: str = "batch",
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms must be non-negative")
+        self._run_batch = run_batch
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait_ms = float(max_wait_ms)
+        self.name = name
+        self._queue: Optional[asyncio.Queue] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # counters exposed via stats()
+        self._batches = 0
+        self._items = 0
+        self._size_histogram: Dict[int, int] = {}
+
+    def _ensure_running(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._runner is None or self._runner.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._runner = loop.create_task(self._collect_loop(self._queue))
+        assert self._queue is not None
+        return self._queue
+
+    async def submit(self, item: T) -> R:
+        """Submit one item and wait for its result from a batched call.
+
+        Raises:
+            Exception: whatever `run_batch` raised for the batch containing
+                `item`, or the exception it returned for `item`.
+        """
+        queue = self._ensure_running()
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        await queue.put((item, fut))
+        return await fut
+
+    async def _gather_batch(self, queue: asyncio.Queue) -> List[Tuple[T, asyncio.Future]]:
+        """Block for the first item, then collect more until full or timed out."""
+        batch = [await queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            # drain anything already waiting without sleeping
+            try:
+                batch.append(queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _collect_loop(self, queue: asyncio.Queue) -> None:
+        try:
+            while True:
+                batch = await self._gather_batch(queue)
+                # callers that were cancelled while waiting do not need a result
+                batch = [(item, fut) for item, fut in batch if not fut.done()]
+                if not batch:
+                    continue
+                items = [item for item, _ in batch]
+                self._record(len(items))
+                try:
+                    results = await self._run_batch(items)
+                    if len(results) != len(items):
+                        raise RuntimeError(
+                            f"{self.name}: run_batch returned {len(results)} results for {len(items)} items"
+                        )
+                except Exception as e:
+                    logger.exception("%s batch of %d failed: %s", self.name, len(items), e)
+                    for _, fut in batch:
+                        if not fut.done():
+                            fut.set_exception(e)
+                    continue
+                for (_, fut), res in zip(batch, results):
+                    if fut.done():
+                        continue
+                    if isinstance(res, BaseException):
+                        fut.set_exception(res)
+                    else:
+                        fut.set_result(res)
+        except asyncio.CancelledError:
+            # fail anything still waiting so callers do not hang
+            while not queue.empty():
+                _, fut = queue.get_nowait()
+                if not fut.done():
+                    fut.cancel()
+            raise
+
+    def _record(self, size: int) -> None:
+        self._batches += 1
+        self._items += size
+        self._size_histogram[size] = self._size_histogram.get(size, 0) + 1
+
+    async def stop(self) -> None:
+        """Cancel the collector task. Pending submitters are cancelled."""
+        runner = self._runner
+        self._runner = None
+        if runner is None or runner.done():
+            return
+        runner.cancel()
+        # a runner left behind by an earlier (closed) loop cannot be awaited here
+        if runner.get_loop() is asyncio.get_running_loop():
+            try:
+                await runner
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters describing observed batch sizes."""
+        return {
+            "name": self.name,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": self._batches,
+            "items": self._items,
+            "avg_batch_size": (self._items / self._batches) if self._batches else 0.0,
+            "batch_size_histogram": dict(sorted(self._size_histogram.items())),
+        }
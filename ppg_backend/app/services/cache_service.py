@@ -0,0 +1,207 @@
+"""Content-addressed cache of completed analysis results.
+
+Results are keyed by the SHA-256 of the uploaded bytes, so re-uploads of the
+same photo (frontend retries, shared images, synthetic monitors) complete
+without inference or DB round trips.
+
+The in-memory tier is a bounded LRU with a per-entry TTL. When a
+`disk_path` is configured every `put` is also written to a small SQLite
+file, which is consulted on memory misses and survives restarts. The file
+is pruned while writing: expired rows go first, then the rows closest to
+expiry once it holds more than `disk_max_entries`.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi.logger import logger
+
+from .utils import get_config_option
+
+
+def hash_bytes(contents: bytes) -> str:
+    """Return the hex SHA-256 digest used as cache key for an upload."""
+    return hashlib.sha256(contents).hexdigest()
+
+
+class ResultCache:
+    """Bounded LRU/TTL cache with optional SQLite spill.
+
+    Args:
+        max_entries: Maximum number of entries kept in memory.
+        ttl_seconds: Lifetime of an entry; expired entries count as misses.
+        disk_path: Optional SQLite file used as a persistent second tier.
+        disk_max_entries: Maximum rows kept in the SQLite file.
+
+    Examples:
+        >>> cache = ResultCache(max_entries=2, ttl_seconds=60)
+        >>> await cache.put("abc", [{"name": "onion"}])
+        >>> await cache.get("abc")
+        [{'name': 'onion'}]
+    """
+
+    # the spill file is pruned once every this many disk writes
+    disk_prune_every = 64
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600.0,
+        disk_path: Optional[str] = None,
+        disk_max_entries: int = 100_000,
+    ) -> None:
+        if max_entries < 1 or disk_max_entries < 1:
+            raise ValueError("max_entries and disk_max_entries must be >= 1")
+        if ttl_seconds <= 0:
+            raise ValueError("ttl_seconds must be positive")
+        self.max_entries = int(max_entries)
+        self.ttl_seconds = float(ttl_seconds)
+        self.disk_max_entries = int(disk_max_entries)
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._disk_hits = 0
+        self._disk_writes = 0
+        self._disk_pruned = 0
+        self._disk: Optional[sqlite3.Connection] = None
+        self._disk_lock = threading.Lock()
+        if disk_path:
+            self._open_disk(disk_path)
+
+    # -------------------------
+    # disk tier (blocking; called through asyncio.to_thread)
+    # -------------------------
+    def _open_disk(self, path: str) -> None:
+        self._disk = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._disk.execute("PRAGMA journal_mode=WAL")
+        self._disk.execute(
+            "CREATE TABLE IF NOT EXISTS result_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._disk.execute("CREATE INDEX IF NOT EXISTS idx_result_cache_expires ON result_cache (expires_at)")
+        with self._disk_lock:
+            removed = self._disk_prune()
+        logger.info("Result cache spill file %s opened (%d expired/excess entries pruned)", path, removed)
+
+    def _disk_prune(self) -> int:
+        """Delete expired rows, then the rows closest to expiry beyond `disk_max_entries` (_disk_lock held)."""
+        assert self._disk is not None
+        removed = self._disk.execute("DELETE FROM result_cache WHERE expires_at < ?", (time.time(),)).rowcount
+        excess = self._disk.execute("SELECT COUNT(*) FROM result_cache").fetchone()[0] - self.disk_max_entries
+        if excess > 0:
+            removed += self._disk.execute(
+                "DELETE FROM result_cache WHERE key IN (SELECT key FROM result_cache ORDER BY expires_at LIMIT ?)",
+                (excess,),
+            ).rowcount
+        self._disk_pruned += removed
+        return removed
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, Any]]:
+        assert self._disk is not None
+        with self._disk_lock:
+            row = self._disk.execute("SELECT value, expires_at FROM result_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return row[1], json.loads(row[0])
+
+    def _disk_put(self, key: str, value: Any, expires_at: float) -> None:
+        assert self._disk is not None
+        with self._disk_lock:
+            self._disk.execute(
+                "INSERT OR REPLACE INTO result_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            self._disk_writes += 1
+            if self._disk_writes % self.disk_prune_every == 0:
+                self._disk_prune()
+
+    # -------------------------
+    # public API
+    # -------------------------
+    def _store(self, key: str, expires_at: float, value: Any) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for `key`, or None on miss/expiry."""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return value
+            del self._entries[key]
+            self._expirations += 1
+        if self._disk is not None:
+            try:
+                disk_entry = await asyncio.to_thread(self._disk_get, key)
+            except Exception:
+                logger.exception("Result cache disk lookup failed for %s", key)
+                disk_entry = None
+            if disk_entry is not None and disk_entry[0] > now:
+                self._store(key, *disk_entry)
+                self._hits += 1
+                self._disk_hits += 1
+                return disk_entry[1]
+        self._misses += 1
+        return None
+
+    async def put(self, key: str, value: Any) -> None:
+        """Insert or refresh `key`. The value must be JSON-serializable when spilling."""
+        expires_at = time.time() + self.ttl_seconds
+        self._store(key, expires_at, value)
+        if self._disk is not None:
+            try:
+                await asyncio.to_thread(self._disk_put, key, value, expires_at)
+            except Exception:
+                logger.exception("Result cache disk write failed for %s", key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters and current size."""
+        lookups = self._hits + self._misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": (self._hits / lookups) if lookups else 0.0,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "disk_hits": self._disk_hits,
+            "disk_enabled": self._disk is not None,
+            "disk_max_entries": self.disk_max_entries,
+            "disk_pruned": self._disk_pruned,
+        }
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+
+_default_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    """Return the process-wide cache configured by `result_cache_*` options."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache(
+            max_entries=int(get_config_option("result_cache_size", 1024)),
+            ttl_seconds=float(get_config_option("result_cache_ttl_seconds", 3600)),
+            disk_path=get_config_option("result_cache_path", None) or None,
+            disk_max_entries=int(get_config_option("result_cache_disk_max_entries", 100_000)),
+        )
+    return _default_cache
@@ -1,35 +1,216 @@
 from sqlalchemy import cast
 from sqlalchemy import bindparam
 from sqlalchemy import Float
-from pgvector.sqlalchemy import Vector
+from sqlalchemy import literal_column
+from sqlalchemy import Text
+from sqlalchemy import text
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import ARRAY
+from pgvector import Vector as VectorValue
+from pgvector.sqlalchemy import HALFVEC, Vector
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from ..models.db_models import RecipeData, RecEmbed, PetPoison
-from typing import List, Dict, Tuple
+from ..models.db_models import RecipeData, RecEmbed, PetPoison, RecipePoison, VectorMeta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 import time
+from collections import Counter
+import numpy as np
 from fastapi.logger import logger
 from .exceptions import DBServiceError
+from .utils import get_config_option
+
+# statements sent per query function, exposed through /api/metrics
+_round_trips: Counter = Counter()
+
+
+def db_stats() -> Dict[str, Any]:
+    """Return the number of statements issued by each lookup function."""
+    return {"round_trips": dict(_round_trips), "total_round_trips": sum(_round_trips.values())}
+
+
+def vector_search_settings() -> Dict[str, int]:
+    """Query-time index knobs from the config, as Postgres setting names.
+
+    `vector_search_probes` maps to ``ivfflat.probes`` and
+    `vector_search_ef_search` to ``hnsw.ef_search``; values <= 0 keep the
+    server default.
+    """
+    settings = {}
+    probes = int(get_config_option("vector_search_probes", 0))
+    if probes > 0:
+        settings["ivfflat.probes"] = probes
+    ef_search = int(get_config_option("vector_search_ef_search", 0))
+    if ef_search > 0:
+        settings["hnsw.ef_search"] = ef_search
+    return settings
+
+
+def install_vector_search_settings(engine) -> Dict[str, int]:
+    """Apply `vector_search_settings()` to every new connection of `engine`.
+
+    Settings are session-level, so they cost nothing per query. Call before
+    the first connection is opened; pooled connections keep their values.
+    """
+    settings = vector_search_settings()
+    if not settings:
+        return settings
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _apply(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in settings.items():
+                cursor.execute(f"SET {name} = {int(value)}")
+        finally:
+            cursor.close()
+
+    logger.info("Vector search settings for new connections: %s", settings)
+    return settings
+
+
+class VectorParam(Vector):
+    """pgvector type whose bind values are handed to the driver unchanged.
+
+    The stock type renders every value as a text literal. With the binary
+    codec registered on each connection (`db_session`), a float32 numpy
+    embedding is instead encoded straight from its buffer.
+    """
+
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        return None
+
+
+# set by detect_normalized_embeddings() at startup
+_embeddings_normalized = False
+
+
+async def detect_normalized_embeddings(db: AsyncSession) -> bool:
+    """Read from `vector_meta` whether `rec_embeds` was loaded L2-normalized.
+
+    The flag is written by `ppg_database/load_tables.py` after it verified
+    every stored norm. A missing table or row counts as not normalized.
+    """
+    global _embeddings_normalized
+    try:
+        normalized = (
+            await db.execute(select(VectorMeta.normalized).where(VectorMeta.table_name == "rec_embeds"))
+        ).scalar_one_or_none()
+    except Exception:
+        logger.warning("Could not read vector_meta; assuming rec_embeds is not normalized", exc_info=True)
+        normalized = None
+    _embeddings_normalized = bool(normalized)
+    logger.info("rec_embeds normalized: %s (vector distance: %s)", _embeddings_normalized, vector_distance())
+    return _embeddings_normalized
+
+
+def vector_distance() -> str:
+    """Return the operator used for recipe search: ``"cosine"`` (``<=>``) or ``"ip"`` (``<#>``).
+
+    `vector_distance` ``"auto"`` (default) selects ``"ip"`` once
+    `detect_normalized_embeddings` has confirmed unit-length rows; on unit
+    vectors ``1 + (a <#> b)`` equals ``a <=> b``, so rankings and returned
+    similarities are unchanged. ``"ip"`` needs the `vector_ip_ops` index built
+    by `ppg_database/40_create_indexes.sh`.
+    """
+    mode = str(get_config_option("vector_distance", "auto"))
+    if mode in ("cosine", "ip"):
+        return mode
+    if mode != "auto":
+        logger.warning("Unknown vector_distance %r; falling back to 'auto'", mode)
+    return "ip" if _embeddings_normalized else "cosine"
+
+
+def _query_vector(query_emb) -> np.ndarray:
+    q = np.ascontiguousarray(query_emb, dtype=np.float32)
+    if vector_distance() == "ip":
+        # the encoder already normalizes; this keeps <#> exact for any caller
+        norm = float(np.linalg.norm(q))
+        if norm > 0:
+            q = q / norm
+    return q
+
+
+def _distance_op() -> str:
+    return "<#>" if vector_distance() == "ip" else "<=>"
+
+
+def _distance_exprs(emb_col, qvec):
+    """Return `(distance, order_by)` for `emb_col` against `qvec`.
+
+    `distance` is the cosine distance in both modes. `order_by` is the bare
+    operator expression, which is what the vector index can serve.
+    """
+    order_by = emb_col.op(_distance_op())(qvec)
+    if vector_distance() == "ip":
+        return cast(literal_column("1") + order_by, Float).label("distance"), order_by
+    # ensure SQLAlchemy knows this expression is a numeric distance (Float)
+    return cast(order_by, Float).label("distance"), order_by
+
+
+def _distance_expr():
+    """Cosine distance between `rec_embeds.embedding` and the `qvec` parameter.
+
+    Bind the query vector as a `VectorParam` so the numpy array reaches the
+    driver's binary codec as is. Use core table columns
+    (RecEmbed.__table__.c) to avoid ORM column processors trying to coerce the
+    wrong result column into a Vector.
+    """
+    qvec_param = bindparam("qvec", type_=VectorParam)
+    emb_col = RecEmbed.__table__.c.embedding
+    return _distance_exprs(emb_col, qvec_param)
+
+
+def vector_search_precision() -> str:
+    """Return the configured `vector_search_precision`: ``"full"`` (default) or ``"half"``.
+
+    ``"half"`` requires the halfvec expression index created by
+    `ppg_database/40_create_indexes.sh` with ``VECTOR_INDEX_PRECISION=half``.
+    """
+    mode = str(get_config_option("vector_search_precision", "full"))
+    if mode not in ("full", "half"):
+        logger.warning("Unknown vector_search_precision %r; falling back to 'full'", mode)
+        return "full"
+    return mode
+
+
+def _rescore_candidates(top_k: int) -> int:
+    return max(top_k, top_k * int(get_config_option("vector_rescore_factor", 4)))
+
+
+def _topk_subquery(top_k: int):
+    """Top-k `(id, distance)` rows of `rec_embeds` as a subquery named ``topk``.
+
+    In ``"half"`` precision mode the candidates are ordered by the halfvec
+    expression (served by the half-precision index), and the best
+    `top_k * vector_rescore_factor` of them are re-ranked by the
+    full-precision distance.
+    """
+    id_col = RecEmbed.__table__.c.id
+    distance, order_by = _distance_expr()
+    if vector_search_precision() != "half":
+        return select(id_col, distance).order_by(order_by).limit(top_k).subquery("topk")
+    dim = int(get_config_option("embDim", 1024))
+    emb_col = RecEmbed.__table__.c.embedding
+    # must match the index expression: (embedding::halfvec(dim)) halfvec_{cosine,ip}_ops
+    _, half_order_by = _distance_exprs(cast(emb_col, HALFVEC(dim)), cast(bindparam("qvec", type_=VectorParam), HALFVEC(dim)))
+    candidates = select(id_col, distance).order_by(half_order_by).limit(_rescore_candidates(top_k)).subquery("candidates")
+    return select(candidates.c.id, candidates.c.distance).order_by(candidates.c.distance).limit(top_k).subquery("topk")
+
 
 async def find_top_k_recipes(db: AsyncSession, query_emb, top_k: int = 10) -> List[Tuple[int, float]]:
     t0 = time.time()
 
     try:
-        # Bind the query vector as a parameter of pgvector Vector type so the
-        # driver/SQLAlchemy knows how to serialize it. Use core table columns
-        # (RecEmbed.__table__.c) to avoid ORM column processors trying to
-        # coerce the wrong result column into a Vector.
-        qvec_param = bindparam("qvec", type_=Vector)
-
-        id_col = RecEmbed.__table__.c.id
-        emb_col = RecEmbed.__table__.c.embedding
-        # ensure SQLAlchemy knows this expression is a numeric distance (Float)
-        stmt = cast(emb_col.op('<=>')(qvec_param), Float).label("distance")
-
-        q = select(id_col, stmt).order_by(stmt).limit(top_k)
-        # pass the python list (or vector) as the parameter value; the pgvector
-        # SQLAlchemy type will handle serialization
-        result = await db.execute(q, {"qvec": query_emb.tolist()})
+        topk = _topk_subquery(top_k)
+
+        q = select(topk.c.id, topk.c.distance).order_by(topk.c.distance)
+        # pass the float32 array itself; the connection's pgvector codec
+        # encodes it in binary
+        result = await db.execute(q, {"qvec": _query_vector(query_emb)})
+        _round_trips["find_top_k_recipes"] += 1
         rows = result.fetchall()
     except Exception as e:
         logger.exception("DB query failed in find_top_k_recipes")
@@ -42,47 +223,326 @@ async def find_top_k_recipes(db: AsyncSession, query_emb, top_k: int = 10) -> Li
     return topk_recipes
 
 
-async def find_poisons_in_recipe(db: AsyncSession, topk_recipes: List[Tuple[int, float]]) -> List[Dict[str, str]]:
-    result = []
-    for rid, _ in topk_recipes:
-        recipe_result = await db.execute(select(RecipeData).filter(RecipeData.id == rid))
-        recipe_row = recipe_result.scalar_one_or_none()
-        if not recipe_row:
+async def load_pet_poisons(db: AsyncSession) -> List[PetPoison]:
+    """Load the whole `pet_poisons` table once, in id order.
+
+    Raises:
+        DBServiceError: on any DB error.
+    """
+    try:
+        result = await db.execute(select(PetPoison).order_by(PetPoison.id))
+        _round_trips["load_pet_poisons"] += 1
+        return list(result.scalars().all())
+    except Exception as e:
+        logger.exception("DB query failed in load_pet_poisons")
+        raise DBServiceError(str(e)) from e
+
+
+def ingredients_text(ingredients: Optional[Sequence[Dict[str, Any]]]) -> str:
+    """Join ingredient texts the way the matcher expects (lower-cased, ', ' separated)."""
+    return ', '.join([ingredient['text'] for ingredient in ingredients or []]).lower()
+
+
+def match_poison(ingredients_lower: str, poisons: Iterable[Any]) -> Optional[Any]:
+    """Return the first poison entry whose name or an alternate name occurs in the text.
+
+    Entries are tried in the given order; an entry without a usable name never
+    matches, even through its alternate names.
+    """
+    for entry in poisons:
+        name = getattr(entry, "name", "")
+        if not isinstance(name, str) or not name:
             continue
-        recipe_data = recipe_row.data
-        ingredients = recipe_data.get("ingredients", [])
-        ingredients_lower = ', '.join([ingredient['text'] for ingredient in ingredients]).lower()
-        matched_poison = None
-        poison_entry = None
-        poisons_result = await db.execute(select(PetPoison))
-        poisons = poisons_result.scalars().all()
-        for entry in poisons:
-            name = getattr(entry, "name", "")
-            if isinstance(name, str) and name and name.lower() in ingredients_lower:
-                matched_poison = name
-                poison_entry = entry
-                break
-            alt_names = getattr(entry, "alternate_names", []) or []
-            for alt_name in alt_names:
-                if isinstance(alt_name, str) and alt_name and alt_name.lower() in ingredients_lower:
-                    matched_poison = name
-                    poison_entry = entry
-                    break
-            if matched_poison:
-                break
-        if matched_poison and poison_entry:
-            result.append({
-                "name": matched_poison,
-                "image": getattr(poison_entry, 'desktop_thumb', ""),
-                "description": getattr(poison_entry, 'poison_description', "")
-            })
-
-    # Remove duplicates by name, keep first occurrence (highest similarity)
+        if name.lower() in ingredients_lower:
+            return entry
+        alt_names = getattr(entry, "alternate_names", []) or []
+        for alt_name in alt_names:
+            if isinstance(alt_name, str) and alt_name and alt_name.lower() in ingredients_lower:
+                return entry
+    return None
+
+
+def poison_payload(entry: Any) -> Dict[str, str]:
+    return {
+        "name": entry.name,
+        "image": getattr(entry, 'desktop_thumb', ""),
+        "description": getattr(entry, 'poison_description', "")
+    }
+
+
+def dedupe_by_name(result: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Remove duplicates by name, keep first occurrence (highest similarity)."""
     seen = set()
     deduped_result = []
     for item in result:
         if item["name"] not in seen:
             deduped_result.append(item)
             seen.add(item["name"])
+    return deduped_result
+
+
+def match_recipes(recipe_ingredients: Iterable[Optional[Sequence[Dict[str, Any]]]], poisons: Sequence[Any]) -> List[Dict[str, str]]:
+    """Match ingredient lists (ordered by similarity) against the poison table."""
+    result = []
+    for ingredients in recipe_ingredients:
+        entry = match_poison(ingredients_text(ingredients), poisons)
+        if entry is not None:
+            result.append(poison_payload(entry))
+    return dedupe_by_name(result)
 
-    return deduped_result
\ No newline at end of file
+
+async def find_poisons_in_recipe(db: AsyncSession, topk_recipes: List[Tuple[int, float]], matcher=None) -> List[Dict[str, str]]:
+    """Return poisons found in the ingredients of `topk_recipes`.
+
+    Fetches all recipes in one `IN` query and the poison table once, instead
+    of one recipe query plus one full poison scan per recipe. A loaded
+    `PoisonMatcher` replaces the poison table read.
+
+    Raises:
+        DBServiceError: on any DB error.
+    """
+    [result] = await find_poisons_in_recipes(db, [topk_recipes], matcher=matcher)
+    return result
+
+
+async def find_poisons_in_recipes(db: AsyncSession, topk_lists: List[List[Tuple[str, float]]], matcher=None) -> List[List[Dict[str, str]]]:
+    """Batched `find_poisons_in_recipe`: one `IN` query over the union of all ids.
+
+    Raises:
+        DBServiceError: on any DB error.
+    """
+    ids = list({rid for topk in topk_lists for rid, _ in topk})
+    if not ids:
+        return [[] for _ in topk_lists]
+    try:
+        rows = (await db.execute(
+            select(RecipeData.id, RecipeData.data["ingredients"].label("ingredients")).where(RecipeData.id.in_(ids))
+        )).fetchall()
+        _round_trips["find_poisons_in_recipes"] += 1
+    except Exception as e:
+        logger.exception("DB query failed in find_poisons_in_recipes")
+        raise DBServiceError(str(e)) from e
+    by_id = {row.id: row.ingredients for row in rows}
+    # keep the similarity order of each top-k list; recipes missing from recipe_data are skipped
+    ordered = [[by_id[rid] for rid, _ in topk if rid in by_id] for topk in topk_lists]
+    if matcher is not None and matcher.loaded:
+        return [matcher.match_recipes(recipes) for recipes in ordered]
+    poisons = await load_pet_poisons(db)
+    return [match_recipes(recipes, poisons) for recipes in ordered]
+
+
+async def find_poisons_for_embedding(db: AsyncSession, query_emb, top_k: int = 10, matcher=None) -> List[Dict[str, str]]:
+    """Vector search + poison lookup in two round trips.
+
+    One statement runs the `rec_embeds` top-k search and joins `recipe_data`
+    to return ids, similarities and ingredient lists together; the poison
+    table is read once. When a loaded `PoisonMatcher` is passed it is used
+    instead and the poison read is skipped (one round trip).
+
+    Raises:
+        DBServiceError: on any DB error.
+    """
+    t0 = time.time()
+    try:
+        topk = _topk_subquery(top_k)
+        q = (
+            select(topk.c.id, topk.c.distance, RecipeData.data["ingredients"].label("ingredients"))
+            .join_from(topk, RecipeData.__table__, RecipeData.id == topk.c.id)
+            .order_by(topk.c.distance)
+        )
+        rows = (await db.execute(q, {"qvec": _query_vector(query_emb)})).fetchall()
+        _round_trips["find_poisons_for_embedding"] += 1
+    except Exception as e:
+        logger.exception("DB query failed in find_poisons_for_embedding")
+        raise DBServiceError(str(e)) from e
+    logger.info(f"Top-{top_k} recipes with ingredients found on db. (elapsed: {time.time() - t0:.2f}s)")
+    if matcher is not None and matcher.loaded:
+        return matcher.match_recipes(row.ingredients for row in rows)
+    poisons = await load_pet_poisons(db)
+    return match_recipes((row.ingredients for row in rows), poisons)
+
+
+def poison_lookup() -> str:
+    """Return the configured `poison_lookup`: ``"matcher"`` (default) or ``"index"``.
+
+    ``"index"`` requires the `recipe_poisons` table built by
+    `ppg_database/load_tables.py`.
+    """
+    mode = str(get_config_option("poison_lookup", "matcher"))
+    if mode not in ("matcher", "index"):
+        logger.warning("Unknown poison_lookup %r; falling back to 'matcher'", mode)
+        return "matcher"
+    return mode
+
+
+async def find_poisons_indexed(db: AsyncSession, query_emb, top_k: int = 10) -> List[Dict[str, str]]:
+    """Vector search + precomputed `recipe_poisons` lookup in one statement.
+
+    No recipe documents are transferred and no text is scanned: the top-k
+    ids are joined through the `recipe_poisons` primary key to `pet_poisons`.
+
+    Raises:
+        DBServiceError: on any DB error.
+    """
+    t0 = time.time()
+    try:
+        topk = _topk_subquery(top_k)
+        rp = RecipePoison.__table__
+        pp = PetPoison.__table__
+        q = (
+            select(topk.c.distance, pp.c.name, pp.c.desktop_thumb, pp.c.poison_description)
+            .join_from(topk, rp, rp.c.recipe_id == topk.c.id)
+            .join(pp, pp.c.id == rp.c.poison_id)
+            .order_by(topk.c.distance)
+        )
+        rows = (await db.execute(q, {"qvec": _query_vector(query_emb)})).fetchall()
+        _round_trips["find_poisons_indexed"] += 1
+    except Exception as e:
+        logger.exception("DB query failed in find_poisons_indexed")
+        raise DBServiceError(str(e)) from e
+    logger.info(f"Top-{top_k} recipe poisons found on db. (elapsed: {time.time() - t0:.2f}s)")
+    return dedupe_by_name([poison_payload(row) for row in rows])
+
+
+async def find_poisons_in_recipe_indexed(db: AsyncSession, topk_recipes: List[Tuple[str, float]]) -> List[Dict[str, str]]:
+    """Look up `topk_recipes` (best first) in `recipe_poisons` with one `IN` query.
+
+    Used when the vector search runs outside Postgres.
+
+    Raises:
+        DBServiceError: on any DB error.
+    """
+    [result] = await find_poisons_in_recipes_indexed(db, [topk_recipes])
+    return result
+
+
+async def find_poisons_in_recipes_indexed(db: AsyncSession, topk_lists: List[List[Tuple[str, float]]]) -> List[List[Dict[str, str]]]:
+    """Batched `find_poisons_in_recipe_indexed`: one `IN` query over the union of all ids.
+
+    Raises:
+        DBServiceError: on any DB error.
+    """
+    ids = list({rid for topk in topk_lists for rid, _ in topk})
+    if not ids:
+        return [[] for _ in topk_lists]
+    try:
+        rp = RecipePoison.__table__
+        pp = PetPoison.__table__
+        q = (
+            select(rp.c.recipe_id, pp.c.name, pp.c.desktop_thumb, pp.c.poison_description)
+            .join_from(rp, pp, pp.c.id == rp.c.poison_id)
+            .where(rp.c.recipe_id.in_(ids))
+        )
+        rows = (await db.execute(q)).fetchall()
+        _round_trips["find_poisons_in_recipes_indexed"] += 1
+    except Exception as e:
+        logger.exception("DB query failed in find_poisons_in_recipes_indexed")
+        raise DBServiceError(str(e)) from e
+    by_id = {row.recipe_id: row for row in rows}
+    return [
+        dedupe_by_name([poison_payload(by_id[rid]) for rid, _ in topk if rid in by_id])
+        for topk in topk_lists
+    ]
+
+
+# -------------------------
+# multi-query search
+# -------------------------
+# One LATERAL top-k scan per query vector. The vectors travel as a text[]
+# of pgvector literals and are cast once per query (not per scanned row);
+# the lateral ORDER BY is a plain `embedding <=> <param>` (or `<#>` on
+# normalized embeddings), which the ivfflat/hnsw index can serve.
+_BATCH_QUERIES = """
+FROM (SELECT u.ord, u.txt::vector AS vec
+      FROM unnest(:qvecs) WITH ORDINALITY AS u(txt, ord)) q
+"""
+
+_BATCH_TOPK_FULL = """CROSS JOIN LATERAL (
+    SELECT e.id, {distance}::float AS distance
+    FROM rec_embeds e
+    ORDER BY e.embedding {op} q.vec
+    LIMIT :top_k
+) t
+"""
+
+# half precision: candidates from the halfvec index, re-ranked in full precision
+_BATCH_TOPK_HALF = """CROSS JOIN LATERAL (
+    SELECT c.id, c.distance FROM (
+        SELECT e.id, {distance}::float AS distance
+        FROM rec_embeds e
+        ORDER BY e.embedding::halfvec({dim}) {op} q.vec::halfvec({dim})
+        LIMIT :candidates
+    ) c
+    ORDER BY c.distance
+    LIMIT :top_k
+) t
+"""
+
+
+def _batch_topk_from() -> str:
+    op = _distance_op()
+    # cosine distance in both modes; see _distance_exprs
+    distance = "(1 + (e.embedding <#> q.vec))" if op == "<#>" else "(e.embedding <=> q.vec)"
+    if vector_search_precision() == "half":
+        dim = int(get_config_option("embDim", 1024))
+        return _BATCH_QUERIES + _BATCH_TOPK_HALF.format(distance=distance, op=op, dim=dim)
+    return _BATCH_QUERIES + _BATCH_TOPK_FULL.format(distance=distance, op=op)
+
+
+def _batch_params(query_embs, top_k: int) -> Dict[str, Any]:
+    params = {"qvecs": [VectorValue(_query_vector(q)).to_text() for q in query_embs], "top_k": int(top_k)}
+    if vector_search_precision() == "half":
+        params["candidates"] = _rescore_candidates(int(top_k))
+    return params
+
+
+def _batch_stmt(sql: str):
+    return text(sql).bindparams(bindparam("qvecs", type_=ARRAY(Text)))
+
+
+async def find_top_k_recipes_batch(db: AsyncSession, query_embs, top_k: int = 10) -> List[List[Tuple[str, float]]]:
+    """`find_top_k_recipes` for several query vectors in one statement.
+
+    Raises:
+        DBServiceError: on any DB error.
+    """
+    t0 = time.time()
+    try:
+        stmt = _batch_stmt("SELECT q.ord, t.id, t.distance" + _batch_topk_from() + "ORDER BY q.ord, t.distance")
+        rows = (await db.execute(stmt, _batch_params(query_embs, top_k))).fetchall()
+        _round_trips["find_top_k_recipes_batch"] += 1
+    except Exception as e:
+        logger.exception("DB query failed in find_top_k_recipes_batch")
+        raise DBServiceError(str(e)) from e
+    results: List[List[Tuple[str, float]]] = [[] for _ in range(len(query_embs))]
+    for row in rows:
+        results[row.ord - 1].append((row.id, 1 - row.distance))
+    logger.info(f"Top-{top_k} recipes found on db for {len(query_embs)} queries. (elapsed: {time.time() - t0:.2f}s)")
+    return results
+
+
+async def find_poisons_indexed_batch(db: AsyncSession, query_embs, top_k: int = 10) -> List[List[Dict[str, str]]]:
+    """`find_poisons_indexed` for several query vectors in one statement.
+
+    Raises:
+        DBServiceError: on any DB error.
+    """
+    t0 = time.time()
+    try:
+        stmt = _batch_stmt(
+            "SELECT q.ord, t.distance, p.name, p.desktop_thumb, p.poison_description"
+            + _batch_topk_from()
+            + "JOIN recipe_poisons rp ON rp.recipe_id = t.id\n"
+            + "JOIN pet_poisons p ON p.id = rp.poison_id\n"
+            + "ORDER BY q.ord, t.distance"
+        )
+        rows = (await db.execute(stmt, _batch_params(query_embs, top_k))).fetchall()
+        _round_trips["find_poisons_indexed_batch"] += 1
+    except Exception as e:
+        logger.exception("DB query failed in find_poisons_indexed_batch")
+        raise DBServiceError(str(e)) from e
+    grouped: List[List[Dict[str, str]]] = [[] for _ in range(len(query_embs))]
+    for row in rows:
+        grouped[row.ord - 1].append(poison_payload(row))
+    logger.info(f"Top-{top_k} recipe poisons found on db for {len(query_embs)} queries. (elapsed: {time.time() - t0:.2f}s)")
+    return [dedupe_by_name(items) for items in grouped]
@@ -11,10 +11,11 @@ def norm(input, p=2, dim=1, eps=1e-12):
 
 # Im2recipe model
 class im2recipe(nn.Module):
-    def __init__(self):
+    def __init__(self, pretrained=True):
         super(im2recipe, self).__init__()
         if opts.preModel=='resNet50':
-            resnet = resnet50(weights=ResNet50_Weights.DEFAULT)
+            # pretrained=False skips the torchvision weight download (benchmarks, offline runs)
+            resnet = resnet50(weights=ResNet50_Weights.DEFAULT if pretrained else None)
             modules = list(resnet.children())[:-1]  # we do not use the last fc layer.
             self.visionMLP = nn.Sequential(*modules)
 
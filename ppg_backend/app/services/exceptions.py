@@ -8,3 +8,16 @@ class DBServiceError(Exception):
 
 class TaskServiceError(Exception):
     """Generic task service error."""
+
+
+class QueueFullError(Exception):
+    """Raised when the analysis queue is at its configured depth limit.
+
+    Attributes:
+        retry_after: Suggested seconds to wait before retrying, from the
+            current drain rate.
+    """
+
+    def __init__(self, retry_after: int, message: str = "Analysis queue is full") -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
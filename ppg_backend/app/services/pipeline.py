@@ -0,0 +1,189 @@
+"""Staged processing with bounded queues between stages.
+
+`StagedPipeline` runs a fixed chain of async stage functions. Each stage
+has its own input queue (bounded by `queue_size`) and `concurrency` runner
+coroutines, so different submissions occupy different stages at the same
+time: while one image is in the model, the next is being decoded and the
+previous one waits on Postgres. A full queue blocks the stage in front of
+it (backpressure) instead of growing without bound.
+
+A stage may also be batched: its runners take up to `batch_size` items
+that are already waiting in the stage's queue (never waiting for more)
+and pass them to the stage function as one list, so a backed-up model
+stage runs full batches while an idle one adds no latency.
+
+A submission's result is the last stage's output; an exception in any
+stage fails that submission only. Every stage is measured with a
+`StageMeter` of capacity `concurrency`, so ``occupancy`` (mean fraction of
+the stage's runners busy) and ``queued`` point at the bottleneck.
+
+Like `MicroBatcher`, the pipeline binds to the first event loop it runs on
+and restarts its runners when used from a new loop.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi.logger import logger
+
+from .stage_meter import StageMeter, get_stage_meter
+
+StageFn = Callable[[Any], Awaitable[Any]]
+
+
+class _Stage:
+    __slots__ = ("name", "fn", "concurrency", "batch_size", "meter", "queue", "batches", "items")
+
+    def __init__(self, name: str, fn: StageFn, concurrency: int, batch_size: int = 1) -> None:
+        self.name = name
+        self.fn = fn
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.meter: StageMeter = get_stage_meter(name, capacity=concurrency)
+        self.queue: Optional[asyncio.Queue] = None
+        self.batches = 0
+        self.items = 0
+
+
+class StagedPipeline:
+    """Chain of stages connected by bounded queues.
+
+    Args:
+        stages: ``(name, fn, concurrency)`` or ``(name, fn, concurrency,
+            batch_size)`` in processing order; `fn` receives the previous
+            stage's output (the submitted item for the first stage). With
+            `batch_size` > 1, `fn` receives a list of up to `batch_size`
+            outputs and returns a sequence of results in the same order; a
+            result that is an exception instance fails only that item.
+        queue_size: Capacity of each stage's input queue.
+        name: Name used in logs and stats.
+
+    Examples:
+        >>> pipe = StagedPipeline([("parse", parse, 2), ("store", store, 8)])
+        >>> await pipe.submit(raw)
+    """
+
+    def __init__(self, stages: Sequence[Tuple[Any, ...]], queue_size: int = 16, name: str = "pipeline") -> None:
+        if not stages:
+            raise ValueError("a pipeline needs at least one stage")
+        self._stages = [_Stage(spec[0], spec[1], *map(int, spec[2:])) for spec in stages]
+        if queue_size < 1 or any(st.concurrency < 1 or st.batch_size < 1 for st in self._stages):
+            raise ValueError("queue_size, stage concurrency and batch_size must be >= 1")
+        self.queue_size = int(queue_size)
+        self.name = name
+        self._runners: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._started = time.monotonic()
+        self._submitted = 0
+        self._failed = 0
+
+    def _ensure_running(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or not self._runners or any(t.done() for t in self._runners):
+            for t in self._runners:
+                t.cancel()
+            self._loop = loop
+            self._runners = []
+            for stage in self._stages:
+                stage.queue = asyncio.Queue(self.queue_size)
+            for i, stage in enumerate(self._stages):
+                nxt = self._stages[i + 1] if i + 1 < len(self._stages) else None
+                for _ in range(stage.concurrency):
+                    self._runners.append(loop.create_task(self._run_stage(stage, nxt)))
+        return self._stages[0].queue
+
+    async def submit(self, item: Any) -> Any:
+        """Push `item` through all stages and return the last stage's result.
+
+        Raises:
+            Exception: whatever the failing stage raised for this item.
+        """
+        queue = self._ensure_running()
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._submitted += 1
+        await queue.put((item, fut))
+        return await fut
+
+    async def _call_batched(self, stage: _Stage, values: List[Any]) -> Sequence[Any]:
+        """Run a batched stage; a failure of the whole call fails every item."""
+        try:
+            async with stage.meter:
+                results = await stage.fn(values)
+            if len(results) != len(values):
+                raise RuntimeError(f"{stage.name}: returned {len(results)} results for {len(values)} items")
+        except Exception as e:
+            return [e] * len(values)
+        stage.batches += 1
+        stage.items += len(values)
+        return results
+
+    async def _run_stage(self, stage: _Stage, nxt: Optional[_Stage]) -> None:
+        queue = stage.queue
+        try:
+            while True:
+                batch = [await queue.get()]
+                while len(batch) < stage.batch_size:
+                    try:
+                        batch.append(queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+                batch = [(value, fut) for value, fut in batch if not fut.done()]  # drop cancelled submitters
+                if not batch:
+                    continue
+                if stage.batch_size > 1:
+                    results = await self._call_batched(stage, [value for value, _ in batch])
+                else:
+                    try:
+                        async with stage.meter:
+                            results = [await stage.fn(batch[0][0])]
+                    except Exception as e:
+                        results = [e]
+                for (_, fut), value in zip(batch, results):
+                    if isinstance(value, Exception):
+                        self._failed += 1
+                        logger.warning("%s stage %s failed: %s", self.name, stage.name, value)
+                        if not fut.done():
+                            fut.set_exception(value)
+                    elif nxt is None:
+                        if not fut.done():
+                            fut.set_result(value)
+                    else:
+                        # blocks while the next stage is backed up
+                        await nxt.queue.put((value, fut))
+        except asyncio.CancelledError:
+            while not queue.empty():
+                _, fut = queue.get_nowait()
+                if not fut.done():
+                    fut.cancel()
+            raise
+
+    async def stop(self) -> None:
+        """Cancel all stage runners. Pending submitters are cancelled."""
+        runners, self._runners = self._runners, []
+        for t in runners:
+            t.cancel()
+        current = [t for t in runners if t.get_loop() is asyncio.get_running_loop()]
+        await asyncio.gather(*current, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        stages = {}
+        for stage in self._stages:
+            s = stage.meter.stats()
+            stages[stage.name] = {
+                "concurrency": stage.concurrency,
+                "batch_size": stage.batch_size,
+                "avg_batch_size": round(stage.items / stage.batches, 2) if stage.batches else 0.0,
+                "queued": stage.queue.qsize() if stage.queue is not None else 0,
+                "in_flight": s["in_flight"],
+                "completed": s["completed"],
+                "occupancy": round(s["occupancy_seconds"] / (elapsed * stage.concurrency), 4),
+            }
+        return {
+            "name": self.name,
+            "queue_size": self.queue_size,
+            "submitted": self._submitted,
+            "failed": self._failed,
+            "stages": stages,
+        }
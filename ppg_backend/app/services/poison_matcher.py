@@ -0,0 +1,295 @@
+"""In-memory poison matcher over recipe ingredient text.
+
+`PoisonMatcher` compiles every `pet_poisons.name` and `alternate_names` entry
+(lower-cased once) into an Aho-Corasick automaton, so each recipe's
+ingredient text is matched in a single linear pass instead of one substring
+search per poison and alias.
+
+Semantics are those of the original loop in `db_service`: a recipe matches
+the first poison (in table id order) whose name or any alternate name occurs
+in its lower-cased ingredient text, entries without a name never match, and
+results are de-duplicated by name keeping the highest-similarity recipe.
+
+The compiled state is an immutable snapshot swapped in a single assignment,
+so readers never observe a half-built automaton. It is rebuilt on a timer
+and, when a listen DSN is configured, on `NOTIFY pet_poisons_changed` sent
+by the trigger in `ppg_database/10_create_tables.sql`.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi.logger import logger
+
+from .db_service import dedupe_by_name, ingredients_text, load_pet_poisons, poison_payload
+from .exceptions import DBServiceError
+from .utils import get_config_option
+
+DEFAULT_CHANNEL = "pet_poisons_changed"
+
+
+class _Automaton:
+    """Aho-Corasick automaton reporting the smallest pattern id in a text.
+
+    Every state keeps the smallest id among the patterns ending there or at
+    any state on its failure chain, so a scan only tracks a running minimum.
+    """
+
+    __slots__ = ("_goto", "_fail", "_best", "_none")
+
+    def __init__(self, patterns: Iterable[Tuple[str, int]], none: int) -> None:
+        self._none = none
+        self._goto: List[Dict[str, int]] = [{}]
+        self._best: List[int] = [none]
+        for pattern, pid in patterns:
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._best.append(none)
+                state = nxt
+            self._best[state] = min(self._best[state], pid)
+
+        # breadth-first failure links; parents are finished before children
+        self._fail: List[int] = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._best[nxt] = min(self._best[nxt], self._best[self._fail[nxt]])
+
+    def first(self, text: str) -> int:
+        """Return the smallest pattern id occurring in `text`, or `none`."""
+        goto, fail, best = self._goto, self._fail, self._best
+        found = self._none
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if best[state] < found:
+                found = best[state]
+                if found == 0:
+                    break
+        return found
+
+
+class _Snapshot:
+    """Immutable compiled matcher state."""
+
+    __slots__ = ("payloads", "automaton", "patterns")
+
+    def __init__(self, poisons: Sequence[Any]) -> None:
+        self.payloads: List[Dict[str, str]] = []
+        patterns: List[Tuple[str, int]] = []
+        for entry in poisons:
+            name = getattr(entry, "name", "")
+            if not isinstance(name, str) or not name:
+                continue
+            pid = len(self.payloads)
+            self.payloads.append(poison_payload(entry))
+            names = [name] + list(getattr(entry, "alternate_names", []) or [])
+            patterns.extend((n.lower(), pid) for n in names if isinstance(n, str) and n)
+        self.patterns = len(patterns)
+        self.automaton = _Automaton(patterns, none=len(self.payloads))
+
+    def match(self, ingredients_lower: str) -> Optional[Dict[str, str]]:
+        pid = self.automaton.first(ingredients_lower)
+        return self.payloads[pid] if pid < len(self.payloads) else None
+
+
+class PoisonMatcher:
+    """Match recipe ingredients against an in-memory copy of `pet_poisons`.
+
+    Args:
+        poisons: Optional initial entries (objects with `name`,
+            `alternate_names`, `desktop_thumb`, `poison_description`), in
+            table id order.
+
+    Examples:
+        >>> matcher = PoisonMatcher(poisons)
+        >>> matcher.match_recipes([[{"text": "1 onion"}]])
+        [{'name': 'Onion', 'image': '...', 'description': '...'}]
+    """
+
+    def __init__(self, poisons: Optional[Sequence[Any]] = None) -> None:
+        self._snapshot: Optional[_Snapshot] = None
+        self._version = 0
+        self._loaded_at: Optional[float] = None
+        self._reloads = 0
+        self._reload_failures = 0
+        self._notifications = 0
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._listen_conn = None
+        if poisons is not None:
+            self.rebuild(poisons)
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def rebuild(self, poisons: Sequence[Any]) -> None:
+        """Compile `poisons` and swap the new state in atomically."""
+        t0 = time.perf_counter()
+        snapshot = _Snapshot(list(poisons))
+        self._snapshot = snapshot
+        self._version += 1
+        self._loaded_at = time.time()
+        logger.info(
+            "Poison matcher v%d built: %d poisons, %d patterns (%.1f ms)",
+            self._version, len(snapshot.payloads), snapshot.patterns, (time.perf_counter() - t0) * 1000.0,
+        )
+
+    def match(self, ingredients_lower: str) -> Optional[Dict[str, str]]:
+        """Return the payload of the first matching poison for one recipe text."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise RuntimeError("PoisonMatcher is not loaded")
+        return snapshot.match(ingredients_lower)
+
+    def match_recipes(self, recipe_ingredients: Iterable[Optional[Sequence[Dict[str, Any]]]]) -> List[Dict[str, str]]:
+        """Match ingredient lists (ordered by similarity) and de-duplicate by name."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise RuntimeError("PoisonMatcher is not loaded")
+        result = []
+        for ingredients in recipe_ingredients:
+            payload = snapshot.match(ingredients_text(ingredients))
+            if payload is not None:
+                result.append(dict(payload))
+        return dedupe_by_name(result)
+
+    # -------------------------
+    # reloading
+    # -------------------------
+    async def reload(self, session_factory: Callable[[], Any]) -> None:
+        """Read `pet_poisons` through `session_factory` and rebuild.
+
+        Raises:
+            DBServiceError: when the table cannot be read; the previous
+                snapshot stays in use.
+        """
+        async with session_factory() as db:
+            poisons = await load_pet_poisons(db)
+        self.rebuild(poisons)
+        self._reloads += 1
+
+    def notify_changed(self, *_: Any) -> None:
+        """Schedule a rebuild; usable directly as an asyncpg listener callback."""
+        self._notifications += 1
+        self._changed.set()
+
+    async def _run(self, session_factory: Callable[[], Any], reload_interval: float) -> None:
+        while True:
+            self._changed.clear()
+            try:
+                await self.reload(session_factory)
+            except DBServiceError:
+                self._reload_failures += 1
+                logger.warning("Poison matcher reload failed; keeping v%d", self._version)
+            except Exception:
+                self._reload_failures += 1
+                logger.exception("Unexpected error reloading poison matcher")
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=reload_interval if reload_interval > 0 else None)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _listen(self, dsn: str, channel: str) -> None:
+        import asyncpg
+
+        try:
+            self._listen_conn = await asyncpg.connect(dsn)
+            await self._listen_conn.add_listener(channel, self.notify_changed)
+            logger.info("Poison matcher listening on channel %s", channel)
+        except Exception:
+            self._listen_conn = None
+            logger.warning("Could not LISTEN on %s; relying on periodic reload", channel, exc_info=True)
+
+    async def start(
+        self,
+        session_factory: Callable[[], Any],
+        reload_interval: float = 300.0,
+        listen_dsn: Optional[str] = None,
+        channel: str = DEFAULT_CHANNEL,
+    ) -> None:
+        """Start background loading. Returns immediately; the first load runs in the background.
+
+        Until the first load succeeds callers should fall back to reading the
+        table per request (see `db_service.find_poisons_for_embedding`).
+        """
+        self._changed = asyncio.Event()
+        if listen_dsn and channel:
+            await self._listen(listen_dsn, channel)
+        self._task = asyncio.create_task(self._run(session_factory, reload_interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._listen_conn is not None:
+            try:
+                await self._listen_conn.close()
+            except Exception:
+                logger.exception("Error closing poison matcher listen connection")
+            self._listen_conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "loaded": snapshot is not None,
+            "version": self._version,
+            "poisons": len(snapshot.payloads) if snapshot else 0,
+            "patterns": snapshot.patterns if snapshot else 0,
+            "loaded_at": self._loaded_at,
+            "reloads": self._reloads,
+            "reload_failures": self._reload_failures,
+            "notifications": self._notifications,
+            "listening": self._listen_conn is not None,
+        }
+
+
+_default_matcher: Optional[PoisonMatcher] = None
+
+
+def get_poison_matcher() -> PoisonMatcher:
+    """Return the process-wide matcher (possibly not loaded yet)."""
+    global _default_matcher
+    if _default_matcher is None:
+        _default_matcher = PoisonMatcher()
+    return _default_matcher
+
+
+async def start_poison_matcher() -> PoisonMatcher:
+    """Start the shared matcher using `poison_reload_interval_seconds` / `poison_notify_channel`."""
+    from app.models.db_session import AsyncSessionLocal, DATABASE_URL
+
+    matcher = get_poison_matcher()
+    await matcher.start(
+        AsyncSessionLocal,
+        reload_interval=float(get_config_option("poison_reload_interval_seconds", 300)),
+        listen_dsn=DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1),
+        channel=get_config_option("poison_notify_channel", DEFAULT_CHANNEL) or "",
+    )
+    return matcher
+
+
+async def stop_poison_matcher() -> None:
+    if _default_matcher is not None:
+        await _default_matcher.stop()
@@ -0,0 +1,126 @@
+"""Image preprocessing for the vision encoder.
+
+`ImagePreprocessor` is built once and reused for every request. Compared with
+rebuilding a `transforms.Compose` per call and fully decoding the upload it:
+
+- rejects images whose header reports more than `max_pixels` pixels before
+  any pixel data is decoded,
+- asks the JPEG decoder for a reduced-size (DCT-scaled) decode via
+  `Image.draft`, so no more pixels are decoded than the target short side
+  needs, and shrinks other formats with `Image.reduce`,
+- resizes and crops on the uint8 tensor and folds ToTensor's /255 and
+  Normalize into one multiply-add on the final 224x224 crop.
+"""
+
+import math
+from typing import Optional, Sequence
+
+import numpy as np
+import torch
+from PIL import Image, UnidentifiedImageError
+from torchvision.transforms.v2 import functional as F
+from fastapi.logger import logger
+
+from .exceptions import AIServiceError
+from .utils import get_config_option
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+DEFAULT_MAX_PIXELS = 50_000_000
+
+
+class ImagePreprocessor:
+    """Decode an image file into a normalized (3, crop, crop) float tensor.
+
+    Args:
+        resize: Target length of the short side before cropping.
+        crop: Side of the center crop fed to the model.
+        mean: Per-channel normalization mean.
+        std: Per-channel normalization std.
+        max_pixels: Largest accepted width * height.
+
+    Examples:
+        >>> pre = ImagePreprocessor()
+        >>> pre.load("photo.jpg").shape
+        torch.Size([3, 224, 224])
+    """
+
+    def __init__(
+        self,
+        resize: int = 256,
+        crop: int = 224,
+        mean: Sequence[float] = IMAGENET_MEAN,
+        std: Sequence[float] = IMAGENET_STD,
+        max_pixels: int = DEFAULT_MAX_PIXELS,
+    ) -> None:
+        if crop > resize:
+            raise ValueError("crop must not exceed resize")
+        self.resize = resize
+        self.crop = crop
+        self.max_pixels = max_pixels
+        std_t = torch.tensor(std, dtype=torch.float32).view(3, 1, 1)
+        mean_t = torch.tensor(mean, dtype=torch.float32).view(3, 1, 1)
+        # (x / 255 - mean) / std == x * scale + bias
+        self._scale = 1.0 / (255.0 * std_t)
+        self._bias = -mean_t / std_t
+
+    def _decode(self, img: Image.Image) -> Image.Image:
+        """Decode at the smallest scale that still covers the target short side."""
+        w, h = img.size
+        short = min(w, h)
+        if img.format == "JPEG" and short > self.resize:
+            scale = self.resize / short
+            # draft() picks the largest 1/2, 1/4, 1/8 reduction >= the requested size
+            img.draft("RGB", (math.ceil(w * scale), math.ceil(h * scale)))
+        img = img.convert("RGB")
+        factor = min(img.size) // self.resize
+        if factor >= 2:
+            img = img.reduce(factor)
+        return img
+
+    def to_tensor(self, img: Image.Image) -> torch.Tensor:
+        """Resize/crop a decoded RGB image as uint8 and normalize the crop."""
+        t = torch.from_numpy(np.array(img)).permute(2, 0, 1)
+        t = F.resize(t, [self.resize], antialias=True)
+        t = F.center_crop(t, [self.crop, self.crop])
+        return t.float().mul_(self._scale).add_(self._bias)
+
+    def load(self, image_path: str) -> torch.Tensor:
+        """Open, validate and preprocess `image_path`.
+
+        Raises:
+            AIServiceError: when the file is missing, not an image, larger than
+                `max_pixels`, or cannot be decoded.
+        """
+        try:
+            with Image.open(image_path) as img:
+                w, h = img.size
+                if w * h > self.max_pixels:
+                    logger.warning("Rejecting %dx%d image %s (max %d pixels)", w, h, image_path, self.max_pixels)
+                    raise AIServiceError(f"Image too large: {w}x{h} pixels (max {self.max_pixels})")
+                rgb = self._decode(img)
+        except AIServiceError:
+            raise
+        except FileNotFoundError as e:
+            logger.error("Image file not found: %s", image_path)
+            raise AIServiceError(f"Image file not found: {image_path}") from e
+        except UnidentifiedImageError as e:
+            logger.error("Cannot identify image file: %s", image_path)
+            raise AIServiceError(f"Cannot identify image file: {image_path}") from e
+        except Exception as e:
+            logger.exception("Unexpected error opening image %s", image_path)
+            raise AIServiceError(str(e)) from e
+        return self.to_tensor(rgb)
+
+
+_default_preprocessor: Optional[ImagePreprocessor] = None
+
+
+def get_preprocessor() -> ImagePreprocessor:
+    """Return the shared preprocessor (limit from `max_image_pixels` in config)."""
+    global _default_preprocessor
+    if _default_preprocessor is None:
+        _default_preprocessor = ImagePreprocessor(
+            max_pixels=int(get_config_option("max_image_pixels", DEFAULT_MAX_PIXELS))
+        )
+    return _default_preprocessor
@@ -0,0 +1,258 @@
+"""Process-pool inference executor with shared-memory tensor/embedding transfer.
+
+Each worker process owns its own `im2recipe` instance (loaded through
+`ai_service.load_model` in the pool initializer) and a pinned torch thread
+count, so image decoding, transforms and the forward pass run outside the
+API process and its GIL.
+
+Embeddings never travel through pickle: the parent owns a fixed set of
+`SharedMemory` slots. A call borrows a slot and sends only the slot name
+and the image paths to the worker. The worker writes the embeddings into
+the slot, where the parent copies them out before releasing the slot. A
+slot whose caller was cancelled is released only when its worker finishes,
+so a late write never lands in a slot another call has borrowed.
+
+Every image of a batch is decoded on its own: an unreadable or oversized
+upload fails only its own item, not the callers it was batched with.
+"""
+
+import asyncio
+import functools
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import torch
+from fastapi.logger import logger
+
+from .exceptions import AIServiceError
+
+_ITEMSIZE = np.dtype(np.float32).itemsize
+
+# per-item result of a batch: the embedding, or the error of that image alone
+EmbeddingOrError = Union[np.ndarray, AIServiceError]
+
+
+def _slot_view(buf, max_batch: int, emb_dim: int) -> np.ndarray:
+    """Return the (max_batch, emb_dim) float32 embedding view over one shared-memory slot."""
+    return np.ndarray((max_batch, emb_dim), dtype=np.float32, buffer=buf)
+
+
+def _attach(name: str) -> SharedMemory:
+    """Attach to a segment owned (and eventually unlinked) by the parent."""
+    try:
+        return SharedMemory(name=name, track=False)  # Python >= 3.13
+    except TypeError:
+        # Older versions register the segment again, but spawned workers share
+        # the parent's resource tracker, so the registration is a no-op.
+        return SharedMemory(name=name)
+
+
+# -------------------------
+# Worker-process side
+# -------------------------
+_worker_segments: Dict[str, SharedMemory] = {}
+
+
+def _init_worker(config_path: Optional[str], torch_threads: int, model_loader: Optional[Callable[[Optional[str]], None]]) -> None:
+    """Pool initializer: pin torch threads and load a private model copy."""
+    torch.set_num_threads(max(1, torch_threads))
+    if model_loader is None:
+        from . import ai_service
+
+        model_loader = ai_service.load_model
+    model_loader(config_path)
+
+
+def _worker_view(shm_name: str, max_batch: int, emb_dim: int) -> np.ndarray:
+    shm = _worker_segments.get(shm_name)
+    if shm is None:
+        shm = _attach(shm_name)
+        _worker_segments[shm_name] = shm
+    return _slot_view(shm.buf, max_batch, emb_dim)
+
+
+def _worker_embed_paths(shm_name: str, max_batch: int, emb_dim: int, paths: List[str]) -> List[Optional[str]]:
+    """Decode `paths` one by one, embed the decodable ones and write them into the slot.
+
+    Returns one entry per path: None when its embedding is in the slot row
+    of the same index, else the decode error message.
+    """
+    from . import ai_service
+
+    errors: List[Optional[str]] = []
+    tensors, rows = [], []
+    for i, path in enumerate(paths):
+        try:
+            tensors.append(ai_service.load_image_tensor(path))
+            rows.append(i)
+            errors.append(None)
+        except Exception as e:
+            errors.append(str(e) or type(e).__name__)
+    if tensors:
+        outputs = _worker_view(shm_name, max_batch, emb_dim)
+        outputs[rows] = ai_service.embed_batch(torch.stack(tensors))
+    return errors
+
+
+# -------------------------
+# Parent side
+# -------------------------
+def _release_abandoned_slot(free: asyncio.Queue, idx: int, fut: asyncio.Future) -> None:
+    """Return the slot of a cancelled call once its worker finished writing into it."""
+    if not fut.cancelled():
+        fut.exception()  # retrieved; the caller is gone
+    free.put_nowait(idx)
+
+
+class ProcessInferenceExecutor:
+    """Run image embedding in N worker processes.
+
+    Args:
+        num_workers: Number of worker processes (each loads its own model).
+        torch_threads: `torch.set_num_threads` value inside each worker.
+        max_batch_size: Largest batch a single call may carry.
+        emb_dim: Embedding dimension written back by workers.
+        config_path: Optional config path forwarded to `load_model` in workers.
+        model_loader: Picklable replacement for `ai_service.load_model`, called
+            with `config_path` in every worker (tests and benchmarks load
+            small models this way).
+
+    Examples:
+        >>> ex = ProcessInferenceExecutor(num_workers=4, torch_threads=2)
+        >>> ex.start()
+        >>> emb = await ex.embed_path("/tmp/upload.jpg")
+    """
+
+    def __init__(
+        self,
+        num_workers: int = 2,
+        torch_threads: int = 1,
+        max_batch_size: int = 8,
+        emb_dim: int = 1024,
+        config_path: Optional[str] = None,
+        model_loader: Optional[Callable[[Optional[str]], None]] = None,
+    ) -> None:
+        if num_workers < 1:
+            raise ValueError("num_workers must be >= 1")
+        self.num_workers = num_workers
+        self.torch_threads = torch_threads
+        self.max_batch_size = max(1, max_batch_size)
+        self.emb_dim = emb_dim
+        self._config_path = config_path
+        self._model_loader = model_loader
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._segments: List[SharedMemory] = []
+        self._free: Optional[asyncio.Queue] = None
+        self._free_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def slot_bytes(self) -> int:
+        return self.max_batch_size * self.emb_dim * _ITEMSIZE
+
+    def start(self) -> None:
+        """Allocate shared-memory slots and spawn the worker processes."""
+        if self._pool is not None:
+            return
+        # two slots per worker keep every process busy while the parent copies results out
+        self._segments = [SharedMemory(create=True, size=self.slot_bytes) for _ in range(2 * self.num_workers)]
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            # fork is unsafe once torch has started its own threads
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self._config_path, self.torch_threads, self._model_loader),
+        )
+        logger.info(
+            "Started %d inference processes (torch_threads=%d, %d shm slots x %d bytes)",
+            self.num_workers, self.torch_threads, len(self._segments), self.slot_bytes,
+        )
+
+    def shutdown(self) -> None:
+        """Stop worker processes and release shared memory."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        for shm in self._segments:
+            try:
+                shm.close()
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._segments = []
+        self._free = None
+
+    def _free_slots(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._free is None or self._free_loop is not loop:
+            self._free = asyncio.Queue()
+            self._free_loop = loop
+            for idx in range(len(self._segments)):
+                self._free.put_nowait(idx)
+        return self._free
+
+    async def embed_paths(self, paths: Sequence[str]) -> List[EmbeddingOrError]:
+        """Decode, transform and embed image files inside a worker process.
+
+        Returns one entry per path: its embedding, or an `AIServiceError` when
+        that image alone could not be decoded.
+
+        Raises:
+            AIServiceError: when the executor is not started, the worker died or
+                the forward pass failed (the whole batch fails then).
+        """
+        paths = list(paths)
+        self._check_batch(len(paths))
+        if self._pool is None:
+            raise AIServiceError("Process inference executor is not started")
+        free = self._free_slots()
+        idx = await free.get()
+        handed_over = False
+        try:
+            shm = self._segments[idx]
+            loop = asyncio.get_running_loop()
+            fut = loop.run_in_executor(
+                self._pool, _worker_embed_paths, shm.name, self.max_batch_size, self.emb_dim, paths
+            )
+            try:
+                errors = await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                if not fut.done():
+                    # the worker keeps writing into the slot; it is returned
+                    # only once the worker is done with it
+                    fut.add_done_callback(functools.partial(_release_abandoned_slot, free, idx))
+                    handed_over = True
+                raise
+            except AIServiceError:
+                raise
+            except BrokenProcessPool as e:
+                logger.error("Inference worker process died: %s", e)
+                raise AIServiceError("Inference worker process died") from e
+            except Exception as e:
+                raise AIServiceError(str(e)) from e
+            outputs = _slot_view(shm.buf, self.max_batch_size, self.emb_dim)
+            return [
+                np.array(outputs[i], copy=True) if err is None else AIServiceError(err)
+                for i, err in enumerate(errors)
+            ]
+        finally:
+            if not handed_over:
+                free.put_nowait(idx)
+
+    async def embed_path(self, path: str) -> np.ndarray:
+        """Embed one image file inside a worker process.
+
+        Raises:
+            AIServiceError: when the image cannot be decoded or inference fails.
+        """
+        [emb] = await self.embed_paths([path])
+        if isinstance(emb, AIServiceError):
+            raise emb
+        return emb
+
+    def _check_batch(self, n: int) -> None:
+        if n < 1 or n > self.max_batch_size:
+            raise ValueError(f"batch size {n} outside 1..{self.max_batch_size}")
@@ -1,15 +1,38 @@
 from typing import Tuple, List, Dict, Optional, Callable, Any
 import asyncio
+import math
 import os
+import time
+from collections import deque
+import numpy as np
 from fastapi.logger import logger
 
-from .ai_service import image_to_embedding
-from .db_service import find_poisons_in_recipe, find_top_k_recipes
+from .ai_service import image_to_embedding, batching_enabled, embed_image, inference_mode, decode_image, embed_decoded_batch
+from .batch_service import MicroBatcher
+from .db_service import (
+    find_poisons_for_embedding,
+    find_poisons_in_recipe,
+    find_poisons_in_recipe_indexed,
+    find_poisons_in_recipes,
+    find_poisons_in_recipes_indexed,
+    find_poisons_indexed,
+    find_poisons_indexed_batch,
+    poison_lookup,
+)
+from .poison_matcher import get_poison_matcher
+from .vector_search import PgVectorBackend, get_vector_backend
+from .cache_service import ResultCache, get_result_cache
+from .pipeline import StagedPipeline
+from .scheduler import FairShareQueue
+from .stage_meter import get_stage_meter
+from .exceptions import QueueFullError
+from .utils import get_config_option
 from app.models.db_session import AsyncSessionLocal
 from app.services.task.task_service import (
     save_task_result,
     update_task_status,
     increment_retries,
+    get_default_store,
 )
 from app.schemas.task import TaskStatus
 
@@ -19,37 +42,281 @@ class QueueManager:
 
     This class encapsulates queue creation and exposes enqueue/get operations. Tests
     can instantiate their own QueueManager and pass a custom process callback to workers.
+
+    Enqueue times are kept per task id so the age of the oldest waiting
+    task and the mean wait of recently dequeued tasks can be reported.
+
+    With `max_depth` > 0 the queue is bounded: `admit` and `enqueue` raise
+    `QueueFullError` once that many tasks are waiting, carrying a retry hint
+    derived from the drain rate (dequeues per second over the last
+    `drain_window` seconds). With `max_per_client` > 0 a single client
+    (`TaskInput.client_id`) may have at most that many tasks waiting, so one
+    flooding client cannot take every slot of a bounded queue.
+
+    Args:
+        max_depth: Maximum number of waiting tasks; 0 means unbounded.
+        drain_window: Seconds of dequeue history used for the drain rate.
+        max_retry_after: Upper bound for the retry hint in seconds.
+        queue: Queue to wrap, e.g. a `FairShareQueue`; a FIFO `asyncio.Queue`
+            by default.
+        max_per_client: Maximum number of waiting tasks per client; 0 means
+            no per-client limit.
     """
 
-    def __init__(self):
-        self._queue: asyncio.Queue = asyncio.Queue()
+    def __init__(
+        self,
+        max_depth: int = 0,
+        drain_window: float = 30.0,
+        max_retry_after: int = 60,
+        queue: Optional[asyncio.Queue] = None,
+        max_per_client: int = 0,
+    ):
+        if max_depth < 0 or max_per_client < 0:
+            raise ValueError("max_depth and max_per_client must be >= 0")
+        if drain_window <= 0:
+            raise ValueError("drain_window must be positive")
+        self._queue: asyncio.Queue = queue if queue is not None else asyncio.Queue()
+        self.max_depth = int(max_depth)
+        self.max_per_client = int(max_per_client)
+        self.drain_window = float(drain_window)
+        self.max_retry_after = max(1, int(max_retry_after))
+        self._started = time.monotonic()
+        self._dequeue_times: deque = deque()
+        # task_id -> enqueue time, in enqueue order; (dequeue time, wait) pairs
+        self._enqueued_at: Dict[str, float] = {}
+        self._waits: deque = deque()
+        # task_id -> client of waiting tasks, and waiting tasks per client
+        self._task_clients: Dict[str, str] = {}
+        self._client_depth: Dict[str, int] = {}
+        self._enqueued = 0
+        self._dequeued = 0
+        self._rejected = 0
 
     def ensure(self) -> asyncio.Queue:
         return self._queue
 
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def _trim(self, now: float) -> None:
+        cutoff = now - self.drain_window
+        while self._dequeue_times and self._dequeue_times[0] < cutoff:
+            self._dequeue_times.popleft()
+        while self._waits and self._waits[0][0] < cutoff:
+            self._waits.popleft()
+
+    def note_dequeued(self, task_id: Optional[str] = None) -> None:
+        """Record that a worker took an item; feeds the drain rate and wait times."""
+        now = time.monotonic()
+        self._dequeued += 1
+        self._dequeue_times.append(now)
+        enqueued_at = self._enqueued_at.pop(task_id, None) if task_id is not None else None
+        client = self._task_clients.pop(task_id, None) if task_id is not None else None
+        if client is not None:
+            left = self._client_depth[client] - 1
+            if left:
+                self._client_depth[client] = left
+            else:
+                del self._client_depth[client]
+        if enqueued_at is not None:
+            self._waits.append((now, now - enqueued_at))
+        self._trim(now)
+
+    def oldest_wait(self) -> float:
+        """Seconds the oldest still-waiting task has been queued (0 when empty)."""
+        if not self._enqueued_at:
+            return 0.0
+        return time.monotonic() - next(iter(self._enqueued_at.values()))
+
+    def mean_wait(self) -> float:
+        """Mean queue wait in seconds of tasks dequeued within the drain window."""
+        self._trim(time.monotonic())
+        if not self._waits:
+            return 0.0
+        return sum(w for _, w in self._waits) / len(self._waits)
+
+    def drain_rate(self) -> float:
+        """Dequeues per second over the drain window (shorter right after start)."""
+        now = time.monotonic()
+        self._trim(now)
+        span = min(self.drain_window, now - self._started)
+        return len(self._dequeue_times) / span if span > 0 else 0.0
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog is expected to drain, clamped to [1, max_retry_after]."""
+        return self.retry_after_for(self.depth(), self.drain_rate())
+
+    def retry_after_for(self, depth: int, rate: float) -> int:
+        """Seconds `depth` queued tasks take to drain at `rate` per second, clamped like `retry_after`."""
+        if rate <= 0:
+            return self.max_retry_after
+        return max(1, min(self.max_retry_after, math.ceil(depth / rate)))
+
+    def full(self) -> bool:
+        return self.max_depth > 0 and self.depth() >= self.max_depth
+
+    def client_depth(self, client_id: str) -> int:
+        """Number of waiting tasks of `client_id`."""
+        return self._client_depth.get(client_id, 0)
+
+    def admit(self, client_id: Optional[str] = None) -> None:
+        """Raise `QueueFullError` (and count a rejection) when no slot is free for `client_id`."""
+        if self.full():
+            self.reject(self.retry_after())
+        if self.max_per_client > 0 and client_id and self.client_depth(client_id) >= self.max_per_client:
+            self.reject(self.retry_after())
+
+    def reject(self, retry_after: int) -> None:
+        """Count a rejection and raise `QueueFullError` with `retry_after`."""
+        self._rejected += 1
+        raise QueueFullError(retry_after)
+
     async def enqueue(self, task_id: str, file_tuple: Tuple[str, str, str]) -> None:
         """Put a task into the in-memory queue.
 
         Args:
             task_id: Task identifier.
             file_tuple: Expected (tmp_path, filename, content_type).
+
+        Raises:
+            QueueFullError: when the queue is at `max_depth`, or the task's
+                client already has `max_per_client` tasks waiting.
         """
-        await self._queue.put((task_id, file_tuple))
+        client_id = getattr(file_tuple, "client_id", None)
+        self.admit(client_id)
+        self._queue.put_nowait((task_id, file_tuple))
+        self._enqueued_at[task_id] = time.monotonic()
+        if client_id:
+            self._task_clients[task_id] = client_id
+            self._client_depth[client_id] = self._client_depth.get(client_id, 0) + 1
+        self._enqueued += 1
 
     async def get(self) -> Tuple[str, str, str]:
-        return await self._queue.get()
+        item = await self._queue.get()
+        self.note_dequeued(item[0])
+        return item
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "depth": self.depth(),
+            "max_depth": self.max_depth,
+            "max_per_client": self.max_per_client,
+            "clients_queued": len(self._client_depth),
+            "drain_rate": self.drain_rate(),
+            "retry_after": self.retry_after(),
+            "oldest_wait_ms": round(self.oldest_wait() * 1000.0, 1),
+            "mean_wait_ms": round(self.mean_wait() * 1000.0, 1),
+            "enqueued": self._enqueued,
+            "dequeued": self._dequeued,
+            "rejected": self._rejected,
+        }
+        if isinstance(self._queue, FairShareQueue):
+            stats["scheduler"] = self._queue.stats()
+        return stats
+
+
+class InFlightRegistry:
+    """Single-flight table of analyses that are queued or running.
+
+    Keyed by upload content hash. The first task for a hash (the leader) is
+    enqueued normally; identical uploads arriving before it finishes are
+    recorded as followers and receive the leader's result under their own
+    task ids instead of being processed again. This complements the result
+    cache, which only helps once a result exists.
+    """
+
+    def __init__(self) -> None:
+        self._followers: Dict[str, List[str]] = {}
+        self._coalesced = 0
+
+    def attach(self, key: str, task_id: str) -> bool:
+        """Attach `task_id` to an in-flight analysis of `key`.
+
+        Returns:
+            True when a leader exists and the task was attached; False otherwise.
+        """
+        followers = self._followers.get(key)
+        if followers is None:
+            return False
+        followers.append(task_id)
+        self._coalesced += 1
+        return True
+
+    def is_in_flight(self, key: str) -> bool:
+        return key in self._followers
+
+    def begin(self, key: str) -> None:
+        """Register a leader for `key` so later identical tasks can attach."""
+        self._followers.setdefault(key, [])
+
+    def finish(self, key: str) -> List[str]:
+        """Remove `key` and return the task ids that attached to it."""
+        return self._followers.pop(key, [])
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._followers),
+            "waiting_followers": sum(len(v) for v in self._followers.values()),
+            "coalesced": self._coalesced,
+        }
 
 
 _default_queue_manager: Optional[QueueManager] = None
+_default_inflight: Optional[InFlightRegistry] = None
+
+
+def _make_task_queue() -> asyncio.Queue:
+    """Build the queue selected by `queue_scheduler` (``"fifo"`` or ``"fair"``)."""
+    kind = str(get_config_option("queue_scheduler", "fifo"))
+    if kind == "fair":
+        return FairShareQueue(
+            weights=get_config_option("queue_client_weights", {}) or {},
+            shortest_first=bool(get_config_option("queue_shortest_first", False)),
+        )
+    if kind != "fifo":
+        logger.warning("Unknown queue_scheduler %r; falling back to 'fifo'", kind)
+    return asyncio.Queue()
 
 
 def get_default_queue_manager() -> QueueManager:
     global _default_queue_manager
     if _default_queue_manager is None:
-        _default_queue_manager = QueueManager()
+        _default_queue_manager = QueueManager(
+            max_depth=int(get_config_option("queue_max_depth", 0)),
+            drain_window=float(get_config_option("queue_drain_window_seconds", 30)),
+            max_retry_after=int(get_config_option("queue_retry_after_max_seconds", 60)),
+            queue=_make_task_queue(),
+            max_per_client=int(get_config_option("queue_max_per_client", 0)),
+        )
     return _default_queue_manager
 
 
+def get_inflight_registry() -> InFlightRegistry:
+    global _default_inflight
+    if _default_inflight is None:
+        _default_inflight = InFlightRegistry()
+    return _default_inflight
+
+
+def _remove_temp_file(tmp_path: Optional[str]) -> None:
+    if tmp_path:
+        try:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        except Exception:
+            logger.warning("Failed to remove temp file %s", tmp_path)
+
+
+async def _fail_tasks(task_ids: List[str], err_str: str, update_status_fn: Callable[..., Any]) -> None:
+    for failed_id in task_ids:
+        try:
+            # False: the failure was not recorded (e.g. a lost DB claim); leave the task alone
+            if await update_status_fn(failed_id, TaskStatus.failed, last_error=err_str) is not False:
+                await increment_retries(failed_id)
+        except Exception:
+            logger.exception("Failed to update task status for %s", failed_id)
+
+
 async def process_task_item(
     task_id: str,
     file_tuple: Tuple[str, str, str],
@@ -57,41 +324,70 @@ async def process_task_item(
     request_ai_fn: Optional[Callable[..., Any]] = None,
     save_fn: Optional[Callable[..., Any]] = None,
     update_status_fn: Optional[Callable[..., Any]] = None,
+    result_cache: Optional[ResultCache] = None,
+    inflight: Optional[InFlightRegistry] = None,
 ) -> None:
     """Process one queued task.
 
     Args:
         task_id: Task identifier.
-        file_tuple: Expected tuple (tmp_path, filename, content_type).
+        file_tuple: Expected tuple (tmp_path, filename, content_type) or a
+            `TaskInput`; when it carries a `content_hash` the result is stored
+            in the result cache.
         request_ai_fn: Optional override for AI request function.
         save_fn: Optional override for result save function.
         update_status_fn: Optional override for status update function.
+        result_cache: Optional override for the result cache.
+        inflight: Optional override for the single-flight registry; tasks that
+            attached to this one receive the same result or failure.
     """
     tmp_path: Optional[str] = None
     request_ai_fn = request_ai_fn or request_ai_analysis
     save_fn = save_fn or save_task_result
     update_status_fn = update_status_fn or update_task_status
+    inflight = inflight or get_inflight_registry()
+    content_hash = getattr(file_tuple, "content_hash", None)
+    # tasks still owed a result or a failure; followers are taken from the
+    # registry exactly once
+    owed: List[str] = [task_id]
+    followers_taken = not content_hash
     try:
-        tmp_path, filename, content_type = file_tuple
+        tmp_path, filename, content_type = file_tuple[:3]
         ai_result = await request_ai_fn(tmp_path, timeout=15.0, top_k=10)
         await save_fn(task_id, ai_result)
+        owed = []
+        if content_hash:
+            owed, followers_taken = inflight.finish(content_hash), True
+            try:
+                await (result_cache or get_result_cache()).put(content_hash, ai_result)
+            except Exception:
+                logger.exception("Failed to cache result of %s", task_id)
+            while owed:
+                follower_id = owed[0]
+                try:
+                    await save_fn(follower_id, ai_result)
+                except Exception as e:
+                    logger.exception("Failed to save result for attached task %s", follower_id)
+                    await _fail_tasks([follower_id], str(e), update_status_fn)
+                owed.pop(0)
         logger.info("AI analysis complete for %s", task_id)
     except Exception as e:  # capture any runtime error and persist status
         err_str = str(e)
-        try:
-            await update_status_fn(task_id, TaskStatus.failed, last_error=err_str)
-            await increment_retries(task_id)
-        except Exception:
-            logger.exception("Failed to update task status for %s", task_id)
+        if not followers_taken:
+            owed += inflight.finish(content_hash)
+        await _fail_tasks(owed, err_str, update_status_fn)
         logger.error("AI analyze error for %s: %s", task_id, err_str)
+    except BaseException:
+        # cancelled (e.g. worker shutdown): release the single-flight entry so
+        # later uploads are not attached to a leader that will never finish
+        if not followers_taken:
+            owed += inflight.finish(content_hash)
+        logger.warning("AI analysis cancelled for %s (%d waiting tasks failed)", task_id, len(owed))
+        await _fail_tasks(owed, "analysis cancelled", update_status_fn)
+        raise
     finally:
         # ensure temporary file is removed if it exists
-        if tmp_path:
-            try:
-                if os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
-            except Exception:
-                logger.warning("Failed to remove temp file %s", tmp_path)
+        _remove_temp_file(tmp_path)
 
 
 async def run_analysis_task(task_id: str, file_tuple: Tuple[str, str, str]):
@@ -104,6 +400,8 @@ async def run_analysis_task(task_id: str, file_tuple: Tuple[str, str, str]):
 
 # Global semaphore for request_ai_analysis
 _request_ai_analysis_semaphore: Optional[asyncio.Semaphore] = None
+_search_batcher: Optional[MicroBatcher] = None
+_analysis_pipeline: Optional[StagedPipeline] = None
 
 async def request_ai_analysis(
     tmp_path: str,
@@ -112,9 +410,17 @@ async def request_ai_analysis(
 ) -> List[Dict[str, str]]:
     """Run the AI analysis pipeline for a single image file.
 
-    The function serializes calls to the computation-bound embedding extraction using a
-    module-level semaphore to avoid contention.
+    When `inference_batch_size` > 1 or `inference_mode` is ``"process"`` the
+    embedding is computed through `ai_service.embed_image`; otherwise calls to
+    the computation-bound embedding extraction are serialized with a
+    module-level semaphore.
+
+    With `pipeline_stages` enabled the image goes through the staged
+    pipeline instead (see `get_analysis_pipeline`).
     """
+    if pipeline_enabled():
+        return await get_analysis_pipeline().submit((tmp_path, top_k))
+
     # Semaphore ensures image_to_embedding is run serially to avoid heavy CPU contention
     # TODO: Verify that using a global semaphore and run_in_executor for image_to_embedding
     # is appropriate when model inference runs on GPU. Things to check and consider:
@@ -127,26 +433,228 @@ async def request_ai_analysis(
     # - If continuing to use run_in_executor, test PyTorch/CUDA behavior in multithreaded contexts
     #   and switch to multiprocessing or an external inference service if necessary.
     global _request_ai_analysis_semaphore
-    if _request_ai_analysis_semaphore is None:
-        _request_ai_analysis_semaphore = asyncio.Semaphore(1)
+    if batching_enabled() or inference_mode() == "process":
+        # The micro-batcher serializes forward passes and groups images from
+        # concurrent workers; the process executor bounds concurrency by its
+        # shared-memory slots. Neither needs the semaphore.
+        async with get_stage_meter("embed"):
+            query_emb = await embed_image(tmp_path)
+    else:
+        if _request_ai_analysis_semaphore is None:
+            _request_ai_analysis_semaphore = asyncio.Semaphore(1)
+
+        async with _request_ai_analysis_semaphore:
+            # image_to_embedding is blocking; run in executor to avoid blocking the event loop
+            async with get_stage_meter("embed", capacity=1):
+                loop = asyncio.get_running_loop()
+                query_emb = await loop.run_in_executor(None, image_to_embedding, tmp_path)
+
+    async with get_stage_meter("search"):
+        return await find_poisons(query_emb, top_k=top_k)
+
 
-    async with _request_ai_analysis_semaphore:
-        # image_to_embedding is blocking; run in executor to avoid blocking the event loop
-        loop = asyncio.get_running_loop()
-        query_emb = await loop.run_in_executor(None, image_to_embedding, tmp_path)
+async def find_poisons(query_emb, top_k: int = 10) -> List[Dict[str, str]]:
+    """Top-k recipe search plus poison lookup for one query embedding.
 
-    # Query DB for top-k recipes and find poisons
+    With `search_batch_size` > 1 the embedding joins the search collector,
+    which issues one multi-query search for everything that arrived within
+    `search_batch_wait_ms`. Otherwise a single-query search runs directly.
+    """
+    if search_batching_enabled():
+        return await get_search_batcher().submit((query_emb, top_k))
+    backend = get_vector_backend()
     async with AsyncSessionLocal() as db:
-        topk = await find_top_k_recipes(db, query_emb, top_k=top_k)
-        poisons = await find_poisons_in_recipe(db, topk)
-        return poisons
+        if isinstance(backend, PgVectorBackend):
+            # search and lookup run in the same SQL statement
+            if poison_lookup() == "index":
+                return await find_poisons_indexed(db, query_emb, top_k=top_k)
+            return await find_poisons_for_embedding(db, query_emb, top_k=top_k, matcher=get_poison_matcher())
+        topk = await backend.search(query_emb, top_k=top_k)
+        if poison_lookup() == "index":
+            return await find_poisons_in_recipe_indexed(db, topk)
+        return await find_poisons_in_recipe(db, topk, matcher=get_poison_matcher())
+
+
+async def find_poisons_many(query_embs: np.ndarray, top_k: int = 10) -> List[List[Dict[str, str]]]:
+    """`find_poisons` for a batch of embeddings with one search statement.
+
+    pgvector + ``"index"`` lookup is a single statement for the whole batch;
+    other combinations use one multi-query search plus one `IN` lookup over
+    the union of the returned ids.
+    """
+    backend = get_vector_backend()
+    async with AsyncSessionLocal() as db:
+        if isinstance(backend, PgVectorBackend) and poison_lookup() == "index":
+            return await find_poisons_indexed_batch(db, query_embs, top_k=top_k)
+        topks = await backend.search_batch(query_embs, top_k=top_k, db=db)
+        if poison_lookup() == "index":
+            return await find_poisons_in_recipes_indexed(db, topks)
+        return await find_poisons_in_recipes(db, topks, matcher=get_poison_matcher())
+
+
+async def _find_poisons_batch(items: List[Tuple[np.ndarray, int]]) -> List[List[Dict[str, str]]]:
+    results: List[List[Dict[str, str]]] = [[] for _ in items]
+    by_top_k: Dict[int, List[int]] = {}
+    for i, (_, top_k) in enumerate(items):
+        by_top_k.setdefault(top_k, []).append(i)
+    for top_k, idxs in by_top_k.items():
+        found = await find_poisons_many(np.stack([items[i][0] for i in idxs]), top_k=top_k)
+        for i, poisons in zip(idxs, found):
+            results[i] = poisons
+    return results
+
+
+def pipeline_enabled() -> bool:
+    """True when `pipeline_stages` asks for the staged decode/infer/db pipeline."""
+    return bool(get_config_option("pipeline_stages", False))
+
+
+async def _decode_stage(item: Tuple[str, int]) -> Tuple[Any, int]:
+    tmp_path, top_k = item
+    return await decode_image(tmp_path), top_k
+
+
+async def _infer_stage(items: List[Tuple[Any, int]]) -> List[Any]:
+    embs = await embed_decoded_batch([decoded for decoded, _ in items])
+    return [emb if isinstance(emb, Exception) else (emb, top_k) for emb, (_, top_k) in zip(embs, items)]
+
+
+async def _db_stage(item: Tuple[np.ndarray, int]) -> List[Dict[str, str]]:
+    query_emb, top_k = item
+    return await find_poisons(query_emb, top_k=top_k)
+
+
+def get_analysis_pipeline() -> StagedPipeline:
+    """Return the process-wide decode -> infer -> db pipeline.
+
+    - decode: image decode and transform on a CPU thread pool
+      (`pipeline_decode_concurrency` threads and runners);
+    - infer: model forward on the model pool or process executor
+      (`pipeline_infer_concurrency`); each runner embeds up to
+      `inference_batch_size` waiting images in one forward pass;
+    - db: recipe search and poison lookup as async tasks
+      (`pipeline_db_concurrency`).
+
+    Stages are connected by queues of `pipeline_queue_size` items.
+    """
+    global _analysis_pipeline
+    if _analysis_pipeline is None:
+        _analysis_pipeline = StagedPipeline(
+            [
+                ("decode", _decode_stage, int(get_config_option("pipeline_decode_concurrency", 2))),
+                (
+                    "infer", _infer_stage, int(get_config_option("pipeline_infer_concurrency", 1)),
+                    int(get_config_option("inference_batch_size", 1)) if batching_enabled() else 1,
+                ),
+                ("db", _db_stage, int(get_config_option("pipeline_db_concurrency", 8))),
+            ],
+            queue_size=int(get_config_option("pipeline_queue_size", 16)),
+            name="analysis",
+        )
+    return _analysis_pipeline
+
+
+async def stop_analysis_pipeline() -> None:
+    """Stop the pipeline's stage runners and thread pools if they were started."""
+    from .ai_service import shutdown_stage_executors
+
+    if _analysis_pipeline is not None:
+        await _analysis_pipeline.stop()
+    shutdown_stage_executors()
+
+
+def search_batching_enabled() -> bool:
+    """True when the config asks for search batches larger than one."""
+    return int(get_config_option("search_batch_size", 1)) > 1
+
+
+def get_search_batcher() -> MicroBatcher:
+    """Return the process-wide collector for `(embedding, top_k)` search requests."""
+    global _search_batcher
+    if _search_batcher is None:
+        _search_batcher = MicroBatcher(
+            _find_poisons_batch,
+            max_batch_size=int(get_config_option("search_batch_size", 1)),
+            max_wait_ms=float(get_config_option("search_batch_wait_ms", 5.0)),
+            name="search",
+        )
+    return _search_batcher
+
+
+async def stop_search_batcher() -> None:
+    """Stop the search collector task if it was started."""
+    if _search_batcher is not None:
+        await _search_batcher.stop()
 
 
 def ensure_queue_manager() -> QueueManager:
     return get_default_queue_manager()
 
 
+def check_admission(content_hash: Optional[str] = None, client_id: Optional[str] = None) -> None:
+    """Admission check for a new upload, run before any work is done for it.
+
+    Uploads that will attach to an in-flight analysis of the same content
+    take no queue slot and are always admitted.
+
+    Raises:
+        QueueFullError: when the default queue is at `queue_max_depth`, or
+            `client_id` already has `queue_max_per_client` tasks waiting.
+    """
+    if content_hash and get_inflight_registry().is_in_flight(content_hash):
+        return
+    ensure_queue_manager().admit(client_id)
+
+
+async def check_shared_admission(content_hash: Optional[str] = None, client_id: Optional[str] = None) -> None:
+    """Admission check for ``task_backend: "postgres"``, where the queue is the shared `tasks` table.
+
+    The depth is the number of queued rows across all API processes and is
+    compared with `queue_max_depth`, and the rows of `client_id` with
+    `queue_max_per_client`; `Retry-After` uses the rate at which tasks
+    finished over the drain window. `content_hash` is accepted for signature
+    compatibility with `check_admission`.
+
+    Raises:
+        QueueFullError: when the shared queue is at `queue_max_depth`, or
+            `client_id` already has `queue_max_per_client` tasks waiting.
+    """
+    qm = ensure_queue_manager()
+    store = get_default_store()
+    depth = None
+    if qm.max_depth > 0:
+        depth = await store.queue_depth()
+        if depth < qm.max_depth:
+            depth = None
+    if depth is None and qm.max_per_client > 0 and client_id:
+        depth = await store.queue_depth(client_id)
+        if depth < qm.max_per_client:
+            depth = None
+    if depth is not None:
+        rate = await store.drain_rate(qm.drain_window)
+        qm.reject(qm.retry_after_for(depth, rate))
+
+
 async def enqueue(task_id: str, file_tuple: Tuple) -> None:
-    """Put a task into the default in-process queue for workers to pick up."""
+    """Put a task into the default in-process queue for workers to pick up.
+
+    When an analysis of the same content hash is already queued or running,
+    the task is attached to it instead of being enqueued, and its temp file is
+    removed right away.
+
+    Raises:
+        QueueFullError: when the queue filled up after the admission check.
+    """
     qm = ensure_queue_manager()
+    content_hash = getattr(file_tuple, "content_hash", None)
+    if content_hash:
+        inflight = get_inflight_registry()
+        if inflight.attach(content_hash, task_id):
+            logger.info("Task %s attached to in-flight analysis %s", task_id, content_hash[:12])
+            _remove_temp_file(file_tuple[0])
+            return
     await qm.enqueue(task_id, file_tuple)
+    if content_hash:
+        # registered only once admitted, so a rejection leaves no entry
+        inflight.begin(content_hash)
+
@@ -0,0 +1,146 @@
+"""Fair-share scheduling for the analysis queue.
+
+`FairShareQueue` is a drop-in `asyncio.Queue` (it overrides the same
+`_init`/`_put`/`_get` hooks as `asyncio.PriorityQueue`), so workers keep
+calling `get()`/`task_done()`/`join()` unchanged. Instead of one FIFO it
+keeps a sub-queue per client and picks the next item as follows:
+
+- the highest `priority` with waiting items is always served first;
+- within a priority level, clients take turns by deficit round-robin:
+  on each visit a client's deficit grows by its weight and it is served
+  one task per unit of deficit, so a client with weight 2 gets twice the
+  turns of a client with weight 1 however many tasks either has queued;
+- within a client, tasks are FIFO, or smallest upload first when
+  `shortest_first` is set.
+
+The client, priority and size are read from the queued payload
+(`TaskInput.client_id`, `.priority`, `.size`); items without them fall
+into one anonymous client at priority 0.
+"""
+
+import asyncio
+import heapq
+import itertools
+from collections import deque
+from typing import Any, Deque, Dict, List, Mapping, Optional, Tuple
+
+ANONYMOUS_CLIENT = "-"
+
+
+class _ClientQueue:
+    """Waiting tasks of one client at one priority level."""
+
+    __slots__ = ("items", "deficit")
+
+    def __init__(self) -> None:
+        self.items: List[Tuple[int, int, Any]] = []
+        self.deficit = 0.0
+
+
+class _DeficitRoundRobin:
+    """Per-priority deficit round-robin over per-client heaps."""
+
+    def __init__(self, weights: Mapping[str, float], default_weight: float, shortest_first: bool) -> None:
+        self._weights = dict(weights)
+        self._default_weight = float(default_weight)
+        self._shortest_first = shortest_first
+        self._seq = itertools.count()
+        # priority -> client -> queue, and the ring of clients with waiting items
+        self._levels: Dict[int, Dict[str, _ClientQueue]] = {}
+        self._rings: Dict[int, Deque[str]] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def weight(self, client: str) -> float:
+        return self._weights.get(client, self._default_weight)
+
+    def push(self, item: Any) -> None:
+        payload = item[1] if isinstance(item, tuple) and len(item) == 2 else None
+        client = getattr(payload, "client_id", None) or ANONYMOUS_CLIENT
+        priority = int(getattr(payload, "priority", 0) or 0)
+        size = int(getattr(payload, "size", 0) or 0) if self._shortest_first else 0
+
+        level = self._levels.setdefault(priority, {})
+        queue = level.get(client)
+        if queue is None:
+            queue = level[client] = _ClientQueue()
+            self._rings.setdefault(priority, deque()).append(client)
+        heapq.heappush(queue.items, (size, next(self._seq), item))
+        self._size += 1
+
+    def pop(self) -> Any:
+        priority = max(self._levels)
+        level, ring = self._levels[priority], self._rings[priority]
+        while True:
+            client = ring[0]
+            queue = level[client]
+            if queue.deficit < 1.0:
+                # a new visit: grant this round's quantum
+                queue.deficit += self.weight(client)
+            if queue.deficit < 1.0:
+                ring.rotate(-1)
+                continue
+            queue.deficit -= 1.0
+            item = heapq.heappop(queue.items)[2]
+            self._size -= 1
+            if not queue.items:
+                # idle clients do not bank deficit
+                del level[client]
+                ring.popleft()
+                if not ring:
+                    del self._levels[priority], self._rings[priority]
+            elif queue.deficit < 1.0:
+                ring.rotate(-1)
+            return item
+
+    def depths(self) -> Dict[str, int]:
+        depths: Dict[str, int] = {}
+        for level in self._levels.values():
+            for client, queue in level.items():
+                depths[client] = depths.get(client, 0) + len(queue.items)
+        return depths
+
+
+class FairShareQueue(asyncio.Queue):
+    """`asyncio.Queue` with per-client fair sharing, priorities and optional SJF.
+
+    Args:
+        weights: Per-client weights; clients not listed get `default_weight`.
+        default_weight: Weight of unlisted clients (> 0).
+        shortest_first: Serve each client's smallest uploads first.
+        maxsize: As for `asyncio.Queue`.
+
+    Examples:
+        >>> q = FairShareQueue(weights={"partner": 2})
+        >>> q.put_nowait(("t1", TaskInput("/tmp/a.jpg", "a.jpg", "image/jpeg", client_id="partner")))
+    """
+
+    def __init__(
+        self,
+        weights: Optional[Mapping[str, float]] = None,
+        default_weight: float = 1.0,
+        shortest_first: bool = False,
+        maxsize: int = 0,
+    ) -> None:
+        if default_weight <= 0 or any(w <= 0 for w in (weights or {}).values()):
+            raise ValueError("weights must be positive")
+        self._drr_args = (weights or {}, default_weight, shortest_first)
+        super().__init__(maxsize)
+
+    def _init(self, maxsize: int) -> None:
+        self._queue = _DeficitRoundRobin(*self._drr_args)
+
+    def _put(self, item: Any) -> None:
+        self._queue.push(item)
+
+    def _get(self) -> Any:
+        return self._queue.pop()
+
+    def stats(self) -> Dict[str, Any]:
+        depths = self._queue.depths()
+        return {
+            "clients_waiting": len(depths),
+            "max_client_depth": max(depths.values(), default=0),
+        }
@@ -0,0 +1,105 @@
+"""Busy-time accounting for pipeline stages.
+
+A `StageMeter` wraps every execution of one stage (``async with meter:``)
+and integrates over time:
+
+- `busy_seconds`: time with at least one execution in progress;
+- `occupancy_seconds`: in-flight executions summed over time, so
+  ``occupancy / (elapsed * capacity)`` is the mean fraction of the
+  stage's slots in use.
+
+Both only grow; consumers sample them periodically and divide the deltas
+by the sampling interval (see `StageMeter.sample`).
+"""
+
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+class StageMeter:
+    """Cumulative busy and occupancy time of one stage.
+
+    Args:
+        name: Stage name used in metrics.
+        capacity: Executions the stage can run at once, or None when
+            unbounded (e.g. callers are merged into batches).
+    """
+
+    def __init__(self, name: str, capacity: Optional[int] = None) -> None:
+        self.name = name
+        self.capacity = capacity
+        self.in_flight = 0
+        self.completed = 0
+        self._busy = 0.0
+        self._occupancy = 0.0
+        self._last = time.monotonic()
+        self._sampled: Tuple[float, float, float] = (self._last, 0.0, 0.0)
+
+    def _advance(self) -> float:
+        now = time.monotonic()
+        dt = now - self._last
+        if self.in_flight:
+            self._busy += dt
+            self._occupancy += dt * self.in_flight
+        self._last = now
+        return now
+
+    def enter(self) -> None:
+        self._advance()
+        self.in_flight += 1
+
+    def exit(self) -> None:
+        self._advance()
+        self.in_flight -= 1
+        self.completed += 1
+
+    async def __aenter__(self) -> "StageMeter":
+        self.enter()
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        self.exit()
+
+    @property
+    def busy_seconds(self) -> float:
+        self._advance()
+        return self._busy
+
+    @property
+    def occupancy_seconds(self) -> float:
+        self._advance()
+        return self._occupancy
+
+    def sample(self) -> Tuple[float, float]:
+        """Return ``(busy_fraction, mean_in_flight)`` since the previous call."""
+        now = self._advance()
+        t0, busy0, occ0 = self._sampled
+        self._sampled = (now, self._busy, self._occupancy)
+        dt = now - t0
+        if dt <= 0:
+            return 0.0, float(self.in_flight)
+        return (self._busy - busy0) / dt, (self._occupancy - occ0) / dt
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "capacity": self.capacity,
+            "completed": self.completed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "occupancy_seconds": round(self._occupancy, 3),
+        }
+
+
+_meters: Dict[str, StageMeter] = {}
+
+
+def get_stage_meter(name: str, capacity: Optional[int] = None) -> StageMeter:
+    """Return the process-wide meter for `name`, creating it on first use."""
+    meter = _meters.get(name)
+    if meter is None:
+        meter = _meters[name] = StageMeter(name, capacity)
+    return meter
+
+
+def stage_meters() -> Dict[str, StageMeter]:
+    return dict(_meters)
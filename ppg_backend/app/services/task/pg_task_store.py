@@ -0,0 +1,358 @@
+"""Postgres-backed task store and queue.
+
+`PostgresTaskStore` implements the `InMemoryTaskStore` interface on the
+`tasks` table, so `task_service` callers (the API, `process_task_item`)
+are unchanged once it is installed with `task_service.set_default_store`.
+It also acts as the work queue shared by every API process and worker
+node:
+
+- `enqueue` moves the uploaded bytes into `tasks.input_blob` (temp files
+  are local to one machine) and sends `NOTIFY tasks_enqueued`;
+- `claim` takes the oldest highest-priority queued tasks with
+  ``FOR UPDATE SKIP LOCKED``, so concurrent workers never block on or
+  double-claim the same row;
+- `requeue_stale` returns tasks whose worker disappeared (claimed longer
+  than a timeout ago) to the queue, failing them after `max_retries`;
+- writes made with `claimed_by` (the claiming worker's id) apply only
+  while that worker still holds the claim, so a slow worker whose task was
+  requeued and claimed elsewhere, or failed by the reaper, cannot
+  overwrite the newer state.
+
+The input blob is cleared when a task completes or fails.
+"""
+
+import asyncio
+import os
+import tempfile
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi.logger import logger
+from sqlalchemy import delete, func, select, text, update
+
+from app.models.db_models import Task
+from app.schemas.task import TaskInput, TaskStatus
+from app.services.utils import get_config_option
+
+DEFAULT_CHANNEL = "tasks_enqueued"
+
+_CLAIM_SQL = text("""
+UPDATE tasks
+SET status = 'running', claimed_by = :worker, claimed_at = now(), updated_at = now()
+WHERE id IN (
+    SELECT id FROM tasks
+    WHERE status = 'pending' AND input_blob IS NOT NULL
+    ORDER BY priority DESC, created_at
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING id, input_meta, input_blob
+""")
+
+_REQUEUE_STALE_SQL = text("""
+UPDATE tasks
+SET status = CASE WHEN retries + 1 >= :max_retries THEN 'failed' ELSE 'pending' END,
+    input_blob = CASE WHEN retries + 1 >= :max_retries THEN NULL ELSE input_blob END,
+    retries = retries + 1,
+    last_error = 'worker lost',
+    claimed_by = NULL,
+    claimed_at = NULL,
+    updated_at = now()
+WHERE status = 'running' AND claimed_at < now() - make_interval(secs => :timeout)
+""")
+
+_EXPIRE_FINISHED_SQL = text("""
+DELETE FROM tasks
+WHERE status IN ('completed', 'failed') AND updated_at < now() - make_interval(secs => :ttl)
+""")
+
+_EXPIRE_OLD_SQL = text("DELETE FROM tasks WHERE created_at < now() - make_interval(secs => :max_age)")
+
+_FINAL_STATUSES = (TaskStatus.completed, TaskStatus.failed)
+
+
+def _parse_id(task_id: str) -> Optional[uuid.UUID]:
+    if not isinstance(task_id, str):
+        raise TypeError("task_id must be a string")
+    try:
+        return uuid.UUID(task_id)
+    except ValueError:
+        return None
+
+
+def _ts(value) -> Optional[float]:
+    return value.timestamp() if value is not None else None
+
+
+def _to_dict(row: Task) -> Dict[str, Any]:
+    return {
+        "id": str(row.id),
+        "status": TaskStatus(row.status),
+        "input_meta": row.input_meta or {},
+        "result": row.result,
+        "detail": row.detail,
+        "retries": row.retries,
+        "last_error": row.last_error,
+        "created_at": _ts(row.created_at),
+        "updated_at": _ts(row.updated_at),
+    }
+
+
+def write_task_input(task_id: str, blob: bytes, meta: Dict[str, Any], claimed_by: Optional[str] = None) -> TaskInput:
+    """Write a claimed task's bytes to a local temp file and build its `TaskInput`."""
+    suffix = os.path.splitext(meta.get("filename") or "")[-1] or None
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, prefix=f"task-{task_id[:8]}-") as tmp:
+        tmp.write(blob)
+    return TaskInput(
+        tmp.name, meta.get("filename"), meta.get("content_type"), meta.get("content_hash"),
+        client_id=meta.get("client_id"), priority=int(meta.get("priority") or 0), size=len(blob),
+        claimed_by=claimed_by,
+    )
+
+
+class PostgresTaskStore:
+    """Task store and queue on the `tasks` table.
+
+    Args:
+        session_factory: Async session factory (e.g. `AsyncSessionLocal`).
+        channel: NOTIFY channel used to wake idle workers; empty disables it.
+        ttl: Seconds finished tasks are kept by `expire`; None keeps them.
+        max_age: Seconds any task is kept by `expire`; None keeps it.
+
+    Examples:
+        >>> store = PostgresTaskStore(AsyncSessionLocal)
+        >>> task_id = await store.create_task({"filename": "a.png"})
+        >>> await store.enqueue(task_id, task_input)
+        >>> await store.claim("node-1:0")
+        [('b7a9f2f0-...', TaskInput(...))]
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Any],
+        channel: str = DEFAULT_CHANNEL,
+        ttl: Optional[float] = None,
+        max_age: Optional[float] = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self.channel = channel
+        self.ttl = ttl
+        self.max_age = max_age
+
+    # -------------------------
+    # task_service interface
+    # -------------------------
+    async def create_task(self, input_meta: Optional[Dict[str, Any]] = None) -> str:
+        if input_meta is not None and not isinstance(input_meta, dict):
+            raise TypeError("input_meta must be a dict or None")
+        task_id = uuid.uuid4()
+        async with self._session_factory() as db:
+            db.add(Task(id=task_id, status=TaskStatus.pending.value, input_meta=input_meta or {}))
+            await db.commit()
+        return str(task_id)
+
+    async def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        tid = _parse_id(task_id)
+        if tid is None:
+            return None
+        async with self._session_factory() as db:
+            row = await db.get(Task, tid)
+            return _to_dict(row) if row is not None else None
+
+    async def update_task_status(
+        self,
+        task_id: str,
+        status: TaskStatus,
+        *,
+        result: Optional[Any] = None,
+        detail: Optional[str] = None,
+        last_error: Optional[str] = None,
+        claimed_by: Optional[str] = None,
+    ) -> bool:
+        """Update a task; with `claimed_by` only while that worker holds the running claim.
+
+        Returns:
+            False when no row was updated (unknown task, or the claim was lost).
+        """
+        tid = _parse_id(task_id)
+        if not isinstance(status, TaskStatus):
+            try:
+                status = TaskStatus(status)  # type: ignore[arg-type]
+            except Exception:
+                raise TypeError("status must be a TaskStatus or valid TaskStatus value")
+        if tid is None:
+            return False
+        values: Dict[str, Any] = {"status": status.value, "updated_at": func.now()}
+        if result is not None:
+            values["result"] = result
+        if detail is not None:
+            values["detail"] = detail
+        if last_error is not None:
+            values["last_error"] = last_error
+        if status in _FINAL_STATUSES:
+            values["input_blob"] = None
+        query = update(Task).where(Task.id == tid)
+        if claimed_by is not None:
+            query = query.where(Task.claimed_by == claimed_by, Task.status == TaskStatus.running.value)
+        async with self._session_factory() as db:
+            res = await db.execute(query.values(**values))
+            await db.commit()
+        if claimed_by is not None and res.rowcount == 0:
+            logger.warning("Dropped %s update of task %s: claim by %s was lost", status.value, task_id, claimed_by)
+        return res.rowcount > 0
+
+    async def save_task_result(
+        self, task_id: str, result: Any, error: Optional[str] = None, claimed_by: Optional[str] = None
+    ) -> bool:
+        status = TaskStatus.failed if error else TaskStatus.completed
+        return await self.update_task_status(task_id, status, result=result, last_error=error, claimed_by=claimed_by)
+
+    async def increment_retries(self, task_id: str) -> int:
+        tid = _parse_id(task_id)
+        if tid is None:
+            return -1
+        async with self._session_factory() as db:
+            retries = (await db.execute(
+                update(Task).where(Task.id == tid)
+                .values(retries=Task.retries + 1, updated_at=func.now())
+                .returning(Task.retries)
+            )).scalar_one_or_none()
+            await db.commit()
+        return -1 if retries is None else retries
+
+    async def list_tasks(self) -> Dict[str, Dict[str, Any]]:
+        async with self._session_factory() as db:
+            rows = (await db.execute(select(Task))).scalars().all()
+        return {str(r.id): _to_dict(r) for r in rows}
+
+    async def cleanup_tasks(self, older_than_seconds: int = 24 * 3600) -> int:
+        if not isinstance(older_than_seconds, (int, float)) or older_than_seconds < 0:
+            raise ValueError("older_than_seconds must be a non-negative number")
+        cutoff = func.now() - func.make_interval(0, 0, 0, 0, 0, 0, float(older_than_seconds))
+        async with self._session_factory() as db:
+            res = await db.execute(delete(Task).where(Task.created_at < cutoff))
+            await db.commit()
+        return res.rowcount
+
+    async def expire(self) -> int:
+        """Delete tasks past their TTL or max age (index range scans, not a full scan)."""
+        removed = 0
+        async with self._session_factory() as db:
+            if self.ttl is not None:
+                removed += (await db.execute(_EXPIRE_FINISHED_SQL, {"ttl": float(self.ttl)})).rowcount
+            if self.max_age is not None:
+                removed += (await db.execute(_EXPIRE_OLD_SQL, {"max_age": float(self.max_age)})).rowcount
+            await db.commit()
+        return removed
+
+    # -------------------------
+    # queue
+    # -------------------------
+    async def enqueue(self, task_id: str, file_tuple: Tuple) -> None:
+        """Queue `task_id` with the bytes of `file_tuple`'s temp file, then remove the file.
+
+        Raises:
+            ValueError: when `task_id` is not a task id of this store.
+        """
+        tid = _parse_id(task_id)
+        if tid is None:
+            raise ValueError(f"invalid task id {task_id!r}")
+        tmp_path, filename, content_type = file_tuple[:3]
+        with open(tmp_path, "rb") as f:
+            blob = await asyncio.to_thread(f.read)
+        meta = {
+            "filename": filename,
+            "content_type": content_type,
+            "content_hash": getattr(file_tuple, "content_hash", None),
+            "client_id": getattr(file_tuple, "client_id", None),
+            "priority": int(getattr(file_tuple, "priority", 0) or 0),
+        }
+        async with self._session_factory() as db:
+            await db.execute(
+                update(Task).where(Task.id == tid)
+                .values(input_blob=blob, input_meta=meta, priority=meta["priority"], updated_at=func.now())
+            )
+            if self.channel:
+                # delivered on commit, so workers never see the row before it is visible
+                await db.execute(select(func.pg_notify(self.channel, str(tid))))
+            await db.commit()
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            logger.warning("Failed to remove temp file %s", tmp_path)
+
+    async def claim(self, worker_id: str, limit: int = 1) -> List[Tuple[str, TaskInput]]:
+        """Claim up to `limit` queued tasks for `worker_id` and materialize their inputs."""
+        async with self._session_factory() as db:
+            rows = (await db.execute(_CLAIM_SQL, {"worker": worker_id, "limit": int(limit)})).fetchall()
+            await db.commit()
+        claimed = []
+        for row in rows:
+            task_id = str(row.id)
+            claimed.append((task_id, await asyncio.to_thread(
+                write_task_input, task_id, row.input_blob, row.input_meta or {}, worker_id
+            )))
+        return claimed
+
+    async def requeue_stale(self, timeout_seconds: float, max_retries: int = 3) -> int:
+        """Return tasks claimed more than `timeout_seconds` ago to the queue (or fail them)."""
+        async with self._session_factory() as db:
+            res = await db.execute(_REQUEUE_STALE_SQL, {"timeout": float(timeout_seconds), "max_retries": int(max_retries)})
+            await db.commit()
+        if res.rowcount:
+            logger.warning("Requeued %d stale task(s) claimed over %.0fs ago", res.rowcount, timeout_seconds)
+        return res.rowcount
+
+    async def queue_depth(self, client_id: Optional[str] = None) -> int:
+        """Number of queued tasks, or only those of `client_id` when given."""
+        query = (
+            select(func.count()).select_from(Task)
+            .where(Task.status == TaskStatus.pending.value, Task.input_blob.isnot(None))
+        )
+        if client_id is not None:
+            query = query.where(Task.input_meta["client_id"].as_string() == client_id)
+        async with self._session_factory() as db:
+            return (await db.execute(query)).scalar_one()
+
+    async def drain_rate(self, window_seconds: float) -> float:
+        """Tasks finished per second over the last `window_seconds`, across all workers."""
+        async with self._session_factory() as db:
+            finished = (await db.execute(
+                select(func.count()).select_from(Task)
+                .where(
+                    Task.status.in_((TaskStatus.completed.value, TaskStatus.failed.value)),
+                    Task.updated_at > func.now() - func.make_interval(0, 0, 0, 0, 0, 0, float(window_seconds)),
+                )
+            )).scalar_one()
+        return finished / window_seconds if window_seconds > 0 else 0.0
+
+
+def task_backend() -> str:
+    """Return the configured `task_backend`: ``"memory"`` (default) or ``"postgres"``."""
+    kind = str(get_config_option("task_backend", "memory"))
+    if kind not in ("memory", "postgres"):
+        logger.warning("Unknown task_backend %r; falling back to 'memory'", kind)
+        return "memory"
+    return kind
+
+
+def worker_id(index: int) -> str:
+    """Identify a worker coroutine across nodes: ``host:pid:index``."""
+    return f"{os.uname().nodename}:{os.getpid()}:{index}"
+
+
+def claim_poll_seconds() -> float:
+    """Idle poll interval of DB workers (`task_poll_interval_ms`); NOTIFY wakes them sooner."""
+    return max(0.05, float(get_config_option("task_poll_interval_ms", 1000)) / 1000.0)
+
+
+def db_worker_options() -> Dict[str, Any]:
+    """Keyword arguments for `worker_service.start_db_workers` from the config."""
+    from app.models.db_session import DATABASE_URL
+
+    return {
+        "poll_interval": claim_poll_seconds(),
+        "listen_dsn": DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1),
+        "stale_timeout": float(get_config_option("task_claim_timeout_seconds", 120)),
+        "max_retries": int(get_config_option("task_max_retries", 3)),
+    }
@@ -0,0 +1,177 @@
+"""Compact task records for the in-memory task store.
+
+`TaskRecord` is an immutable, slotted read-only mapping with the same keys
+as the task dicts it replaces (``record["status"]``, ``record.get("result")``
+and ``dict(record)`` keep working), so API handlers need no changes.
+
+Analysis results are lists of poison payloads (``{"name", "image",
+"description"}``) repeated across thousands of tasks. `PoisonTable` interns
+each distinct payload once and a record keeps only a tuple of payload ids;
+``record["result"]`` expands them into fresh dicts when read, i.e. when
+`get_task_status` serializes the response. Results of any other shape are
+kept as given.
+"""
+
+import sys
+import threading
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.schemas.task import TaskStatus
+
+_PAYLOAD_KEYS = frozenset(("name", "image", "description"))
+
+
+class PoisonTable:
+    """Interning table of poison payloads, shared by all records.
+
+    Args:
+        max_entries: Distinct payloads kept; once full, results with new
+            payloads are stored uninterned.
+    """
+
+    def __init__(self, max_entries: int = 65536) -> None:
+        self.max_entries = int(max_entries)
+        self._ids: Dict[Tuple[str, str, str], int] = {}
+        self._payloads: List[Tuple[str, str, str]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    def _id_for(self, key: Tuple[str, str, str]) -> Optional[int]:
+        pid = self._ids.get(key)
+        if pid is not None:
+            return pid
+        with self._lock:
+            pid = self._ids.get(key)
+            if pid is None:
+                if len(self._payloads) >= self.max_entries:
+                    return None
+                pid = len(self._payloads)
+                self._payloads.append(key)
+                self._ids[key] = pid
+        return pid
+
+    def intern(self, result: Any) -> Optional[Tuple[int, ...]]:
+        """Return payload ids for a list of poison payloads, or None when `result` is not one."""
+        if not isinstance(result, list):
+            return None
+        ids = []
+        for item in result:
+            if not isinstance(item, dict) or item.keys() != _PAYLOAD_KEYS:
+                return None
+            key = (item["name"], item["image"], item["description"])
+            if not all(isinstance(v, str) for v in key):
+                return None
+            pid = self._id_for(key)
+            if pid is None:
+                return None
+            ids.append(pid)
+        return tuple(ids)
+
+    def expand(self, ids: Tuple[int, ...]) -> List[Dict[str, str]]:
+        payloads = self._payloads
+        return [
+            {"name": name, "image": image, "description": description}
+            for name, image, description in (payloads[i] for i in ids)
+        ]
+
+
+_default_table = PoisonTable()
+
+
+def poison_table() -> PoisonTable:
+    return _default_table
+
+
+class TaskRecord(Mapping):
+    """One task's state; immutable, so a record can be handed to readers as-is.
+
+    Use :meth:`replace` to derive an updated record.
+    """
+
+    __slots__ = (
+        "id", "status", "input_meta", "_result", "_interned", "detail",
+        "retries", "last_error", "created_at", "updated_at",
+    )
+    _KEYS = ("id", "status", "input_meta", "result", "detail", "retries", "last_error", "created_at", "updated_at")
+
+    def __init__(
+        self,
+        id: str,
+        status: TaskStatus,
+        input_meta: Dict[str, Any],
+        result: Any = None,
+        detail: Optional[str] = None,
+        retries: int = 0,
+        last_error: Optional[str] = None,
+        created_at: float = 0.0,
+        updated_at: float = 0.0,
+    ) -> None:
+        setattr_ = object.__setattr__
+        setattr_(self, "id", id)
+        setattr_(self, "status", status)
+        setattr_(self, "input_meta", input_meta)
+        setattr_(self, "detail", detail)
+        setattr_(self, "retries", retries)
+        setattr_(self, "last_error", last_error)
+        setattr_(self, "created_at", created_at)
+        setattr_(self, "updated_at", updated_at)
+        self._set_result(result)
+
+    def _set_result(self, result: Any) -> None:
+        ids = _default_table.intern(result) if result is not None else None
+        object.__setattr__(self, "_interned", ids is not None)
+        object.__setattr__(self, "_result", ids if ids is not None else result)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("TaskRecord is immutable; use replace()")
+
+    @property
+    def result(self) -> Any:
+        return _default_table.expand(self._result) if self._interned else self._result
+
+    @property
+    def compact_result(self) -> Any:
+        """The stored form of the result (payload ids when interned); identity changes only on update."""
+        return self._result
+
+    def replace(self, **changes: Any) -> "TaskRecord":
+        """Return a copy with `changes` applied; an unchanged result is not re-interned."""
+        new = object.__new__(TaskRecord)
+        for name in TaskRecord.__slots__:
+            object.__setattr__(new, name, getattr(self, name))
+        for key, value in changes.items():
+            if key == "result":
+                new._set_result(value)
+            elif key in TaskRecord._KEYS:
+                object.__setattr__(new, key, value)
+            else:
+                raise KeyError(key)
+        return new
+
+    # Mapping interface (read-only)
+    def __getitem__(self, key: str) -> Any:
+        if key not in TaskRecord._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(TaskRecord._KEYS)
+
+    def __len__(self) -> int:
+        return len(TaskRecord._KEYS)
+
+    def __contains__(self, key: object) -> bool:
+        return key in TaskRecord._KEYS
+
+    def __repr__(self) -> str:
+        return f"TaskRecord(id={self.id!r}, status={self.status.value!r}, retries={self.retries})"
+
+
+def compact_meta(input_meta: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Intern the short, highly repeated strings of `input_meta` (e.g. content types)."""
+    if not input_meta:
+        return {}
+    return {k: sys.intern(v) if k == "content_type" and isinstance(v, str) else v for k, v in input_meta.items()}
@@ -5,7 +5,10 @@ This module provides an async-safe in-memory task store implementation
 maintained for backwards compatibility with existing callers.
 
 Design goals:
-- Simple async-safe in-memory implementation for tests and local runs.
+- Simple async-safe in-memory implementation for tests and local runs;
+  status reads are lock-free and copy-free (immutable task snapshots).
+- Compact records: slotted `TaskRecord`s whose poison results are stored
+  as ids into a shared payload table (see `records`).
 - Clear, typed public API and docstrings describing inputs/outputs/exceptions.
 - Ability to replace the default store with `set_default_store()` in tests.
 
@@ -15,27 +18,288 @@ implements the same async interface.
 """
 
 import asyncio
+import heapq
+import inspect
+import json
+import threading
 import time
 import uuid
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Mapping, Optional, Tuple
 from datetime import datetime
 from app.schemas.task import TaskStatus
+from app.services.task.records import TaskRecord, compact_meta
 from fastapi.logger import logger
 
+TaskSnapshot = Mapping[str, Any]
+
+_FINAL_STATUSES = (TaskStatus.completed, TaskStatus.failed)
+# rough per-task cost of a TaskRecord, its id, timestamps and meta dict
+_RECORD_OVERHEAD_BYTES = 400
+
+
+def _estimate_bytes(record: TaskRecord) -> int:
+    """Approximate resident size of a task: fixed overhead plus its stored payloads as JSON.
+
+    Interned results count as their payload ids, not the shared payloads.
+    """
+    payload = (record.input_meta, record.compact_result, record.detail, record.last_error)
+    return _RECORD_OVERHEAD_BYTES + len(json.dumps(payload, default=str))
+
+
 class InMemoryTaskStore:
     """An async-safe in-memory task store implementing the expected task service interface.
 
     Methods are asynchronous to match existing code and allow easy swapping with other async stores.
+
+    Tasks are stored as immutable `TaskRecord` snapshots spread over
+    `shards` dicts. Writers build a new snapshot and swap it in under the
+    shard's lock; readers fetch the current snapshot without any lock, so
+    status polls never wait on writers and never copy task dicts.
+
+    Retention: a finished (completed/failed) task expires `ttl` seconds
+    after it finished, any task `max_age` seconds after it was created.
+    Deadlines sit in a min-heap, so `expire()` costs O(expired log n)
+    instead of a scan. `max_tasks` / `max_bytes` cap the resident set;
+    when exceeded, the oldest finished tasks are evicted first, then the
+    oldest tasks overall. Sizes are estimated from the JSON payloads.
+
+    Change notification: `wait_for_update` parks the caller until a task's
+    snapshot is replaced or removed; writers wake exactly the waiters of
+    the task they changed (long-poll and SSE status delivery).
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        shards: int = 16,
+        ttl: Optional[float] = None,
+        max_age: Optional[float] = None,
+        max_tasks: int = 0,
+        max_bytes: int = 0,
+    ) -> None:
         """Create a fresh in-memory store.
 
-        The store is protected by an asyncio.Lock to allow safe concurrent access
-        from async worker coroutines.
+        Args:
+            shards: Number of lock stripes. Each stripe's lock only guards
+                that stripe's read-modify-write updates; it is never held
+                across an await, so it is a plain `threading.Lock` and the
+                store is also safe to use from executor threads.
+            ttl: Seconds a finished task is kept; None keeps it.
+            max_age: Seconds any task is kept after creation; None keeps it.
+            max_tasks: Maximum resident tasks; 0 means unlimited.
+            max_bytes: Maximum estimated resident bytes; 0 means unlimited.
         """
-        self._tasks: Dict[str, Dict[str, Any]] = {}
-        self._lock = asyncio.Lock()
+        if shards < 1:
+            raise ValueError("shards must be >= 1")
+        if max_tasks < 0 or max_bytes < 0:
+            raise ValueError("max_tasks and max_bytes must be >= 0")
+        self._shards: List[Dict[str, TaskRecord]] = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_tasks = int(max_tasks)
+        self.max_bytes = int(max_bytes)
+        # Retention bookkeeping, guarded by _acct_lock. Lock order is shard
+        # lock -> _acct_lock; evictions choose victims under _acct_lock and
+        # delete them from the shards afterwards.
+        self._acct_lock = threading.Lock()
+        self._sizes: Dict[str, int] = {}           # resident tasks, in creation order
+        self._finished: Dict[str, None] = {}       # finished tasks, in finish order
+        self._deadlines: Dict[str, float] = {}     # current expiry deadline per task
+        self._heap: List[Tuple[float, str]] = []   # (deadline, task_id); stale entries are skipped
+        self._bytes = 0
+        self._expired = 0
+        self._evicted = 0
+        # task_id -> futures of coroutines parked in wait_for_update; leaf lock
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._waiters_lock = threading.Lock()
+
+    def _index(self, task_id: str) -> int:
+        return hash(task_id) % len(self._shards)
+
+    def _replace(self, task_id: str, **changes: Any) -> Optional[TaskRecord]:
+        """Swap in a copy of `task_id`'s record with `changes`; None when unknown."""
+        i = self._index(task_id)
+        with self._locks[i]:
+            current = self._shards[i].get(task_id)
+            if current is None:
+                return None
+            snapshot = self._shards[i][task_id] = current.replace(**changes)
+            self._account(task_id, current, snapshot)
+        self._notify(task_id)
+        if self.max_bytes and "result" in changes:
+            self._enforce_caps()
+        return snapshot
+
+    # -------------------------
+    # change notification
+    # -------------------------
+    def _notify(self, task_id: str) -> None:
+        """Wake the coroutines waiting on `task_id` (call after swapping its snapshot)."""
+        if not self._waiters:
+            return
+        with self._waiters_lock:
+            waiters = self._waiters.pop(task_id, None)
+        for loop, fut in waiters or ():
+            # writers may run on executor threads
+            loop.call_soon_threadsafe(_wake, fut)
+
+    async def wait_for_update(self, task_id: str, seen: Optional[TaskSnapshot], timeout: float) -> Optional[TaskSnapshot]:
+        """Return the task's snapshot once it is no longer `seen`, or after `timeout` seconds.
+
+        Args:
+            task_id: Task identifier string.
+            seen: The snapshot the caller already has (from `get_task`).
+            timeout: Maximum seconds to wait.
+
+        Returns:
+            The current snapshot (`seen` itself on timeout), or None once the
+            task is removed.
+        """
+        loop = asyncio.get_running_loop()
+        entry = (loop, loop.create_future())
+        with self._waiters_lock:
+            self._waiters.setdefault(task_id, []).append(entry)
+        try:
+            # re-read after registering so an update in between is not missed
+            current = self._shards[self._index(task_id)].get(task_id)
+            if current is not seen:
+                return current
+            try:
+                await asyncio.wait_for(entry[1], timeout)
+            except asyncio.TimeoutError:
+                pass
+            return self._shards[self._index(task_id)].get(task_id)
+        finally:
+            with self._waiters_lock:
+                waiters = self._waiters.get(task_id)
+                if waiters and entry in waiters:
+                    waiters.remove(entry)
+                    if not waiters:
+                        del self._waiters[task_id]
+
+    # -------------------------
+    # retention
+    # -------------------------
+    def _set_deadline(self, task_id: str, deadline: Optional[float]) -> None:
+        # _acct_lock held
+        if deadline is None:
+            self._deadlines.pop(task_id, None)
+            return
+        self._deadlines[task_id] = deadline
+        heapq.heappush(self._heap, (deadline, task_id))
+
+    def _age_deadline(self, record: TaskRecord) -> Optional[float]:
+        created = record.created_at
+        if self.max_age is None or not isinstance(created, (int, float)):
+            return None
+        return created + self.max_age
+
+    def _final_deadline(self, record: TaskRecord) -> Optional[float]:
+        deadline = self._age_deadline(record)
+        if self.ttl is not None:
+            finished_deadline = record.updated_at + self.ttl
+            deadline = finished_deadline if deadline is None else min(deadline, finished_deadline)
+        return deadline
+
+    def _account(self, task_id: str, before: Optional[TaskRecord], after: TaskRecord) -> None:
+        """Update sizes, finish order and deadlines for a new snapshot (shard lock held).
+
+        `before` is None for a new task; that task may already be final when
+        it is restored from persistence.
+        """
+        with self._acct_lock:
+            if before is None:
+                size = _estimate_bytes(after)
+                self._sizes[task_id] = size
+                self._bytes += size
+                if after.status in _FINAL_STATUSES:
+                    self._finished[task_id] = None
+                    self._set_deadline(task_id, self._final_deadline(after))
+                else:
+                    self._set_deadline(task_id, self._age_deadline(after))
+                return
+            if task_id not in self._sizes:
+                return  # being evicted
+            if after.compact_result is not before.compact_result or after.last_error is not before.last_error:
+                size = _estimate_bytes(after)
+                self._bytes += size - self._sizes[task_id]
+                self._sizes[task_id] = size
+            was_final, is_final = before.status in _FINAL_STATUSES, after.status in _FINAL_STATUSES
+            if is_final and not was_final:
+                self._finished[task_id] = None
+                self._set_deadline(task_id, self._final_deadline(after))
+            elif was_final and not is_final:
+                self._finished.pop(task_id, None)
+                self._set_deadline(task_id, self._age_deadline(after))
+
+    def _forget(self, task_id: str) -> None:
+        # _acct_lock held
+        self._bytes -= self._sizes.pop(task_id, 0)
+        self._finished.pop(task_id, None)
+        self._deadlines.pop(task_id, None)
+
+    def _drop(self, victims: List[str]) -> None:
+        """Remove already-forgotten tasks from their shards."""
+        for task_id in victims:
+            i = self._index(task_id)
+            with self._locks[i]:
+                self._shards[i].pop(task_id, None)
+            self._notify(task_id)
+
+    def _over_caps(self) -> bool:
+        return bool(self._sizes) and (
+            (self.max_tasks and len(self._sizes) > self.max_tasks)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        )
+
+    def _enforce_caps(self) -> int:
+        if not (self.max_tasks or self.max_bytes):
+            return 0
+        victims: List[str] = []
+        with self._acct_lock:
+            while self._over_caps():
+                # oldest finished task first, else the oldest task overall
+                task_id = next(iter(self._finished or self._sizes))
+                self._forget(task_id)
+                victims.append(task_id)
+            self._evicted += len(victims)
+        if victims:
+            self._drop(victims)
+            logger.info("Task store over its cap: evicted %d task(s)", len(victims))
+        return len(victims)
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Remove tasks whose TTL or max age has passed; returns how many were removed."""
+        now = time.time() if now is None else now
+        victims: List[str] = []
+        with self._acct_lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, task_id = heapq.heappop(self._heap)
+                if self._deadlines.get(task_id) == deadline:
+                    self._forget(task_id)
+                    victims.append(task_id)
+            self._expired += len(victims)
+            # stale entries (rescheduled or evicted tasks) are skipped lazily;
+            # rebuild when they dominate
+            if len(self._heap) > 2 * len(self._deadlines) + 1024:
+                self._heap = [(d, t) for t, d in self._deadlines.items()]
+                heapq.heapify(self._heap)
+        self._drop(victims)
+        return len(victims)
+
+    def stats(self) -> Dict[str, Any]:
+        """Resident task count and estimated bytes, plus retention counters."""
+        return {
+            "tasks": len(self._sizes),
+            "finished": len(self._finished),
+            "bytes": self._bytes,
+            "max_tasks": self.max_tasks,
+            "max_bytes": self.max_bytes,
+            "expired": self._expired,
+            "evicted": self._evicted,
+            "expiry_heap": len(self._heap),
+            "waiting": sum(len(w) for w in list(self._waiters.values())),
+        }
 
     async def create_task(self, input_meta: Optional[Dict[str, Any]] = None) -> str:
         """Create a new task record and return its id.
@@ -58,37 +322,35 @@ class InMemoryTaskStore:
         # string parsing for internal comparisons. For backward
         # compatibility we still accept legacy ISO strings on read.
         now_ts = time.time()
-        async with self._lock:
-            self._tasks[task_id] = {
-                "id": task_id,
-                "status": TaskStatus.pending,
-                "input_meta": input_meta or {},
-                "result": None,
-                "detail": None,
-                "retries": 0,
-                "last_error": None,
-                # canonical numeric timestamps
-                "created_at": now_ts,
-                "updated_at": now_ts,
-            }
+        snapshot = TaskRecord(
+            task_id,
+            TaskStatus.pending,
+            compact_meta(input_meta),
+            # canonical numeric timestamps
+            created_at=now_ts,
+            updated_at=now_ts,
+        )
+        i = self._index(task_id)
+        with self._locks[i]:
+            self._shards[i][task_id] = snapshot
+            self._account(task_id, None, snapshot)
+        self._enforce_caps()
         return task_id
 
-    async def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
-        """Return a shallow copy of the task dict or None if not found.
+    async def get_task(self, task_id: str) -> Optional[TaskSnapshot]:
+        """Return the task's current snapshot or None if not found.
 
         Args:
             task_id: Task identifier string.
 
         Returns:
-            A shallow copy of the stored task dict, or None when the id does not exist.
+            A read-only mapping with the task fields, or None when the id does
+            not exist. Later updates do not change it; call `dict()` on it
+            for a mutable copy.
         """
         if not isinstance(task_id, str):
             raise TypeError("task_id must be a string")
-        async with self._lock:
-            task = self._tasks.get(task_id)
-            if task is None:
-                return None
-            return dict(task)
+        return self._shards[self._index(task_id)].get(task_id)
 
     async def update_task_status(
         self,
@@ -123,20 +385,14 @@ class InMemoryTaskStore:
             except Exception:
                 raise TypeError("status must be a TaskStatus or valid TaskStatus value")
         # Update the canonical numeric timestamp
-        now_ts = time.time()
-        async with self._lock:
-            if task_id not in self._tasks:
-                return False
-            t = self._tasks[task_id]
-            t["status"] = status
-            if result is not None:
-                t["result"] = result
-            if detail is not None:
-                t["detail"] = detail
-            if last_error is not None:
-                t["last_error"] = last_error
-            t["updated_at"] = now_ts
-        return True
+        changes: Dict[str, Any] = {"status": status, "updated_at": time.time()}
+        if result is not None:
+            changes["result"] = result
+        if detail is not None:
+            changes["detail"] = detail
+        if last_error is not None:
+            changes["last_error"] = last_error
+        return self._replace(task_id, **changes) is not None
 
     async def save_task_result(self, task_id: str, result: Any, error: Optional[str] = None) -> bool:
         """Save a task's result and mark it done or failed depending on error.
@@ -159,24 +415,30 @@ class InMemoryTaskStore:
         """
         if not isinstance(task_id, str):
             raise TypeError("task_id must be a string")
-        async with self._lock:
-            if task_id not in self._tasks:
+        i = self._index(task_id)
+        with self._locks[i]:
+            current = self._shards[i].get(task_id)
+            if current is None:
                 return -1
-            self._tasks[task_id]["retries"] += 1
-            now_ts = time.time()
-            self._tasks[task_id]["updated_at"] = now_ts
-            return self._tasks[task_id]["retries"]
+            retries = current.retries + 1
+            snapshot = self._shards[i][task_id] = current.replace(retries=retries, updated_at=time.time())
+            self._account(task_id, current, snapshot)
+        self._notify(task_id)
+        return retries
 
-    async def list_tasks(self) -> Dict[str, Dict[str, Any]]:
-        """Return a shallow copy of all tasks (for debugging).
+    async def list_tasks(self) -> Dict[str, TaskSnapshot]:
+        """Return all tasks (for debugging).
 
-        Returns a mapping of task_id to task dicts.
+        Returns a mapping of task_id to task snapshots. Only the shard dicts
+        are copied; the snapshots themselves are shared.
         """
-        async with self._lock:
-            return {k: dict(v) for k, v in self._tasks.items()}
+        tasks: Dict[str, TaskSnapshot] = {}
+        for shard in self._shards:
+            tasks.update(shard.copy())
+        return tasks
 
     async def cleanup_tasks(self, older_than_seconds: int = 24 * 3600) -> int:
-        """Remove tasks older than `older_than_seconds`.
+        """Remove tasks older than `older_than_seconds` (a full scan; see `expire`).
 
         Args:
             older_than_seconds: Age threshold in seconds; tasks older than this value
@@ -191,34 +453,66 @@ class InMemoryTaskStore:
         # but fall back to parsing legacy ISO strings if necessary.
         cutoff = time.time() - older_than_seconds
         removed = 0
-        async with self._lock:
-            keys = list(self._tasks.keys())
-            for k in keys:
-                try:
-                    t = self._tasks[k]
-                    # Prefer numeric created_at (new canonical form). If it's a
-                    # string (legacy), attempt to parse; otherwise skip if
-                    # unknown.
-                    created_ts = t.get("created_at")
-                    if isinstance(created_ts, str):
-                        try:
-                            created_ts = datetime.fromisoformat(created_ts.rstrip('Z')).timestamp()
-                        except Exception:
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                for k, t in list(shard.items()):
+                    try:
+                        # Prefer numeric created_at (new canonical form). If it's a
+                        # string (legacy), attempt to parse; otherwise skip if
+                        # unknown.
+                        created_ts = t.get("created_at")
+                        if isinstance(created_ts, str):
+                            try:
+                                created_ts = datetime.fromisoformat(created_ts.rstrip('Z')).timestamp()
+                            except Exception:
+                                continue
+                        if created_ts is None:
+                            # No usable created_at; skip
                             continue
-                    if created_ts is None:
-                        # No usable created_at; skip
+                        if created_ts < cutoff:
+                            del shard[k]
+                            with self._acct_lock:
+                                self._forget(k)
+                            self._notify(k)
+                            removed += 1
+                    except Exception as exc:
+                        logger.debug("Skipping task %s during cleanup due to error: %s", k, exc)
                         continue
-                    if created_ts < cutoff:
-                        del self._tasks[k]
-                        removed += 1
-                except Exception as exc:
-                    logger.debug("Skipping task %s during cleanup due to error: %s", k, exc)
-                    continue
         return removed
 
 
+def _wake(fut: asyncio.Future) -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+def retention_options() -> Dict[str, Optional[float]]:
+    """`ttl` / `max_age` store arguments from `task_ttl_seconds` / `task_max_age_seconds` (0 disables)."""
+    from app.services.utils import get_config_option
+
+    ttl = float(get_config_option("task_ttl_seconds", 3600))
+    max_age = float(get_config_option("task_max_age_seconds", 24 * 3600))
+    return {"ttl": ttl or None, "max_age": max_age or None}
+
+
+def store_from_config() -> InMemoryTaskStore:
+    """In-memory store with the retention limits from the config file.
+
+    Besides `retention_options`, `task_max_count` and `task_max_bytes` cap
+    the resident set (0 means unlimited).
+    """
+    from app.services.utils import get_config_option
+
+    return InMemoryTaskStore(
+        max_tasks=int(get_config_option("task_max_count", 0)),
+        max_bytes=int(get_config_option("task_max_bytes", 0)),
+        **retention_options(),
+    )
+
+
 # Default store instance used by module-level wrapper functions.
-_default_store: InMemoryTaskStore = InMemoryTaskStore()
+_default_store: InMemoryTaskStore = store_from_config()
+_expiry_task: Optional[asyncio.Task] = None
 
 
 def set_default_store(store: InMemoryTaskStore) -> None:
@@ -236,10 +530,49 @@ def set_default_store(store: InMemoryTaskStore) -> None:
     _default_store = store
 
 
+def get_default_store() -> InMemoryTaskStore:
+    """Return the store used by the module-level wrappers."""
+    return _default_store
+
+
 def reset_default_store() -> None:
     """Reset the module-level default store to a fresh in-memory store."""
     global _default_store
-    _default_store = InMemoryTaskStore()
+    _default_store = store_from_config()
+
+
+async def _expiry_loop(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = _default_store.expire()
+            if inspect.isawaitable(removed):
+                removed = await removed
+            if removed:
+                logger.info("Expired %d task(s)", removed)
+        except Exception:
+            logger.exception("Task expiry failed")
+
+
+def start_task_expiry(interval: float = 30.0) -> None:
+    """Expire tasks of the default store every `interval` seconds in the background.
+
+    Stores without an `expire` method are left alone.
+    """
+    global _expiry_task
+    if _expiry_task is None and hasattr(_default_store, "expire") and interval > 0:
+        _expiry_task = asyncio.get_running_loop().create_task(_expiry_loop(interval))
+
+
+async def stop_task_expiry() -> None:
+    global _expiry_task
+    task, _expiry_task = _expiry_task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
 
 
 # Module-level async wrappers (backwards-compatible API)
@@ -247,7 +580,7 @@ async def create_task(input_meta: Optional[Dict[str, Any]] = None) -> str:
     return await _default_store.create_task(input_meta)
 
 
-async def get_task(task_id: str) -> Optional[Dict[str, Any]]:
+async def get_task(task_id: str) -> Optional[TaskSnapshot]:
     return await _default_store.get_task(task_id)
 
 
@@ -270,9 +603,30 @@ async def increment_retries(task_id: str) -> int:
     return await _default_store.increment_retries(task_id)
 
 
-async def list_tasks() -> Dict[str, Dict[str, Any]]:
+async def list_tasks() -> Dict[str, TaskSnapshot]:
     return await _default_store.list_tasks()
 
 
 async def cleanup_tasks(older_than_seconds: int = 24 * 3600) -> int:
     return await _default_store.cleanup_tasks(older_than_seconds)
+
+
+async def wait_for_task_update(task_id: str, seen: Optional[TaskSnapshot], timeout: float) -> Optional[TaskSnapshot]:
+    """Wait up to `timeout` seconds for `task_id` to differ from `seen`; see `InMemoryTaskStore.wait_for_update`.
+
+    Stores without change notification (the postgres backend) are re-read
+    every `task_wait_poll_ms` instead.
+    """
+    store = _default_store
+    if hasattr(store, "wait_for_update"):
+        return await store.wait_for_update(task_id, seen, timeout)
+    from app.services.utils import get_config_option
+
+    interval = max(0.01, float(get_config_option("task_wait_poll_ms", 250)) / 1000.0)
+    deadline = time.monotonic() + timeout
+    while True:
+        current = await store.get_task(task_id)
+        remaining = deadline - time.monotonic()
+        if current != seen or remaining <= 0:
+            return current
+        await asyncio.sleep(min(interval, remaining))
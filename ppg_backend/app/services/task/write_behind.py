@@ -0,0 +1,401 @@
+"""Write-behind persistence for the in-memory task store.
+
+`WriteBehindTaskStore` is an `InMemoryTaskStore` whose reads and writes
+stay in memory; every task it creates, updates or removes is only marked
+dirty. A background flusher writes the dirty tasks' current state to a
+sink every `flush_interval` seconds, in transactions of at most
+`batch_size` rows, so a burst of status changes to one task costs a
+single row write and the worker loop never waits on the database.
+
+Sinks:
+
+- `SQLiteTaskSink`: a local SQLite file (stdlib `sqlite3`, run on one
+  dedicated thread);
+- `PostgresTaskSink`: the `tasks` table, through the async session
+  factory. Meant for a single API process with the memory task backend;
+  with the postgres backend the table already is the store.
+
+`load()` restores the persisted tasks on startup. Tasks that were still
+pending or running lost their queued input with the old process, so they
+are reloaded as failed ("interrupted by restart"). At most
+`flush_interval` seconds of changes are lost on a crash; `close()`
+flushes everything on a clean shutdown.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from fastapi.logger import logger
+
+from app.schemas.task import TaskStatus
+from app.services.task.records import TaskRecord
+from app.services.task.task_service import InMemoryTaskStore, retention_options
+
+INTERRUPTED = "interrupted by restart"
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    input_meta TEXT,
+    result TEXT,
+    detail TEXT,
+    retries INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+_SQLITE_UPSERT = """
+INSERT INTO tasks (id, status, input_meta, result, detail, retries, last_error, created_at, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    status = excluded.status, input_meta = excluded.input_meta, result = excluded.result,
+    detail = excluded.detail, retries = excluded.retries, last_error = excluded.last_error,
+    updated_at = excluded.updated_at
+"""
+
+
+def _row(record: TaskRecord) -> Dict[str, Any]:
+    return {
+        "id": record.id,
+        "status": record.status.value,
+        "input_meta": record.input_meta,
+        "result": record.result,
+        "detail": record.detail,
+        "retries": record.retries,
+        "last_error": record.last_error,
+        "created_at": record.created_at,
+        "updated_at": record.updated_at,
+    }
+
+
+class SQLiteTaskSink:
+    """Task rows in a local SQLite file.
+
+    Args:
+        path: Database file; created (with its directory) when missing.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        # sqlite3 connections belong to one thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-sqlite")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(_SQLITE_SCHEMA)
+            self._conn.commit()
+        return self._conn
+
+    def _run(self, fn: Callable[..., Any], *args: Any) -> "asyncio.Future[Any]":
+        return asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _load(self) -> List[Dict[str, Any]]:
+        cur = self._connect().execute(
+            "SELECT id, status, input_meta, result, detail, retries, last_error, created_at, updated_at "
+            "FROM tasks ORDER BY created_at"
+        )
+        return [
+            {
+                "id": r[0], "status": r[1], "input_meta": json.loads(r[2]) if r[2] else {},
+                "result": json.loads(r[3]) if r[3] is not None else None, "detail": r[4],
+                "retries": r[5], "last_error": r[6], "created_at": r[7], "updated_at": r[8],
+            }
+            for r in cur
+        ]
+
+    def _write(self, upserts: List[Dict[str, Any]], deletes: List[str]) -> None:
+        conn = self._connect()
+        with conn:  # one transaction
+            if upserts:
+                conn.executemany(_SQLITE_UPSERT, [
+                    (r["id"], r["status"], json.dumps(r["input_meta"], default=str),
+                     json.dumps(r["result"], default=str) if r["result"] is not None else None,
+                     r["detail"], r["retries"], r["last_error"], r["created_at"], r["updated_at"])
+                    for r in upserts
+                ])
+            if deletes:
+                conn.executemany("DELETE FROM tasks WHERE id = ?", [(d,) for d in deletes])
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def load(self) -> List[Dict[str, Any]]:
+        return await self._run(self._load)
+
+    async def write(self, upserts: List[Dict[str, Any]], deletes: List[str]) -> None:
+        await self._run(self._write, upserts, deletes)
+
+    async def close(self) -> None:
+        await self._run(self._close)
+        self._executor.shutdown(wait=True)
+
+
+class PostgresTaskSink:
+    """Task rows in the Postgres `tasks` table.
+
+    Args:
+        session_factory: Async session factory (e.g. `AsyncSessionLocal`).
+    """
+
+    def __init__(self, session_factory: Callable[[], Any]) -> None:
+        self._session_factory = session_factory
+
+    async def load(self) -> List[Dict[str, Any]]:
+        from sqlalchemy import select
+
+        from app.models.db_models import Task
+
+        async with self._session_factory() as db:
+            rows = (await db.execute(select(Task).order_by(Task.created_at))).scalars().all()
+        return [
+            {
+                "id": str(r.id), "status": r.status, "input_meta": r.input_meta or {}, "result": r.result,
+                "detail": r.detail, "retries": r.retries, "last_error": r.last_error,
+                "created_at": r.created_at.timestamp() if r.created_at else time.time(),
+                "updated_at": r.updated_at.timestamp() if r.updated_at else time.time(),
+            }
+            for r in rows
+        ]
+
+    async def write(self, upserts: List[Dict[str, Any]], deletes: List[str]) -> None:
+        from sqlalchemy import delete
+        from sqlalchemy.dialects.postgresql import insert
+
+        from app.models.db_models import Task
+
+        def _dt(ts: float) -> datetime:
+            return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+        async with self._session_factory() as db:
+            if upserts:
+                stmt = insert(Task).values([
+                    {**r, "id": uuid.UUID(r["id"]), "created_at": _dt(r["created_at"]), "updated_at": _dt(r["updated_at"])}
+                    for r in upserts
+                ])
+                cols = ("status", "input_meta", "result", "detail", "retries", "last_error", "updated_at")
+                await db.execute(stmt.on_conflict_do_update(
+                    index_elements=[Task.id], set_={c: stmt.excluded[c] for c in cols}
+                ))
+            if deletes:
+                await db.execute(delete(Task).where(Task.id.in_([uuid.UUID(d) for d in deletes])))
+            await db.commit()
+
+    async def close(self) -> None:
+        pass
+
+
+class WriteBehindTaskStore(InMemoryTaskStore):
+    """In-memory task store persisted to `sink` in batched write-behind flushes.
+
+    Args:
+        sink: `SQLiteTaskSink`, `PostgresTaskSink` or any object with async
+            ``load()``, ``write(upserts, deletes)`` and ``close()``.
+        flush_interval: Maximum seconds between a change and its flush.
+        batch_size: Maximum rows per write transaction.
+        **kwargs: `InMemoryTaskStore` arguments (shards, retention limits).
+
+    Examples:
+        >>> store = WriteBehindTaskStore(SQLiteTaskSink("data/tasks.sqlite3"))
+        >>> await store.load()
+        >>> store.start_flusher()
+        >>> ...
+        >>> await store.close()
+    """
+
+    def __init__(self, sink: Any, flush_interval: float = 1.0, batch_size: int = 500, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        if flush_interval <= 0 or batch_size < 1:
+            raise ValueError("flush_interval must be > 0 and batch_size >= 1")
+        self.sink = sink
+        self.flush_interval = float(flush_interval)
+        self.batch_size = int(batch_size)
+        self._dirty: Dict[str, None] = {}  # guarded by _acct_lock
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._flushes = 0
+        self._flushed_rows = 0
+        self._flush_errors = 0
+        self._last_flush_ms = 0.0
+
+    # every create, update and removal passes through _account / _forget
+    def _account(self, task_id: str, before: Optional[TaskRecord], after: TaskRecord) -> None:
+        super()._account(task_id, before, after)
+        with self._acct_lock:
+            self._dirty[task_id] = None
+
+    def _forget(self, task_id: str) -> None:
+        # _acct_lock held
+        super()._forget(task_id)
+        self._dirty[task_id] = None
+
+    async def load(self) -> int:
+        """Restore persisted tasks; returns how many were loaded.
+
+        Call before serving. Pending and running tasks are reloaded as
+        failed, and retention limits and caps apply to the loaded set:
+        finished tasks keep their `ttl` deadline from `updated_at` and are
+        evicted first, oldest finish first.
+        """
+        rows = await self.sink.load()
+        now = time.time()
+        # finish order drives eviction under the caps
+        rows.sort(key=lambda row: row.get("updated_at") or 0.0)
+        interrupted: List[str] = []
+        for row in rows:
+            try:
+                status = TaskStatus(row["status"])
+                record = TaskRecord(
+                    row["id"], status, row["input_meta"] or {}, row["result"], row["detail"],
+                    row["retries"], row["last_error"], row["created_at"], row["updated_at"],
+                )
+            except Exception as e:
+                logger.warning("Skipping unreadable persisted task %s: %s", row.get("id"), e)
+                continue
+            if status not in (TaskStatus.completed, TaskStatus.failed):
+                record = record.replace(status=TaskStatus.failed, detail=INTERRUPTED, last_error=INTERRUPTED, updated_at=now)
+                interrupted.append(record.id)
+            i = self._index(record.id)
+            with self._locks[i]:
+                self._shards[i][record.id] = record
+                self._account(record.id, None, record)
+        with self._acct_lock:
+            # loaded rows are already persisted; only rewrite what changed
+            self._dirty = dict.fromkeys(interrupted)
+        self.expire(now)
+        self._enforce_caps()
+        logger.info("Loaded %d persisted task(s) (%d interrupted)", len(rows), len(interrupted))
+        return len(rows)
+
+    async def flush(self) -> int:
+        """Write all dirty tasks now; returns the number of rows written.
+
+        On a sink error the tasks stay dirty and are retried by the next
+        flush.
+        """
+        async with self._flush_lock:
+            with self._acct_lock:
+                dirty, self._dirty = self._dirty, {}
+                # a forgotten task may still sit in its shard until _drop
+                present = {t for t in dirty if t in self._sizes}
+            if not dirty:
+                return 0
+            t0 = time.perf_counter()
+            ids = list(dirty)
+            written = 0
+            try:
+                for start in range(0, len(ids), self.batch_size):
+                    chunk = ids[start:start + self.batch_size]
+                    upserts, deletes = self._collect(chunk, present)
+                    await self.sink.write(upserts, deletes)
+                    written += len(chunk)
+            except Exception:
+                self._flush_errors += 1
+                with self._acct_lock:
+                    for task_id in ids[written:]:
+                        self._dirty.setdefault(task_id, None)
+                logger.exception("Task flush failed; %d task(s) stay dirty", len(ids) - written)
+                raise
+            finally:
+                self._flushes += 1
+                self._flushed_rows += written
+                self._last_flush_ms = (time.perf_counter() - t0) * 1000.0
+            return written
+
+    def _collect(self, ids: Sequence[str], present: Set[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        upserts: List[Dict[str, Any]] = []
+        deletes: List[str] = []
+        for task_id in ids:
+            record = self._shards[self._index(task_id)].get(task_id) if task_id in present else None
+            if record is None:
+                deletes.append(task_id)
+            else:
+                upserts.append(_row(record))
+        return upserts, deletes
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                pass  # logged by flush; retried next interval
+
+    def start_flusher(self) -> None:
+        """Flush dirty tasks every `flush_interval` seconds in the background."""
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        """Stop the flusher, flush what is left and close the sink."""
+        task, self._flusher = self._flusher, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await self.flush()
+        finally:
+            await self.sink.close()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats.update({
+            "dirty": len(self._dirty),
+            "flushes": self._flushes,
+            "flushed_rows": self._flushed_rows,
+            "flush_errors": self._flush_errors,
+            "last_flush_ms": round(self._last_flush_ms, 2),
+        })
+        return stats
+
+
+def task_persistence() -> str:
+    """Return the configured `task_persistence`: ``""`` (off), ``"sqlite"`` or ``"postgres"``."""
+    from app.services.utils import get_config_option
+
+    kind = str(get_config_option("task_persistence", "") or "")
+    if kind not in ("", "sqlite", "postgres"):
+        logger.warning("Unknown task_persistence %r; persistence disabled", kind)
+        return ""
+    return kind
+
+
+def persistent_store_from_config(session_factory: Optional[Callable[[], Any]] = None) -> WriteBehindTaskStore:
+    """Write-behind store for `task_persistence` with the config's flush and retention settings."""
+    from app.services.utils import get_config_option
+
+    if task_persistence() == "postgres":
+        if session_factory is None:
+            from app.models.db_session import AsyncSessionLocal as session_factory
+        sink: Any = PostgresTaskSink(session_factory)
+    else:
+        sink = SQLiteTaskSink(str(get_config_option("task_sqlite_path", "data/tasks.sqlite3")))
+    return WriteBehindTaskStore(
+        sink,
+        flush_interval=max(0.01, float(get_config_option("task_flush_interval_ms", 1000)) / 1000.0),
+        batch_size=int(get_config_option("task_flush_batch_size", 500)),
+        max_tasks=int(get_config_option("task_max_count", 0)),
+        max_bytes=int(get_config_option("task_max_bytes", 0)),
+        **retention_options(),
+    )
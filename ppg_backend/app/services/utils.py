@@ -2,7 +2,7 @@ from fastapi.logger import logger
 import json
 import os
 from types import SimpleNamespace
-from typing import Optional, List
+from typing import Any, Optional, List
 from pathlib import Path
 
 def load_config_as_namespace(config_path: Optional[str] = None) -> SimpleNamespace:
@@ -88,4 +88,38 @@ def get_max_file_size(config: Optional[SimpleNamespace] = None) -> int:
         return int(getattr(cfg, "max_file_size", DEFAULT))
     except (TypeError, ValueError):
         logger.warning("Invalid max_file_size value in config; using default %d", DEFAULT)
-        return DEFAULT
\ No newline at end of file
+        return DEFAULT
+
+_config_cache: Optional[SimpleNamespace] = None
+
+
+def get_config_option(name: str, default: Any, config: Optional[SimpleNamespace] = None) -> Any:
+    """Return a single option from the config file, falling back to `default`.
+
+    The default config is loaded once and cached for subsequent lookups. Like
+    :func:`get_max_file_size`, a missing or invalid config file is not fatal:
+    the provided default is returned instead.
+
+    Args:
+        name: Attribute name in the config JSON (e.g. ``"inference_batch_size"``).
+        default: Value returned when the option or the config file is missing.
+        config: Optional already-loaded config namespace.
+
+    Returns:
+        The configured value, or `default`.
+
+    Examples:
+        >>> get_config_option("inference_batch_size", 1)
+        8
+    """
+    global _config_cache
+    cfg = config
+    if cfg is None:
+        if _config_cache is None:
+            try:
+                _config_cache = load_config_as_namespace()
+            except (FileNotFoundError, json.JSONDecodeError):
+                logger.info("Config unavailable; using default for %s", name)
+                return default
+        cfg = _config_cache
+    return getattr(cfg, name, default)
@@ -0,0 +1,274 @@
+"""Recipe embedding search backends.
+
+`VectorSearchBackend` returns, for each query embedding, the `top_k` recipe
+ids with their cosine similarity (``1 - (embedding <=> query)``), best
+first. Two implementations exist:
+
+- `PgVectorBackend`: the `rec_embeds` query in Postgres (the default);
+  a query batch is one `unnest`/LATERAL statement.
+- `InProcessVectorBackend`: exact search over a memory-mapped matrix
+  exported by `ppg_database/export_vector_index.py`, without any DB round
+  trip. The matrix is scanned in blocks, each block is scored with one
+  matmul for the whole query batch, and a running top-k is kept with
+  `argpartition`, so memory stays bounded for float32 and float16 files.
+
+Index directory layout (written by the exporter):
+
+- ``embeddings.npy``: (N, D) float32 or float16, rows L2-normalized
+- ``ids.npy``: (N,) unicode recipe ids, same order
+- ``meta.json``: ``{"count", "dim", "dtype", "normalized", "pca_dim"}``
+- ``pca.npz`` / ``reduced.npy`` (only with ``pca_dim > 0``): PCA mean and
+  components, and the (N, pca_dim) float32 projections of the rows
+
+With a PCA projection and `candidates` set, search runs in two stages: the
+nearest `candidates` rows by L2 distance in the reduced space (which
+approximates the full-dimension distance, hence cosine on unit rows) are
+gathered and reranked by exact full-dimension cosine.
+"""
+
+import asyncio
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+from fastapi.logger import logger
+
+from .exceptions import DBServiceError
+from .utils import get_config_option
+
+SearchResult = List[Tuple[str, float]]
+
+
+class VectorSearchBackend(ABC):
+    """Top-k cosine similarity search over recipe embeddings."""
+
+    name: str = "abstract"
+
+    @abstractmethod
+    async def search_batch(self, queries: np.ndarray, top_k: int = 10, db: Any = None) -> List[SearchResult]:
+        """Return one ``[(recipe_id, similarity), ...]`` list per query row."""
+
+    async def search(self, query: np.ndarray, top_k: int = 10, db: Any = None) -> SearchResult:
+        """Single-query convenience wrapper around :meth:`search_batch`."""
+        [result] = await self.search_batch(np.asarray(query)[None, :], top_k, db=db)
+        return result
+
+
+class PgVectorBackend(VectorSearchBackend):
+    """Search `rec_embeds` with pgvector's cosine distance operator.
+
+    Args:
+        session_factory: Used to open a session when the caller passes none.
+    """
+
+    name = "pgvector"
+
+    def __init__(self, session_factory: Optional[Callable[[], Any]] = None) -> None:
+        self._session_factory = session_factory
+
+    async def _search_with(self, db: Any, queries: np.ndarray, top_k: int) -> List[SearchResult]:
+        from .db_service import find_top_k_recipes, find_top_k_recipes_batch
+
+        if len(queries) == 1:
+            return [await find_top_k_recipes(db, queries[0], top_k=top_k)]
+        return await find_top_k_recipes_batch(db, queries, top_k=top_k)
+
+    async def search_batch(self, queries: np.ndarray, top_k: int = 10, db: Any = None) -> List[SearchResult]:
+        queries = np.atleast_2d(queries)
+        if db is not None:
+            return await self._search_with(db, queries, top_k)
+        if self._session_factory is None:
+            raise DBServiceError("PgVectorBackend needs a DB session or a session factory")
+        async with self._session_factory() as session:
+            return await self._search_with(session, queries, top_k)
+
+
+class InProcessVectorBackend(VectorSearchBackend):
+    """In-process search over an (N, D) embedding matrix, exact by default.
+
+    Args:
+        embeddings: (N, D) array or memmap with L2-normalized rows.
+        ids: (N,) recipe ids in row order.
+        block_rows: Rows scored per matmul; bounds temporary memory to
+            about ``block_rows * (D + batch) * 4`` bytes.
+        pca: Optional ``(mean, components)`` of the PCA projection.
+        reduced: (N, pca_dim) projected rows; required with `pca`.
+        candidates: Rows taken from the reduced-space search and reranked
+            exactly; 0 keeps the exhaustive search.
+
+    Examples:
+        >>> backend = InProcessVectorBackend.load("/data/rec_index")
+        >>> backend.search_sync(query_emb, top_k=10)[:1]
+        [('000018c8a5', 0.83)]
+    """
+
+    name = "inprocess"
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        ids: np.ndarray,
+        block_rows: int = 65536,
+        pca: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+        reduced: Optional[np.ndarray] = None,
+        candidates: int = 0,
+    ) -> None:
+        if embeddings.ndim != 2 or len(ids) != embeddings.shape[0]:
+            raise ValueError("embeddings must be (N, D) with one id per row")
+        if block_rows < 1:
+            raise ValueError("block_rows must be >= 1")
+        if (pca is None) != (reduced is None):
+            raise ValueError("pca and reduced must be given together")
+        if reduced is not None and (reduced.shape[0] != embeddings.shape[0] or reduced.shape[1] != pca[1].shape[0]):
+            raise ValueError("reduced must be (N, pca_dim) matching embeddings and pca components")
+        self._emb = embeddings
+        self._ids = np.asarray(ids)
+        self.block_rows = int(block_rows)
+        self._pca = pca
+        self._reduced = reduced
+        self.candidates = int(candidates)
+
+    @property
+    def count(self) -> int:
+        return self._emb.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self._emb.shape[1]
+
+    @property
+    def two_stage(self) -> bool:
+        """True when searches use the PCA coarse stage."""
+        return self._reduced is not None and self.candidates > 0
+
+    @classmethod
+    def load(cls, index_path: str, block_rows: int = 65536, candidates: int = 0) -> "InProcessVectorBackend":
+        """Memory-map an exported index directory.
+
+        `candidates` enables two-stage search when the index was exported
+        with ``--pca-dim``; it is ignored otherwise.
+
+        Raises:
+            DBServiceError: when the directory is missing, inconsistent, or
+                was exported without normalization.
+        """
+        pca = reduced = None
+        try:
+            with open(os.path.join(index_path, "meta.json"), "r") as f:
+                meta = json.load(f)
+            emb = np.load(os.path.join(index_path, "embeddings.npy"), mmap_mode="r")
+            ids = np.load(os.path.join(index_path, "ids.npy"), allow_pickle=False)
+            if meta.get("pca_dim"):
+                with np.load(os.path.join(index_path, "pca.npz")) as f:
+                    pca = (f["mean"].astype(np.float32), f["components"].astype(np.float32))
+                reduced = np.load(os.path.join(index_path, "reduced.npy"), mmap_mode="r")
+        except (OSError, ValueError, KeyError) as e:
+            raise DBServiceError(f"Cannot load vector index from {index_path}: {e}") from e
+        if not meta.get("normalized", False):
+            raise DBServiceError(f"Vector index {index_path} is not normalized; re-export it")
+        if emb.shape != (meta.get("count"), meta.get("dim")):
+            raise DBServiceError(f"Vector index {index_path} shape {emb.shape} does not match meta.json")
+        if reduced is not None and reduced.shape != (emb.shape[0], meta["pca_dim"]):
+            raise DBServiceError(f"Vector index {index_path} reduced shape {reduced.shape} does not match meta.json")
+        logger.info(
+            "Vector index %s mapped: %d x %d %s (pca: %s, candidates: %d)",
+            index_path, emb.shape[0], emb.shape[1], emb.dtype, meta.get("pca_dim") or "off", candidates if pca else 0,
+        )
+        return cls(emb, ids, block_rows=block_rows, pca=pca, reduced=reduced, candidates=candidates)
+
+    def _scan_topk(self, matrix: np.ndarray, q: np.ndarray, k: int, l2: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """Blocked top-k of `q @ matrix.T` (unsorted). With `l2`, rank by smallest L2 distance instead."""
+        best_s = np.empty((q.shape[0], 0), dtype=np.float32)
+        best_i = np.empty((q.shape[0], 0), dtype=np.int64)
+        for start in range(0, matrix.shape[0], self.block_rows):
+            block = np.asarray(matrix[start:start + self.block_rows], dtype=np.float32)
+            scores = q @ block.T
+            if l2:
+                # -|x - q|^2 up to the per-query constant |q|^2
+                scores = 2.0 * scores - np.einsum("ij,ij->i", block, block)
+            cand_s = np.concatenate([best_s, scores], axis=1)
+            cand_i = np.concatenate([best_i, np.broadcast_to(np.arange(start, start + block.shape[0]), scores.shape)], axis=1)
+            if cand_s.shape[1] > k:
+                keep = np.argpartition(-cand_s, k - 1, axis=1)[:, :k]
+                cand_s = np.take_along_axis(cand_s, keep, axis=1)
+                cand_i = np.take_along_axis(cand_i, keep, axis=1)
+            best_s, best_i = cand_s, cand_i
+        return best_s, best_i
+
+    def _rerank(self, q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Coarse PCA stage followed by exact cosine over the candidates."""
+        mean, components = self._pca
+        n = min(max(self.candidates, k), self.count)
+        _, cand_i = self._scan_topk(self._reduced, (q - mean) @ components.T, n, l2=True)
+        best_s = np.empty((q.shape[0], k), dtype=np.float32)
+        best_i = np.empty((q.shape[0], k), dtype=np.int64)
+        for row, (query, cand) in enumerate(zip(q, cand_i)):
+            cand = np.sort(cand)  # ascending rows read the memmap sequentially
+            scores = np.asarray(self._emb[cand], dtype=np.float32) @ query
+            keep = np.argpartition(-scores, k - 1)[:k] if n > k else np.arange(n)
+            best_s[row], best_i[row] = scores[keep], cand[keep]
+        return best_s, best_i
+
+    def search_batch_sync(self, queries: np.ndarray, top_k: int = 10) -> List[SearchResult]:
+        """Blocking search; see :meth:`search_batch`. Exact unless two-stage search is enabled."""
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if q.shape[1] != self.dim:
+            raise ValueError(f"query dim {q.shape[1]} does not match index dim {self.dim}")
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        q = q / np.where(norms > 0, norms, 1.0)
+        k = min(int(top_k), self.count)
+        if k <= 0:
+            return [[] for _ in range(q.shape[0])]
+
+        if self.two_stage:
+            best_s, best_i = self._rerank(q, k)
+        else:
+            best_s, best_i = self._scan_topk(self._emb, q, k)
+
+        order = np.argsort(-best_s, axis=1, kind="stable")
+        best_s = np.take_along_axis(best_s, order, axis=1)
+        best_i = np.take_along_axis(best_i, order, axis=1)
+        return [
+            [(str(self._ids[i]), float(s)) for i, s in zip(row_i, row_s)]
+            for row_i, row_s in zip(best_i, best_s)
+        ]
+
+    def search_sync(self, query: np.ndarray, top_k: int = 10) -> SearchResult:
+        return self.search_batch_sync(np.asarray(query)[None, :], top_k)[0]
+
+    async def search_batch(self, queries: np.ndarray, top_k: int = 10, db: Any = None) -> List[SearchResult]:
+        # numpy matmul releases the GIL; keep the event loop free
+        return await asyncio.to_thread(self.search_batch_sync, queries, top_k)
+
+
+_default_backend: Optional[VectorSearchBackend] = None
+
+
+def get_vector_backend() -> VectorSearchBackend:
+    """Return the backend selected by `vector_backend` (``"pgvector"`` or ``"inprocess"``).
+
+    Raises:
+        DBServiceError: when ``"inprocess"`` is selected but `vector_index_path`
+            is unset or cannot be loaded.
+    """
+    global _default_backend
+    if _default_backend is None:
+        kind = str(get_config_option("vector_backend", "pgvector"))
+        if kind == "inprocess":
+            path = get_config_option("vector_index_path", "")
+            if not path:
+                raise DBServiceError("vector_backend 'inprocess' requires vector_index_path")
+            _default_backend = InProcessVectorBackend.load(
+                path,
+                block_rows=int(get_config_option("vector_block_rows", 65536)),
+                candidates=int(get_config_option("vector_pca_candidates", 0)),
+            )
+        else:
+            if kind != "pgvector":
+                logger.warning("Unknown vector_backend %r; falling back to 'pgvector'", kind)
+            from app.models.db_session import AsyncSessionLocal
+
+            _default_backend = PgVectorBackend(AsyncSessionLocal)
+    return _default_backend
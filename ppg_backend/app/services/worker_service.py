@@ -1,8 +1,16 @@
 import asyncio
-from typing import List, Optional, Callable, Awaitable, Any
+import functools
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Callable, Awaitable, Any, Tuple
 
+from .autoscaler import ScalingPolicy, policy_from_config
 from .queue_service import QueueManager
 from .queue_service import get_default_queue_manager, process_task_item
+from .stage_meter import get_stage_meter, stage_meters
+from .utils import get_config_option
 from fastapi.logger import logger
 
 # In-process worker control
@@ -14,16 +22,22 @@ async def _worker_loop(
     shutdown_event: asyncio.Event,
     qm: QueueManager,
     process_fn: Callable[[str, Any], Awaitable[None]],
+    retire: Optional[asyncio.Event] = None,
 ) -> None:
     """Worker coroutine: consumes from queue until shutdown_event is set and queue is drained.
 
     This coroutine reads tasks from the provided QueueManager and calls the
-    provided async `process_fn(task_id, file_tuple)` for each item.
+    provided async `process_fn(task_id, file_tuple)` for each item. Setting
+    `retire` stops only this worker, after its current item (used by the
+    autoscaler to shrink the pool).
     """
     logger.info("Worker %d starting", worker_idx)
     q = qm.ensure()
+    meter = get_stage_meter("worker")
     try:
         while True:
+            if retire is not None and retire.is_set():
+                break
             try:
                 item = await asyncio.wait_for(q.get(), timeout=1.0)
             except asyncio.TimeoutError:
@@ -31,12 +45,14 @@ async def _worker_loop(
                 if shutdown_event.is_set() and q.empty():
                     break
                 continue
+            qm.note_dequeued(item[0])
 
             # item is expected to be (task_id, file_tuple)
             try:
                 logger.info("Worker %d processing task %s", worker_idx, item[0])
                 task_id, file_tuple = item
-                await process_fn(task_id, file_tuple)
+                async with meter:
+                    await process_fn(task_id, file_tuple)
             except Exception:
                 logger.exception("Error processing task %s in worker %d", item[0], worker_idx)
             finally:
@@ -81,7 +97,7 @@ async def stop_workers(
     This will set the shutdown_event and wait for worker tasks to finish. If the
     queue does not drain within `timeout`, remaining worker tasks are cancelled.
     """
-    global _worker_tasks
+    global _worker_tasks, _supervisor
     qm = qm or get_default_queue_manager()
     shutdown_event.set()
     # Wait for queue to be drained
@@ -96,4 +112,320 @@ async def stop_workers(
             t.cancel()
     # Await cancellation
     await asyncio.gather(*_worker_tasks, return_exceptions=True)
-    _worker_tasks = []
\ No newline at end of file
+    _worker_tasks = []
+    _supervisor = None
+
+# -------------------------
+# Autoscaled in-process workers
+# -------------------------
+_supervisor: Optional["WorkerSupervisor"] = None
+
+
+class WorkerSupervisor:
+    """Grows and shrinks the `_worker_loop` pool following a `ScalingPolicy`.
+
+    Every `interval` seconds the queue depth, the age of the oldest waiting
+    task and the per-stage utilization (from `stage_meter`) are sampled and
+    passed to the policy. Retired workers finish their current item first.
+    Decisions are logged and kept in `stats()` for `/api/metrics`.
+
+    Worker tasks are registered in the module's worker list, so
+    `stop_workers` drains and stops an autoscaled pool like a fixed one.
+    """
+
+    def __init__(
+        self,
+        qm: QueueManager,
+        process_fn: Callable[[str, Any], Awaitable[None]],
+        policy: ScalingPolicy,
+        shutdown_event: asyncio.Event,
+        interval: float = 1.0,
+        saturation: float = 0.95,
+        history: int = 20,
+    ) -> None:
+        self._qm = qm
+        self._process_fn = process_fn
+        self.policy = policy
+        self._shutdown = shutdown_event
+        self.interval = float(interval)
+        self.saturation = float(saturation)
+        self._workers: Dict[int, Tuple[asyncio.Task, asyncio.Event]] = {}
+        self._next_idx = 0
+        self._decisions: deque = deque(maxlen=history)
+        self._scale_ups = 0
+        self._scale_downs = 0
+        self._last_sample: Dict[str, Any] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self._workers)
+
+    def _spawn(self) -> None:
+        idx, self._next_idx = self._next_idx, self._next_idx + 1
+        retire = asyncio.Event()
+        t = asyncio.create_task(_worker_loop(idx, self._shutdown, self._qm, self._process_fn, retire))
+        _worker_tasks.append(t)
+        t.add_done_callback(_forget_worker_task)
+        self._workers[idx] = (t, retire)
+
+    def _retire(self) -> None:
+        # newest first, so worker indexes stay dense at the bottom
+        idx = max(self._workers)
+        _, retire = self._workers.pop(idx)
+        retire.set()
+
+    def resize(self, size: int) -> None:
+        while self.size < size:
+            self._spawn()
+        while self.size > size:
+            self._retire()
+
+    def _saturated_stage(self, utilization: Dict[str, float]) -> Optional[str]:
+        for name, meter in stage_meters().items():
+            if meter.capacity is not None and name in utilization and utilization[name] >= self.saturation:
+                return name
+        return None
+
+    def tick(self) -> int:
+        """Sample, ask the policy and apply its decision; returns the size change."""
+        now = time.monotonic()
+        utilization = {}
+        for name, meter in stage_meters().items():
+            _, in_flight = meter.sample()
+            # fraction of a capacity-limited stage's slots in use; mean in flight otherwise
+            utilization[name] = in_flight / meter.capacity if meter.capacity else in_flight
+        size = self.size
+        worker_util = min(1.0, utilization.get("worker", 0.0) / size) if size else 1.0
+        depth, oldest_wait = self._qm.depth(), self._qm.oldest_wait()
+        delta, reason = self.policy.decide(
+            size, depth, oldest_wait, worker_util, now, self._saturated_stage(utilization)
+        )
+        self._last_sample = {
+            "depth": depth,
+            "oldest_wait_ms": round(oldest_wait * 1000.0, 1),
+            "utilization": round(worker_util, 3),
+            "stages": {k: round(v, 3) for k, v in utilization.items()},
+        }
+        if delta:
+            self.resize(size + delta)
+            if delta > 0:
+                self._scale_ups += 1
+            else:
+                self._scale_downs += 1
+            logger.info("Worker pool %d -> %d (%s)", size, self.size, reason)
+        if reason:
+            self._decisions.append({"at": time.time(), "from": size, "to": self.size, "reason": reason})
+        return delta
+
+    async def run(self) -> None:
+        while not self._shutdown.is_set():
+            try:
+                await asyncio.wait_for(self._shutdown.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._shutdown.is_set():
+                break
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Worker autoscaler tick failed")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "min": self.policy.min_workers,
+            "max": self.policy.max_workers,
+            "scale_ups": self._scale_ups,
+            "scale_downs": self._scale_downs,
+            "last_sample": self._last_sample,
+            "decisions": list(self._decisions),
+        }
+
+
+def _forget_worker_task(t: asyncio.Task) -> None:
+    try:
+        _worker_tasks.remove(t)
+    except ValueError:
+        pass
+
+
+def _size_default_executor(max_workers: int) -> None:
+    """Make sure the loop's default thread pool is not smaller than the worker pool can get.
+
+    `ThreadPoolExecutor` starts threads only on demand, so executor
+    capacity follows the number of workers actually submitting work.
+    """
+    wanted = max_workers + 4
+    if wanted > min(32, (os.cpu_count() or 1) + 4):
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=wanted, thread_name_prefix="ppg-worker")
+        )
+
+
+async def start_autoscaled_workers(
+    initial_workers: int,
+    policy: Optional[ScalingPolicy] = None,
+    qm: Optional[QueueManager] = None,
+    process_fn: Optional[Callable[[str, Any], Awaitable[None]]] = None,
+    interval: Optional[float] = None,
+) -> asyncio.Event:
+    """Start `initial_workers` (clamped to the policy bounds) and the supervisor.
+
+    Returns the shutdown event for `stop_workers`.
+    """
+    global _supervisor
+    policy = policy or policy_from_config()
+    if interval is None:
+        interval = float(get_config_option("autoscale_interval_seconds", 1.0))
+    shutdown_event = asyncio.Event()
+    _size_default_executor(policy.max_workers)
+    _supervisor = WorkerSupervisor(
+        qm or get_default_queue_manager(),
+        process_fn or (lambda tid, ft: process_task_item(tid, ft)),
+        policy,
+        shutdown_event,
+        interval=interval,
+    )
+    _supervisor.resize(policy.clamp(initial_workers))
+    _worker_tasks.append(asyncio.create_task(_supervisor.run()))
+    logger.info(
+        "Worker autoscaling on: %d worker(s), bounds [%d, %d]",
+        _supervisor.size, policy.min_workers, policy.max_workers,
+    )
+    return shutdown_event
+
+
+def get_worker_supervisor() -> Optional[WorkerSupervisor]:
+    """The running supervisor, or None when the pool size is fixed."""
+    return _supervisor
+
+
+# -------------------------
+# DB-backed workers (task_backend "postgres")
+# -------------------------
+_db_worker_tasks: List[asyncio.Task] = []
+_db_listen_conn = None
+
+
+async def _db_worker_loop(
+    worker_idx: int,
+    shutdown_event: asyncio.Event,
+    wakeup: asyncio.Event,
+    store: Any,
+    process_fn: Callable[[str, Any], Awaitable[None]],
+    poll_interval: float,
+) -> None:
+    """Claim tasks from the shared `tasks` table until `shutdown_event` is set.
+
+    An idle worker sleeps until `wakeup` (set on NOTIFY) or `poll_interval`.
+    """
+    from .task.pg_task_store import worker_id
+
+    wid = worker_id(worker_idx)
+    logger.info("DB worker %s starting", wid)
+    try:
+        while not shutdown_event.is_set():
+            try:
+                claimed = await store.claim(wid)
+            except Exception:
+                logger.exception("DB worker %s failed to claim a task", wid)
+                claimed = []
+            if not claimed:
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            for task_id, task_input in claimed:
+                try:
+                    logger.info("DB worker %s processing task %s", wid, task_id)
+                    await process_fn(task_id, task_input)
+                except Exception:
+                    logger.exception("Error processing task %s in DB worker %s", task_id, wid)
+    except asyncio.CancelledError:
+        logger.info("DB worker %s cancelled", wid)
+        raise
+    finally:
+        logger.info("DB worker %s stopped", wid)
+
+
+async def _db_reaper_loop(shutdown_event: asyncio.Event, store: Any, timeout: float, max_retries: int) -> None:
+    """Periodically requeue tasks claimed longer than `timeout` ago (their worker died)."""
+    while not shutdown_event.is_set():
+        try:
+            await store.requeue_stale(timeout, max_retries=max_retries)
+        except Exception:
+            logger.exception("Stale task requeue failed")
+        try:
+            await asyncio.wait_for(shutdown_event.wait(), timeout=max(1.0, timeout / 2))
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _process_claimed(store: Any, task_id: str, task_input: Any) -> None:
+    """Process a claimed task; its final writes are fenced by the worker's claim."""
+    claimed_by = getattr(task_input, "claimed_by", None)
+    await process_task_item(
+        task_id, task_input,
+        save_fn=functools.partial(store.save_task_result, claimed_by=claimed_by),
+        update_status_fn=functools.partial(store.update_task_status, claimed_by=claimed_by),
+    )
+
+
+async def start_db_workers(
+    num_workers: int,
+    store: Any,
+    process_fn: Optional[Callable[[str, Any], Awaitable[None]]] = None,
+    poll_interval: float = 1.0,
+    listen_dsn: Optional[str] = None,
+    stale_timeout: float = 120.0,
+    max_retries: int = 3,
+) -> asyncio.Event:
+    """Start workers claiming from a `PostgresTaskStore`; returns their shutdown event.
+
+    With `listen_dsn` one connection LISTENs on the store's channel so idle
+    workers wake as soon as a task is enqueued on any node.
+    """
+    global _db_worker_tasks, _db_listen_conn
+    shutdown_event = asyncio.Event()
+    wakeup = asyncio.Event()
+    process_fn = process_fn or functools.partial(_process_claimed, store)
+    if listen_dsn and getattr(store, "channel", ""):
+        import asyncpg
+
+        try:
+            _db_listen_conn = await asyncpg.connect(listen_dsn)
+            await _db_listen_conn.add_listener(store.channel, lambda *_: wakeup.set())
+        except Exception:
+            _db_listen_conn = None
+            logger.warning("Could not LISTEN on %s; DB workers poll every %.1fs", store.channel, poll_interval, exc_info=True)
+    for i in range(num_workers):
+        _db_worker_tasks.append(asyncio.create_task(
+            _db_worker_loop(i, shutdown_event, wakeup, store, process_fn, poll_interval)
+        ))
+    if stale_timeout > 0:
+        _db_worker_tasks.append(asyncio.create_task(_db_reaper_loop(shutdown_event, store, stale_timeout, max_retries)))
+    return shutdown_event
+
+
+async def stop_db_workers(shutdown_event: asyncio.Event, timeout: float = 5.0) -> None:
+    """Stop claiming new tasks and wait up to `timeout` for the current ones to finish.
+
+    Tasks still running when the timeout expires stay claimed and are
+    requeued by another node's reaper after the stale timeout.
+    """
+    global _db_worker_tasks, _db_listen_conn
+    shutdown_event.set()
+    if _db_worker_tasks:
+        _, pending = await asyncio.wait(_db_worker_tasks, timeout=timeout)
+        for t in pending:
+            t.cancel()
+        await asyncio.gather(*_db_worker_tasks, return_exceptions=True)
+    _db_worker_tasks = []
+    if _db_listen_conn is not None:
+        try:
+            await _db_listen_conn.close()
+        except Exception:
+            logger.exception("Error closing DB worker listen connection")
+        _db_listen_conn = None
@@ -2,7 +2,7 @@ import logging
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.logger import logger
-from app.api import analyze, health
+from app.api import analyze, health, metrics
 from contextlib import asynccontextmanager
 
 logging.basicConfig(level=logging.INFO)
@@ -10,19 +10,94 @@ logging.basicConfig(level=logging.INFO)
 # --- Startup event ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    from app.services.ai_service import load_model
-    from app.services.worker_service import start_workers, stop_workers
-    # Load global resources
-    load_model()
-    # Start in-process worker pool
-    shutdown_event = await start_workers()
+    from app.services.ai_service import (
+        load_model,
+        stop_embedding_batcher,
+        inference_mode,
+        start_process_executor,
+        shutdown_process_executor,
+    )
+    from app.services.worker_service import (
+        start_workers,
+        stop_workers,
+        start_autoscaled_workers,
+        start_db_workers,
+        stop_db_workers,
+    )
+    from app.services.autoscaler import autoscale_enabled
+    from app.services.task.task_service import set_default_store, retention_options, start_task_expiry, stop_task_expiry
+    from app.services.task.pg_task_store import PostgresTaskStore, task_backend, db_worker_options
+    from app.services.task.write_behind import task_persistence, persistent_store_from_config
+    from app.services.poison_matcher import start_poison_matcher, stop_poison_matcher
+    from app.services.db_service import poison_lookup, install_vector_search_settings, detect_normalized_embeddings
+    from app.models.db_session import engine, AsyncSessionLocal
+    from app.services.vector_search import get_vector_backend
+    from app.services.queue_service import stop_search_batcher, stop_analysis_pipeline
+    from app.services.utils import get_config_option
+    # Load global resources. In process mode every inference worker loads its
+    # own model copy, so the API process skips it.
+    if inference_mode() == "process":
+        start_process_executor()
+    else:
+        load_model()
+    # ivfflat.probes / hnsw.ef_search for every pooled DB connection
+    install_vector_search_settings(engine)
+    # Inner-product search is used once rec_embeds is known to be normalized.
+    async with AsyncSessionLocal() as db:
+        await detect_normalized_embeddings(db)
+    # Map the in-process vector index (if configured) before serving.
+    get_vector_backend()
+    # Unless the precomputed recipe_poisons index is used, poison names are
+    # matched in memory; the table is loaded in the background and reloaded
+    # on NOTIFY or periodically.
+    if poison_lookup() != "index":
+        await start_poison_matcher()
+    # Start the worker pool. With micro-batching enabled the worker count
+    # bounds how many images can share one forward pass. With the postgres
+    # task backend, tasks live in the shared `tasks` table and this process
+    # claims them like any standalone `worker.py` node (num_workers may be 0).
+    num_workers = int(get_config_option("num_workers", 2))
+    persistent_store = None
+    if task_backend() == "postgres":
+        store = PostgresTaskStore(AsyncSessionLocal, **retention_options())
+        set_default_store(store)
+        shutdown_event = await start_db_workers(num_workers, store, **db_worker_options())
+        stop_fn = stop_db_workers
+    else:
+        # With task_persistence, task state stays in memory and is written
+        # behind to SQLite/Postgres; finished tasks survive a restart.
+        if task_persistence():
+            persistent_store = persistent_store_from_config(AsyncSessionLocal)
+            await persistent_store.load()
+            set_default_store(persistent_store)
+            persistent_store.start_flusher()
+        # With autoscale_workers the pool starts at num_workers and is
+        # resized within the autoscale_* bounds from queue and stage load.
+        if autoscale_enabled():
+            shutdown_event = await start_autoscaled_workers(num_workers)
+        else:
+            shutdown_event = await start_workers(num_workers=num_workers)
+        stop_fn = stop_workers
     app.state._task_queue_shutdown = shutdown_event
+    # Finished tasks are dropped after task_ttl_seconds.
+    start_task_expiry(float(get_config_option("task_expiry_interval_seconds", 30)))
     yield
+    await stop_task_expiry()
     # Cleanup workers
     try:
-        await stop_workers(app.state._task_queue_shutdown)
+        await stop_fn(app.state._task_queue_shutdown)
     except Exception:
         logger.exception("Error during worker shutdown")
+    if persistent_store is not None:
+        try:
+            await persistent_store.close()
+        except Exception:
+            logger.exception("Error flushing task state")
+    await stop_embedding_batcher()
+    await stop_poison_matcher()
+    await stop_search_batcher()
+    await stop_analysis_pipeline()
+    shutdown_process_executor()
 
 app = FastAPI(
     title="Pet Poison Guard Backend API",
@@ -36,6 +111,7 @@ app = FastAPI(
 # --- Register Routers ---
 app.include_router(analyze.router)
 app.include_router(health.router)
+app.include_router(metrics.router)
 
 # --- Error handler for generic error hiding sensitive info ---
 @app.exception_handler(Exception)
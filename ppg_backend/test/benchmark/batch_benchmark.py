@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from math import ceil
+from typing import Dict, List
+
+import torch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from app.services import ai_service  # noqa: E402
+from app.services.batch_service import MicroBatcher  # noqa: E402
+from app.services.encoders.trijoint import im2recipe  # noqa: E402
+
+
+# --- IGNORE ---
+"""
+Throughput / latency benchmark for the embedding micro-batcher.
+
+A fixed number of concurrent clients submit preprocessed (3, 224, 224) tensors
+to a `MicroBatcher` wrapping `ai_service.embed_batch`. For every max batch size
+the script reports throughput (images/s) and p50/p99 submit-to-result latency.
+
+The model is built with random weights (no checkpoint or torchvision download
+is needed); the forward cost is identical to the production model.
+"""
+# --- IGNORE ---
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(asctime)s] %(levelname)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+def percentile(sorted_list: List[float], pct: float) -> float:
+    # rank-based percentile, same method as test/performance/locustfile.py
+    n = len(sorted_list)
+    idx = max(0, min(n - 1, ceil((pct / 100.0) * n) - 1))
+    return sorted_list[idx]
+
+
+async def run_setting(batch_size: int, wait_ms: float, clients: int, requests: int) -> Dict[str, float]:
+    batcher = MicroBatcher(ai_service._embed_tensors, max_batch_size=batch_size, max_wait_ms=wait_ms)
+    latencies: List[float] = []
+    remaining = requests
+
+    async def client() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            x = torch.randn(3, 224, 224)
+            t0 = time.perf_counter()
+            await batcher.submit(x)
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    wall = time.perf_counter() - t0
+    stats = batcher.stats()
+    await batcher.stop()
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / wall,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "avg_batch": stats["avg_batch_size"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-batching throughput/p99 benchmark")
+    parser.add_argument("--batch-sizes", default="1,2,4,8,16", help="Comma separated max batch sizes")
+    parser.add_argument("--wait-ms", type=float, default=5.0, help="Max batch wait in milliseconds")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent submitting clients")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per setting")
+    parser.add_argument("--threads", type=int, default=0, help="torch.set_num_threads (0 = torch default)")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    ai_service.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    ai_service.model = im2recipe(pretrained=False).to(ai_service.device).eval()
+    logging.getLogger("fastapi").setLevel(logging.WARNING)
+
+    logger.info(
+        "device=%s torch_threads=%d clients=%d requests=%d wait_ms=%.1f",
+        ai_service.device, torch.get_num_threads(), args.clients, args.requests, args.wait_ms,
+    )
+    # warm-up so the first setting does not pay for allocator/kernel setup
+    ai_service.embed_batch(torch.randn(2, 3, 224, 224))
+
+    logger.info("%10s %12s %10s %10s %10s", "max_batch", "img/s", "p50(s)", "p99(s)", "avg_batch")
+    for bs in [int(b) for b in args.batch_sizes.split(",")]:
+        r = asyncio.run(run_setting(bs, args.wait_ms, args.clients, args.requests))
+        logger.info("%10d %12.2f %10.3f %10.3f %10.2f", bs, r["throughput"], r["p50"], r["p99"], r["avg_batch"])
+
+
+if __name__ == "__main__":
+    main()
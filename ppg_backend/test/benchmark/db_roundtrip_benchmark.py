@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import event, select
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from app.models.db_models import PetPoison, RecipeData  # noqa: E402
+from app.models.db_session import AsyncSessionLocal, engine  # noqa: E402
+from app.services.db_service import (  # noqa: E402
+    find_poisons_for_embedding,
+    find_top_k_recipes,
+)
+
+
+# --- IGNORE ---
+"""
+DB round trips and latency of the recipe -> poison lookup.
+
+`legacy` is the previous implementation (one recipe SELECT plus one full
+`pet_poisons` scan per top-k recipe, after the vector search); `joined` is
+`find_poisons_for_embedding` (vector search joined with recipe_data, poisons
+read once). Statements are counted with a `before_cursor_execute` listener.
+
+Requires a populated database (see ppg_database) reachable through the
+backend's DATABASE_URL.
+"""
+# --- IGNORE ---
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(asctime)s] %(levelname)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+_statements = 0
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count(conn, cursor, statement, parameters, context, executemany):
+    global _statements
+    _statements += 1
+
+
+async def legacy_lookup(db, query_emb, top_k: int) -> List[Dict[str, str]]:
+    topk = await find_top_k_recipes(db, query_emb, top_k=top_k)
+    result = []
+    for rid, _ in topk:
+        recipe_row = (await db.execute(select(RecipeData).filter(RecipeData.id == rid))).scalar_one_or_none()
+        if not recipe_row:
+            continue
+        ingredients_lower = ', '.join([i['text'] for i in recipe_row.data.get("ingredients", [])]).lower()
+        for entry in (await db.execute(select(PetPoison))).scalars().all():
+            names = [entry.name] + list(entry.alternate_names or [])
+            if entry.name and any(n and n.lower() in ingredients_lower for n in names):
+                result.append({"name": entry.name})
+                break
+    return result
+
+
+async def joined_lookup(db, query_emb, top_k: int) -> List[Dict[str, str]]:
+    return await find_poisons_for_embedding(db, query_emb, top_k=top_k)
+
+
+async def measure(fn, queries: np.ndarray, top_k: int) -> Tuple[float, float]:
+    global _statements
+    _statements = 0
+    latencies = []
+    for q in queries:
+        async with AsyncSessionLocal() as db:
+            t0 = time.perf_counter()
+            await fn(db, q, top_k)
+            latencies.append(time.perf_counter() - t0)
+    return _statements / len(queries), float(np.median(latencies)) * 1000.0
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Recipe/poison lookup round-trip benchmark")
+    parser.add_argument("--queries", type=int, default=50, help="Number of random query vectors")
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, 1024)).astype(np.float32)
+    # warm up connections and plans
+    async with AsyncSessionLocal() as db:
+        await joined_lookup(db, queries[0], args.top_k)
+
+    logger.info("%8s %18s %14s", "impl", "statements/query", "p50(ms)")
+    for name, fn in (("legacy", legacy_lookup), ("joined", joined_lookup)):
+        stmts, p50 = await measure(fn, queries, args.top_k)
+        logger.info("%8s %18.1f %14.1f", name, stmts, p50)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,155 @@
+import argparse
+import asyncio
+import logging
+import os
+import pickle
+import sys
+import time
+from typing import List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+
+# --- IGNORE ---
+"""
+Recall check for half-precision (halfvec) candidate selection.
+
+Compares three ways of ranking recipes for each query against the exact
+float32 cosine top-k:
+
+- half:          rank by float16 distance only (what the halfvec index sees)
+- half+rescore:  take top_k * factor float16 candidates, re-rank them with
+                 float32 distances (what `vector_search_precision: "half"`
+                 does in db_service)
+
+Runs in process on rec_embeds.pkl / img_embeds.pkl, or on synthetic
+clustered data with --synthetic. With --db the same comparison is made
+against the live database (requires the halfvec index from
+ppg_database/40_create_indexes.sh with VECTOR_INDEX_PRECISION=half).
+"""
+# --- IGNORE ---
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(asctime)s] %(levelname)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+HALF_SQL = """
+SELECT c.id FROM (
+    SELECT id, embedding <=> $1::vector AS distance
+    FROM rec_embeds
+    ORDER BY embedding::halfvec({dim}) <=> $1::vector::halfvec({dim})
+    LIMIT $2
+) c ORDER BY c.distance LIMIT $3
+"""
+FULL_SQL = "SELECT id FROM rec_embeds ORDER BY embedding <=> $1::vector LIMIT $2"
+
+
+def load_pickle(path: str):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def synthetic(rows: int, queries: int, dim: int, seed: int = 0):
+    """Clustered unit vectors; neighbours are close, as with real recipe embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(rows // 200, 1), dim)).astype(np.float32)
+    base = centers[rng.integers(0, len(centers), rows)] + 0.3 * rng.standard_normal((rows, dim)).astype(np.float32)
+    q = centers[rng.integers(0, len(centers), queries)] + 0.3 * rng.standard_normal((queries, dim)).astype(np.float32)
+    return normalize(base), normalize(q)
+
+
+def topk(scores: np.ndarray, k: int) -> np.ndarray:
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def rescored(base32: np.ndarray, q32: np.ndarray, half_scores: np.ndarray, k: int, candidates: int) -> np.ndarray:
+    cand = topk(half_scores, candidates)
+    exact = np.einsum("qd,qcd->qc", q32, base32[cand])
+    return np.take_along_axis(cand, topk(exact, k), axis=1)
+
+
+def in_process(base: np.ndarray, queries: np.ndarray, k: int, factors: List[int]) -> None:
+    base16, q16 = base.astype(np.float16), queries.astype(np.float16)
+    t0 = time.perf_counter()
+    exact_scores = queries @ base.T
+    truth = topk(exact_scores, k)
+    t_exact = time.perf_counter() - t0
+    half_scores = q16.astype(np.float32) @ base16.astype(np.float32).T
+    half_only = topk(half_scores, k)
+
+    logger.info("rows=%d dim=%d queries=%d k=%d", base.shape[0], base.shape[1], queries.shape[0], k)
+    logger.info("storage per vector: float32 %d B, float16 %d B", base.shape[1] * 4, base.shape[1] * 2)
+    logger.info("exact float32 scan: %.1f ms", t_exact * 1000.0)
+    logger.info("%-20s recall@%d = %.4f", "half only", k, recall(half_only, truth))
+    for factor in factors:
+        found = rescored(base, queries, half_scores, k, k * factor)
+        logger.info("%-20s recall@%d = %.4f", f"half+rescore x{factor}", k, recall(found, truth))
+
+
+async def against_db(queries: np.ndarray, k: int, factors: List[int], dim: int) -> None:
+    import asyncpg
+    from pgvector import Vector
+
+    from app.models.db_session import DATABASE_URL
+
+    conn = await asyncpg.connect(DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1))
+    try:
+        truth = []
+        await conn.execute("SET enable_indexscan = off")
+        for q in queries:
+            rows = await conn.fetch(FULL_SQL, Vector(q).to_text(), k)
+            truth.append([r["id"] for r in rows])
+        await conn.execute("RESET enable_indexscan")
+        for factor in factors:
+            found, t0 = [], time.perf_counter()
+            for q in queries:
+                rows = await conn.fetch(HALF_SQL.format(dim=dim), Vector(q).to_text(), k * factor, k)
+                found.append([r["id"] for r in rows])
+            ms = (time.perf_counter() - t0) * 1000.0 / len(queries)
+            logger.info("db half+rescore x%-3d recall@%d = %.4f  (%.2f ms/query)", factor, k, recall(found, truth), ms)
+    finally:
+        await conn.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    data_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../ppg_database/data"))
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rec-embeds", default=os.path.join(data_dir, "rec_embeds.pkl"))
+    parser.add_argument("--img-embeds", default=os.path.join(data_dir, "img_embeds.pkl"))
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic rows instead of the pickles")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--factors", default="1,2,4,8")
+    parser.add_argument("--db", action="store_true", help="also measure against the database")
+    args = parser.parse_args(argv)
+    factors = [int(f) for f in args.factors.split(",")]
+
+    if args.synthetic:
+        base, queries = synthetic(args.synthetic, args.queries, args.dim)
+    else:
+        base = normalize(load_pickle(args.rec_embeds))
+        queries = normalize(load_pickle(args.img_embeds)[: args.queries])
+    in_process(base, queries, args.k, factors)
+    if args.db:
+        asyncio.run(against_db(queries, args.k, factors, base.shape[1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import argparse
+import asyncio
+import logging
+import os
+import pickle
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import asyncpg
+import numpy as np
+from pgvector import Vector
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from app.services.utils import get_config_option  # noqa: E402
+from app.models.db_session import DATABASE_URL  # noqa: E402
+from app.services.db_service import _distance_op, _rescore_candidates, vector_search_precision  # noqa: E402
+from app.services.vector_search import InProcessVectorBackend  # noqa: E402
+
+
+# --- IGNORE ---
+"""
+Recall@k vs. latency sweep for the pgvector index on rec_embeds.
+
+Uses image embeddings from img_embeds.pkl as queries. Ground truth is the
+exact cosine top-k computed in process from rec_embeds.pkl / rec_ids.pkl.
+For the index present on rec_embeds (see ppg_database/40_create_indexes.sh)
+the script sweeps the query-time knob (`ivfflat.probes` or
+`hnsw.ef_search`), measures per-query latency through the database, and
+writes a table plus a recall/latency plot. Pick the working point and set
+`vector_search_probes` / `vector_search_ef_search` in config.json.
+
+Requires a populated database reachable through the backend's
+POSTGRES_* environment variables.
+"""
+# --- IGNORE ---
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(asctime)s] %(levelname)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+
+def build_query_sql(k: int) -> str:
+    """Build the top-k query the backend issues, so the same index serves it.
+
+    Follows `vector_distance` (``<#>`` for the ``_ip`` index, ``<=>`` for
+    cosine) and `vector_search_precision` (``"half"`` orders by the halfvec
+    expression and re-ranks the candidates in full precision).
+    """
+    op = _distance_op()
+    if vector_search_precision() != "half":
+        return f"SELECT id FROM rec_embeds ORDER BY embedding {op} $1::vector LIMIT $2"
+    dim = int(get_config_option("embDim", 1024))
+    return (
+        f"SELECT id FROM (SELECT id, embedding {op} $1::vector AS distance FROM rec_embeds"
+        f" ORDER BY embedding::halfvec({dim}) {op} $1::vector::halfvec({dim}) LIMIT {_rescore_candidates(k)}) c"
+        f" ORDER BY distance LIMIT $2"
+    )
+
+
+def load_pickle(path: str):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    return float(np.percentile(np.asarray(values), pct))
+
+
+async def detect_index(conn: asyncpg.Connection) -> str:
+    rows = await conn.fetch("SELECT indexdef FROM pg_indexes WHERE tablename = 'rec_embeds'")
+    for row in rows:
+        for kind in ("hnsw", "ivfflat"):
+            if f"USING {kind}" in row["indexdef"]:
+                return kind
+    return "none"
+
+
+async def run_setting(conn: asyncpg.Connection, settings: Dict[str, str], queries: List[str], k: int) -> Tuple[List[List[str]], List[float]]:
+    query_sql = build_query_sql(k)
+    for name, value in settings.items():
+        await conn.execute(f"SET {name} = {value}")
+    await conn.fetch(query_sql, queries[0], k)  # warm-up
+    results, latencies = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        rows = await conn.fetch(query_sql, q, k)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+        results.append([row["id"] for row in rows])
+    for name in settings:
+        await conn.execute(f"RESET {name}")
+    return results, latencies
+
+
+def recall_at(results: List[List[str]], truth: List[List[str]], k: int) -> float:
+    return float(np.mean([len(set(r[:k]) & set(t[:k])) / k for r, t in zip(results, truth)]))
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="pgvector recall/latency sweep")
+    parser.add_argument("--data-dir", default="../ppg_database/data", help="Directory with the pkl files")
+    parser.add_argument("--queries", type=int, default=200, help="Number of img_embeds queries")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--probes", default="1,2,4,8,16,32,64,128", help="ivfflat.probes values")
+    parser.add_argument("--ef-search", default="10,20,40,80,160,320", help="hnsw.ef_search values")
+    parser.add_argument("--exact", action="store_true", help="Also time a sequential-scan (exact) baseline")
+    parser.add_argument("--out", default="test/benchmark/index_sweep", help="Output prefix for .txt/.png")
+    args = parser.parse_args()
+
+    img_embeds = np.asarray(load_pickle(os.path.join(args.data_dir, "img_embeds.pkl")), dtype=np.float32)
+    rec_embeds = np.asarray(load_pickle(os.path.join(args.data_dir, "rec_embeds.pkl")), dtype=np.float32)
+    rec_ids = load_pickle(os.path.join(args.data_dir, "rec_ids.pkl"))
+    rng = np.random.default_rng(0)
+    sample = img_embeds[rng.choice(len(img_embeds), size=min(args.queries, len(img_embeds)), replace=False)]
+
+    logger.info("Computing exact top-%d for %d queries over %d recipes...", args.k, len(sample), len(rec_ids))
+    rec_embeds /= np.maximum(np.linalg.norm(rec_embeds, axis=1, keepdims=True), 1e-12)
+    exact = InProcessVectorBackend(rec_embeds, np.asarray(rec_ids)).search_batch_sync(sample, top_k=args.k)
+    truth = [[rid for rid, _ in row] for row in exact]
+
+    conn = await asyncpg.connect(DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1))
+    kind = await detect_index(conn)
+    logger.info("Index on rec_embeds: %s", kind)
+    logger.info("Query: %s", build_query_sql(args.k))
+    queries = [Vector(q).to_text() for q in sample]
+
+    if kind == "ivfflat":
+        sweep = [("probes", v, {"ivfflat.probes": v}) for v in args.probes.split(",")]
+    elif kind == "hnsw":
+        sweep = [("ef_search", v, {"hnsw.ef_search": v}) for v in args.ef_search.split(",")]
+    else:
+        sweep = []
+    if args.exact or not sweep:
+        sweep.append(("exact", "-", {"enable_indexscan": "off"}))
+
+    rows = []
+    for knob, value, settings in sweep:
+        results, latencies = await run_setting(conn, settings, queries, args.k)
+        row = (
+            knob, value,
+            recall_at(results, truth, 1), recall_at(results, truth, args.k),
+            percentile(latencies, 50), percentile(latencies, 95),
+        )
+        rows.append(row)
+        logger.info("%10s=%-5s recall@1=%.4f recall@%d=%.4f p50=%.2fms p95=%.2fms", knob, value, row[2], args.k, row[3], row[4], row[5])
+    await conn.close()
+
+    with open(args.out + ".txt", "w") as f:
+        f.write(f"index={kind} queries={len(sample)} k={args.k} sql={build_query_sql(args.k)}\n")
+        f.write(f"{'knob':>10} {'value':>6} {'recall@1':>9} {'recall@k':>9} {'p50_ms':>8} {'p95_ms':>8}\n")
+        for r in rows:
+            f.write(f"{r[0]:>10} {r[1]:>6} {r[2]:>9.4f} {r[3]:>9.4f} {r[4]:>8.2f} {r[5]:>8.2f}\n")
+
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(7, 4))
+    swept = [r for r in rows if r[0] != "exact"]
+    plt.plot([r[4] for r in swept], [r[3] for r in swept], marker="o")
+    for r in swept:
+        plt.annotate(f"{r[0]}={r[1]}", (r[4], r[3]), textcoords="offset points", xytext=(4, -10), fontsize=8)
+    for r in rows:
+        if r[0] == "exact":
+            plt.axvline(r[4], color="gray", linestyle="--", label=f"exact p50 {r[4]:.1f} ms")
+            plt.legend()
+    plt.xlabel("p50 latency (ms)")
+    plt.ylabel(f"recall@{args.k}")
+    plt.title(f"{kind} on rec_embeds: recall@{args.k} vs latency ({len(sample)} queries)")
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(args.out + ".png")
+    logger.info("Wrote %s.txt and %s.png", args.out, args.out)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
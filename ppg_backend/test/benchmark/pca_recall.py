@@ -0,0 +1,115 @@
+import argparse
+import logging
+import os
+import pickle
+import sys
+import time
+from typing import List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../ppg_database")))
+
+from app.services.vector_search import InProcessVectorBackend  # noqa: E402
+from export_vector_index import fit_pca  # noqa: E402
+
+
+# --- IGNORE ---
+"""
+Recall and latency of the two-stage (PCA coarse + exact rerank) in-process
+search against exhaustive 1024-d search.
+
+For every reduced dimension (--dims) a PCA is fitted the same way as
+`ppg_database/export_vector_index.py --pca-dim`, and for every candidate
+count (--candidates, `vector_pca_candidates` in config.json) the script
+reports recall@1/5/10 against the exhaustive top-k and the mean
+per-query latency. Use rec_embeds.pkl / img_embeds.pkl, or synthetic
+low-rank data with --synthetic N.
+"""
+# --- IGNORE ---
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(asctime)s] %(levelname)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+KS = (1, 5, 10)
+
+
+def load_pickle(path: str):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def synthetic(rows: int, queries: int, dim: int, rank: int = 512, seed: int = 0):
+    """Unit vectors near a `rank`-dimensional subspace, like learned embeddings."""
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((rank, dim)).astype(np.float32)
+    # power-law spectrum: most variance in the leading axes, a long tail after
+    scale = (1.0 / np.sqrt(1.0 + np.arange(rank, dtype=np.float32) / 8.0))[None, :]
+
+    def draw(n):
+        return normalize((rng.standard_normal((n, rank)).astype(np.float32) * scale) @ basis
+                         + 0.05 * rng.standard_normal((n, dim)).astype(np.float32))
+
+    return draw(rows), draw(queries)
+
+
+def recall_at(found: List[List[str]], truth: List[List[str]], k: int) -> float:
+    return float(np.mean([len(set(f[:k]) & set(t[:k])) / k for f, t in zip(found, truth)]))
+
+
+def timed(backend: InProcessVectorBackend, queries: np.ndarray, k: int):
+    t0 = time.perf_counter()
+    results = [backend.search_sync(q, top_k=k) for q in queries]
+    return [[rid for rid, _ in r] for r in results], (time.perf_counter() - t0) * 1000.0 / len(queries)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    data_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../ppg_database/data"))
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rec-embeds", default=os.path.join(data_dir, "rec_embeds.pkl"))
+    parser.add_argument("--img-embeds", default=os.path.join(data_dir, "img_embeds.pkl"))
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic rows instead of the pickles")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dims", default="64,128,256")
+    parser.add_argument("--candidates", default="50,100,200,500")
+    parser.add_argument("--pca-sample", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        base, queries = synthetic(args.synthetic, args.queries, args.dim)
+    else:
+        base = normalize(load_pickle(args.rec_embeds))
+        queries = normalize(load_pickle(args.img_embeds)[: args.queries])
+    ids = np.asarray([f"r{i}" for i in range(base.shape[0])])
+    k = max(KS)
+
+    exact = InProcessVectorBackend(base, ids)
+    truth, exact_ms = timed(exact, queries, k)
+    logger.info("rows=%d dim=%d queries=%d", base.shape[0], base.shape[1], len(queries))
+    logger.info("exhaustive: %.2f ms/query", exact_ms)
+
+    rng = np.random.default_rng(0)
+    sample = base[np.sort(rng.choice(base.shape[0], size=min(args.pca_sample, base.shape[0]), replace=False))]
+    for dim in [int(d) for d in args.dims.split(",")]:
+        mean, components = fit_pca(sample, dim)
+        reduced = (base - mean) @ components.T
+        for n in [int(c) for c in args.candidates.split(",")]:
+            backend = InProcessVectorBackend(base, ids, pca=(mean, components), reduced=reduced, candidates=n)
+            found, ms = timed(backend, queries, k)
+            recalls = "  ".join(f"recall@{r}={recall_at(found, truth, r):.4f}" for r in KS)
+            logger.info("pca %4d-d  N=%4d  %s  %.2f ms/query (x%.1f)", dim, n, recalls, ms, exact_ms / ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+import numpy as np
+import torch
+import torchvision.transforms as transforms
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from app.services.preprocess import ImagePreprocessor  # noqa: E402
+
+
+# --- IGNORE ---
+"""
+Decode + transform time by input resolution.
+
+Compares the previous per-call pipeline (full PIL decode, then a freshly built
+Resize/CenterCrop/ToTensor/Normalize Compose) against `ImagePreprocessor`
+(JPEG draft decoding + uint8 tensor ops). Synthetic JPEGs are generated for
+each resolution, so no dataset is required.
+"""
+# --- IGNORE ---
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(asctime)s] %(levelname)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS: List[Tuple[int, int]] = [(640, 480), (1920, 1080), (4032, 3024), (8000, 6000)]
+
+
+def legacy_load(path: str) -> torch.Tensor:
+    normalize = transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+    transform = transforms.Compose([
+        transforms.Resize(256),
+        transforms.CenterCrop(224),
+        transforms.ToTensor(),
+        normalize,
+    ])
+    return transform(Image.open(path).convert("RGB"))
+
+
+def make_jpeg(path: str, size: Tuple[int, int]) -> None:
+    """Write a photo-like JPEG: smooth gradients plus mild noise."""
+    w, h = size
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, w, dtype=np.float32)
+    y = np.linspace(0, 255, h, dtype=np.float32)[:, None]
+    img = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    img += rng.normal(0, 8, size=img.shape).astype(np.float32)
+    Image.fromarray(np.clip(img, 0, 255).astype(np.uint8)).save(path, quality=90)
+
+
+def time_fn(fn, path: str, repeats: int) -> float:
+    fn(path)  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        fn(path)
+    return (time.perf_counter() - t0) / repeats * 1000.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Decode+transform benchmark by resolution")
+    parser.add_argument("--repeats", type=int, default=10, help="Timed runs per resolution")
+    args = parser.parse_args()
+
+    pre = ImagePreprocessor(max_pixels=100_000_000)
+    logger.info("%12s %12s %12s %9s %14s", "resolution", "legacy(ms)", "new(ms)", "speedup", "mean|diff|")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in RESOLUTIONS:
+            path = os.path.join(tmp, f"{size[0]}x{size[1]}.jpg")
+            make_jpeg(path, size)
+            legacy_ms = time_fn(legacy_load, path, args.repeats)
+            new_ms = time_fn(pre.load, path, args.repeats)
+            diff = (legacy_load(path) - pre.load(path)).abs().mean().item()
+            logger.info(
+                "%12s %12.1f %12.1f %8.1fx %14.4f",
+                f"{size[0]}x{size[1]}", legacy_ms, new_ms, legacy_ms / new_ms, diff,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from app.services import queue_service  # noqa: E402
+from app.services.batch_service import MicroBatcher  # noqa: E402
+from app.services.vector_search import PgVectorBackend  # noqa: E402
+
+
+# --- IGNORE ---
+"""
+DB round trips per second with and without the search collector.
+
+Replays the locust load-test shape (`--users` clients, 1-2 s think time)
+against the real `find_poisons` / collector code. Inference is simulated by
+an embedding `MicroBatcher` whose batch cost follows batch_benchmark.txt
+(about 0.05 s + 0.126 s per image), so embeddings complete in groups as in
+production. The database is a fake session that sleeps `--db-latency-ms`
+per statement and counts statements; the pgvector backend with the
+"index" poison lookup is used (one statement per search, or per batch).
+"""
+# --- IGNORE ---
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(asctime)s] %(levelname)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+class FakeSession:
+    statements = 0
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt, params=None):
+        FakeSession.statements += 1
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(fetchall=lambda: [])
+
+
+async def run(users: int, duration: float, search_batch: int, db_latency: float) -> dict:
+    FakeSession.statements = 0
+    queue_service.AsyncSessionLocal = lambda: FakeSession(db_latency)
+    queue_service.get_vector_backend = lambda: PgVectorBackend()
+    queue_service.poison_lookup = lambda: "index"
+    queue_service.search_batching_enabled = lambda: search_batch > 1
+    queue_service._search_batcher = MicroBatcher(
+        queue_service._find_poisons_batch, max_batch_size=search_batch, max_wait_ms=3, name="search"
+    )
+
+    async def infer(items: List[int]) -> List[np.ndarray]:
+        await asyncio.sleep(0.05 + 0.126 * len(items))
+        return [np.random.rand(1024).astype(np.float32) for _ in items]
+
+    embedder = MicroBatcher(infer, max_batch_size=8, max_wait_ms=5, name="embedding")
+    searches = 0
+    deadline = time.monotonic() + duration
+
+    async def client(seed: int) -> None:
+        nonlocal searches
+        rng = random.Random(seed)
+        while time.monotonic() < deadline:
+            await asyncio.sleep(rng.uniform(1.0, 2.0))
+            emb = await embedder.submit(seed)
+            await queue_service.find_poisons(emb, top_k=10)
+            searches += 1
+
+    t0 = time.monotonic()
+    await asyncio.gather(*(client(i) for i in range(users)))
+    elapsed = time.monotonic() - t0
+    await embedder.stop()
+    await queue_service.stop_search_batcher()
+    return {
+        "searches_per_s": searches / elapsed,
+        "round_trips_per_s": FakeSession.statements / elapsed,
+        "avg_search_batch": queue_service._search_batcher.stats()["avg_batch_size"] if search_batch > 1 else 1.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search collector round-trip benchmark")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent clients (locust --users)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per configuration")
+    parser.add_argument("--db-latency-ms", type=float, default=15.0, help="Simulated time per statement")
+    args = parser.parse_args()
+
+    logger.info("%12s %14s %16s %16s", "search_batch", "searches/s", "round_trips/s", "avg_batch")
+    for search_batch in (1, 8):
+        r = asyncio.run(run(args.users, args.duration, search_batch, args.db_latency_ms / 1000.0))
+        logger.info(
+            "%12d %14.2f %16.2f %16.2f",
+            search_batch, r["searches_per_s"], r["round_trips_per_s"], r["avg_search_batch"],
+        )
+
+
+if __name__ == "__main__":
+    main()
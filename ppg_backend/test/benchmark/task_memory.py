@@ -0,0 +1,168 @@
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from types import MappingProxyType
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from app.schemas.task import TaskStatus  # noqa: E402
+from app.services.task.records import TaskRecord, compact_meta, poison_table  # noqa: E402
+from app.services.task.task_service import InMemoryTaskStore  # noqa: E402
+
+
+# --- IGNORE ---
+"""
+Resident memory per stored task, before and after compact task records.
+
+Every task is a completed analysis: input meta (filename, content type)
+plus a result of `--results` poison payloads (``{"name", "image",
+"description"}``) drawn from a catalog of `--poisons` entries with
+`--desc-chars`-long descriptions. Each representation is built in its own
+subprocess and measured as the RSS growth over `--tasks` tasks (default 1M).
+
+Representations:
+
+- dict-fresh:  previous snapshots (MappingProxyType over a task dict);
+  every result has its own payload dicts and strings, as the SQL lookup
+  paths (one ORM row per match) produce
+- dict-shared: previous snapshots, payload dicts shared with the catalog,
+  as the in-process poison matcher produces
+- record:      TaskRecord with interned payload ids (current store)
+- store:       the current InMemoryTaskStore end to end, including its
+  retention bookkeeping (sizes, finish order, deadline heap)
+
+Also reported: how long reading ``record["result"]`` takes (the lazy
+expansion `get_task_status` pays per poll).
+"""
+# --- IGNORE ---
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(asctime)s] %(levelname)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+VARIANTS = ("dict-fresh", "dict-shared", "record", "store")
+_loop = asyncio.new_event_loop()
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def catalog(poisons: int, desc_chars: int) -> List[Dict[str, str]]:
+    rng = random.Random(0)
+    words = ["toxic", "leaves", "vomiting", "seizures", "kidney", "failure", "dogs", "cats", "ingestion", "symptoms"]
+    entries = []
+    for i in range(poisons):
+        desc = ""
+        while len(desc) < desc_chars:
+            desc += rng.choice(words) + " "
+        entries.append({
+            "name": f"poison-plant-{i}",
+            "image": f"https://images.example.org/thumbs/desktop/poison-plant-{i}.jpg",
+            "description": desc[:desc_chars],
+        })
+    return entries
+
+
+def _copy(s: str) -> str:
+    return (s + ".")[:-1]
+
+
+def build(variant: str, n: int, entries: List[Dict[str, str]], results: int) -> Any:
+    rng = random.Random(1)
+    now = time.time()
+    tasks: Dict[str, Any] = {}
+    store = InMemoryTaskStore(shards=16) if variant == "store" else None
+    for i in range(n):
+        picks = rng.sample(entries, results)
+        meta = {"filename": f"upload-{i}.jpg", "content_type": "image/jpeg"}
+        if variant == "store":
+            task_id = _loop.run_until_complete(store.create_task(meta))
+            _loop.run_until_complete(store.save_task_result(task_id, [dict(p) for p in picks]))
+            continue
+        task_id = str(uuid.uuid4())
+        if variant == "dict-fresh":
+            result = [{"name": _copy(p["name"]), "image": _copy(p["image"]), "description": _copy(p["description"])}
+                      for p in picks]
+        elif variant == "dict-shared":
+            result = list(picks)
+        else:
+            result = [dict(p) for p in picks]
+        if variant == "record":
+            tasks[task_id] = TaskRecord(task_id, TaskStatus.completed, compact_meta(meta), result,
+                                        created_at=now, updated_at=now)
+        else:
+            tasks[task_id] = MappingProxyType({
+                "id": task_id, "status": TaskStatus.completed, "input_meta": meta, "result": result,
+                "detail": None, "retries": 0, "last_error": None, "created_at": now, "updated_at": now,
+            })
+    return store if store is not None else tasks
+
+
+def measure(variant: str, n: int, poisons: int, desc_chars: int, results: int) -> Dict[str, float]:
+    entries = catalog(poisons, desc_chars)
+    gc.collect()
+    base = rss_bytes()
+    t0 = time.perf_counter()
+    held = build(variant, n, entries, results)
+    build_s = time.perf_counter() - t0
+    gc.collect()
+    grown = rss_bytes() - base
+    if variant == "store":
+        records = [t for shard in held._shards for t in shard.values()]
+    else:
+        records = list(held.values())
+    sample = records[:: max(1, len(records) // 20000)]
+    t0 = time.perf_counter()
+    for r in sample:
+        json.dumps(r["result"])
+    read_us = (time.perf_counter() - t0) / len(sample) * 1e6
+    return {
+        "tasks": len(records),
+        "bytes_per_task": grown / n,
+        "total_mb": grown / 2**20,
+        "build_s": build_s,
+        "read_result_us": read_us,
+        "interned_payloads": len(poison_table()),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--poisons", type=int, default=400)
+    parser.add_argument("--desc-chars", type=int, default=300)
+    parser.add_argument("--results", type=int, default=3)
+    parser.add_argument("--variant", choices=VARIANTS, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.variant:
+        print(json.dumps(measure(args.variant, args.tasks, args.poisons, args.desc_chars, args.results)))
+        return
+
+    logger.info("tasks=%d poisons=%d description=%d chars results/task=%d",
+                args.tasks, args.poisons, args.desc_chars, args.results)
+    logger.info("%-12s %14s %10s %9s %16s", "variant", "bytes/task", "total MB", "build s", "read result us")
+    for variant in VARIANTS:
+        cmd = [sys.executable, __file__, "--variant", variant, "--tasks", str(args.tasks),
+               "--poisons", str(args.poisons), "--desc-chars", str(args.desc_chars), "--results", str(args.results)]
+        r = json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout)
+        logger.info("%-12s %14.0f %10.0f %9.1f %16.2f", variant, r["bytes_per_task"], r["total_mb"],
+                    r["build_s"], r["read_result_us"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from app.schemas.task import TaskStatus  # noqa: E402
+from app.services.task.task_service import InMemoryTaskStore  # noqa: E402
+
+
+# --- IGNORE ---
+"""
+Status-poll contention in the in-memory task store.
+
+`--pollers` coroutines each poll one task (`get_task`, as GET
+/api/task/{id} does) in a loop while `--writers` worker coroutines move
+tasks through running -> completed with `update_task_status`,
+`increment_retries` and `save_task_result`, and a metrics reader calls
+`list_tasks` every `--list-every-ms`. Everything shares one event loop,
+as in the API process.
+
+Compared stores:
+
+- global-lock: the previous InMemoryTaskStore (one asyncio.Lock around
+  every call; get_task and list_tasks copy task dicts)
+- striped:     the current store (immutable snapshots, lock-free reads,
+  per-shard locks for writers)
+
+Reported: polls/s, get_task call time, list_tasks time and event-loop lag
+(how late a 1 ms ticker wakes up; this is what every poller waits on
+whenever something holds the loop).
+"""
+# --- IGNORE ---
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(asctime)s] %(levelname)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+class GlobalLockTaskStore:
+    """The store before lock striping: one asyncio.Lock, copies on read."""
+
+    def __init__(self) -> None:
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._lock = asyncio.Lock()
+
+    async def create_task(self, input_meta: Optional[Dict[str, Any]] = None) -> str:
+        task_id = str(uuid.uuid4())
+        now_ts = time.time()
+        async with self._lock:
+            self._tasks[task_id] = {
+                "id": task_id, "status": TaskStatus.pending, "input_meta": input_meta or {},
+                "result": None, "detail": None, "retries": 0, "last_error": None,
+                "created_at": now_ts, "updated_at": now_ts,
+            }
+        return task_id
+
+    async def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        async with self._lock:
+            task = self._tasks.get(task_id)
+            return None if task is None else dict(task)
+
+    async def update_task_status(self, task_id: str, status: TaskStatus, *, result=None, detail=None, last_error=None) -> bool:
+        now_ts = time.time()
+        async with self._lock:
+            if task_id not in self._tasks:
+                return False
+            t = self._tasks[task_id]
+            t["status"] = status
+            if result is not None:
+                t["result"] = result
+            if last_error is not None:
+                t["last_error"] = last_error
+            t["updated_at"] = now_ts
+        return True
+
+    async def save_task_result(self, task_id: str, result: Any, error: Optional[str] = None) -> bool:
+        return await self.update_task_status(task_id, TaskStatus.failed if error else TaskStatus.completed, result=result)
+
+    async def increment_retries(self, task_id: str) -> int:
+        async with self._lock:
+            self._tasks[task_id]["retries"] += 1
+            self._tasks[task_id]["updated_at"] = time.time()
+            return self._tasks[task_id]["retries"]
+
+    async def list_tasks(self) -> Dict[str, Dict[str, Any]]:
+        async with self._lock:
+            return {k: dict(v) for k, v in self._tasks.items()}
+
+
+RESULT = [{"name": "grape", "toxic": True}, {"name": "onion", "toxic": True}]
+
+
+async def run(store: Any, pollers: int, writers: int, duration: float, list_every: float) -> Dict[str, float]:
+    ids = [await store.create_task({"filename": f"{i}.jpg"}) for i in range(pollers)]
+    stop = asyncio.Event()
+    polls = 0
+    poll_times: List[float] = []
+    list_times: List[float] = []
+    lags: List[float] = []
+
+    async def poller(task_id: str, seed: int) -> None:
+        nonlocal polls
+        rng = random.Random(seed)
+        await asyncio.sleep(rng.random() * 0.01)
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            await store.get_task(task_id)
+            if rng.random() < 0.01:
+                poll_times.append(time.perf_counter() - t0)
+            polls += 1
+            await asyncio.sleep(0)
+
+    async def writer(seed: int) -> None:
+        rng = random.Random(seed)
+        while not stop.is_set():
+            task_id = rng.choice(ids)
+            await store.update_task_status(task_id, TaskStatus.running)
+            await store.increment_retries(task_id)
+            await store.save_task_result(task_id, RESULT)
+            await asyncio.sleep(0)
+
+    async def lister() -> None:
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            await store.list_tasks()
+            list_times.append(time.perf_counter() - t0)
+            await asyncio.sleep(list_every)
+
+    async def ticker() -> None:
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - t0 - 0.001)
+
+    tasks = [asyncio.create_task(poller(tid, i)) for i, tid in enumerate(ids)]
+    tasks += [asyncio.create_task(writer(i)) for i in range(writers)]
+    tasks += [asyncio.create_task(lister()), asyncio.create_task(ticker())]
+    t0 = time.perf_counter()
+    await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - t0
+    pt = np.array(poll_times) * 1e6
+    lag = np.array(lags) * 1e3
+    return {
+        "polls_per_s": polls / elapsed,
+        "get_p50_us": float(np.percentile(pt, 50)),
+        "get_p99_us": float(np.percentile(pt, 99)),
+        "list_ms": float(np.mean(list_times) * 1e3),
+        "lag_p99_ms": float(np.percentile(lag, 99)),
+        "lag_max_ms": float(lag.max()),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pollers", type=int, default=10000)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--list-every-ms", type=float, default=100.0)
+    args = parser.parse_args(argv)
+
+    logger.info("pollers=%d writers=%d duration=%.0fs list_tasks every %.0fms",
+                args.pollers, args.writers, args.duration, args.list_every_ms)
+    logger.info("%-12s %12s %11s %11s %9s %11s %11s",
+                "store", "polls/s", "get p50 us", "get p99 us", "list ms", "lag p99 ms", "lag max ms")
+    for name, factory in (("global-lock", GlobalLockTaskStore), ("striped", InMemoryTaskStore)):
+        r = asyncio.run(run(factory(), args.pollers, args.writers, args.duration, args.list_every_ms / 1000.0))
+        logger.info("%-12s %12.0f %11.2f %11.2f %9.2f %11.2f %11.2f", name, r["polls_per_s"], r["get_p50_us"],
+                    r["get_p99_us"], r["list_ms"], r["lag_p99_ms"], r["lag_max_ms"])
+
+
+if __name__ == "__main__":
+    main()
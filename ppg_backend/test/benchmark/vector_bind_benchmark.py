@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+from pgvector import Vector
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from app.models.db_session import DATABASE_URL  # noqa: E402
+
+
+# --- IGNORE ---
+"""
+Cost of binding a 1024-d query embedding, before and after the binary codec.
+
+before: query_emb.tolist() -> pgvector text literal -> UTF-8 (asyncpg text I/O)
+after:  float32 ndarray -> pgvector binary codec (register_vector)
+
+The encode step is always measured in process. With --execute the script
+also times `SELECT vector_dims($1)` round trips on two asyncpg connections,
+one without and one with `register_vector`, to include server-side parsing.
+"""
+# --- IGNORE ---
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(asctime)s] %(levelname)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+def encode_text(emb: np.ndarray) -> bytes:
+    return Vector._to_db(emb.tolist()).encode()
+
+
+def encode_binary(emb: np.ndarray) -> bytes:
+    return Vector(emb).to_binary()
+
+
+def time_us(fn, emb: np.ndarray, repeats: int) -> float:
+    fn(emb)
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        fn(emb)
+    return (time.perf_counter() - t0) / repeats * 1e6
+
+
+async def time_execute(emb: np.ndarray, repeats: int) -> None:
+    import asyncpg
+    from pgvector.asyncpg import register_vector
+
+    dsn = DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+    text_conn = await asyncpg.connect(dsn)
+    binary_conn = await asyncpg.connect(dsn)
+    await register_vector(binary_conn)
+    sql = "SELECT vector_dims($1::vector)"
+    for name, conn, arg in (
+        ("text", text_conn, lambda: Vector._to_db(emb.tolist())),
+        ("binary", binary_conn, lambda: emb),
+    ):
+        stmt = await conn.prepare(sql)
+        await stmt.fetchval(arg())
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            await stmt.fetchval(arg())
+        logger.info("%8s bind+execute: %8.1f us/query", name, (time.perf_counter() - t0) / repeats * 1e6)
+    await text_conn.close()
+    await binary_conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="pgvector bind cost benchmark")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--repeats", type=int, default=2000)
+    parser.add_argument("--execute", action="store_true", help="Also time round trips against the DB")
+    args = parser.parse_args()
+
+    emb = np.random.default_rng(0).standard_normal(args.dim).astype(np.float32)
+    text_us = time_us(encode_text, emb, args.repeats)
+    binary_us = time_us(encode_binary, emb, args.repeats)
+    logger.info("%8s encode: %8.1f us/query %7d bytes", "text", text_us, len(encode_text(emb)))
+    logger.info("%8s encode: %8.1f us/query %7d bytes", "binary", binary_us, len(encode_binary(emb)))
+    logger.info("speedup: %.1fx", text_us / binary_us)
+    if args.execute:
+        asyncio.run(time_execute(emb, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import json
 import os
 import time
 import logging
@@ -18,12 +19,16 @@ def on_test_stop(environment, **kwargs):
 
     info = ""
     seconds = []
+    by_mode = {}  # 결과 수신 방식(poll / wait / sse)별 완료 시간
     with open(perf_path, "r") as f:
         for i, line in enumerate(f):
             if i <= 2 and "INFO/locust.runners" in line:
                 info = ' '.join(line.strip().split()[-11:])
             if "[Completed]" in line:
-                seconds.append(float(line.strip().split()[-2]))
+                value = float(line.strip().split()[-2])
+                seconds.append(value)
+                mode = line.split("[Completed]", 1)[1].split()[0].strip("()")
+                by_mode.setdefault(mode, []).append(value)
 
     if not seconds:
         print("No completed tasks found in performance.txt.")
@@ -53,9 +58,19 @@ def on_test_stop(environment, **kwargs):
             print(f"Std deviation: {std:.2f} seconds")
             print(f"95th percentile: {p95:.2f} seconds")
             print(f"99th percentile: {p99:.2f} seconds")
+            for mode, values in sorted(by_mode.items()):
+                values = sorted(values)
+                m = len(values)
+                print(
+                    f"[{mode}] n={m} avg={sum(values) / m:.2f}s "
+                    f"p50={values[(m - 1) // 2]:.2f}s p95={values[max(0, ceil(0.95 * m) - 1)]:.2f}s"
+                )
 
             plt.figure(figsize=(8, 4))
-            plt.hist(seconds, bins=20, color="skyblue", edgecolor="black")
+            if len(by_mode) > 1:
+                plt.hist(list(by_mode.values()), bins=20, label=list(by_mode), edgecolor="black", stacked=True)
+            else:
+                plt.hist(seconds, bins=20, color="skyblue", edgecolor="black")
             plt.title(
                 f"Distribution of Completion Times of {len(seconds)} requests ~ N({avg:.2f}, {std:.2f})\n{info}"
             )
@@ -83,11 +98,18 @@ def on_test_stop(environment, **kwargs):
 events.test_stop.add_listener(on_test_stop)
 
 class AnalyzeImageUser(HttpUser):
+    """업로드 후 1초 간격 폴링으로 결과를 받는 사용자 (기존 방식).
+
+    `LongPollUser`(`?wait=`)와 `EventStreamUser`(SSE)도 같은 비율로 실행되므로,
+    Locust 리포트의 요청 이름별 통계와 `performance.txt`의 `[Completed] (모드)` 로그로
+    결과 수신 방식에 따른 지연 차이를 비교할 수 있다.
+    """
     wait_time = between(1, 2)
+    mode = "poll"
+    timeout_seconds = 30
 
-    @task
-    def analyze_and_poll(self):
-        # 1. 이미지 업로드 (POST /api/analyze)
+    def upload(self):
+        """이미지를 업로드하고 (task_id, 시작 시각)을 반환한다. 실패하면 None."""
         with open("test/performance/bibimbap.jpeg", "rb") as img_file:
             img_bytes = img_file.read()
             files = {
@@ -97,34 +119,86 @@ class AnalyzeImageUser(HttpUser):
         workflow_start = time.time()
         with self.client.post("/api/analyze", files=files, name="/api/analyze", catch_response=True) as response:
             if response.status_code == 202:
-                task_id = response.json()["taskId"]
                 response.success()
+                return response.json()["taskId"], workflow_start
+            elif response.status_code == 503:
+                # 큐가 가득 참: 서버가 알려준 Retry-After만큼 기다린 뒤 다음 태스크로 넘어간다
+                retry_after = int(response.headers.get("Retry-After", "1"))
+                logging.info(f"[Rejected] Queue full, retry after {retry_after} seconds")
+                response.failure("Rejected: queue full")
+                time.sleep(retry_after)
             else:
                 response.failure("Failed to start analysis")
-                return
+        return None
+
+    def finish(self, data, workflow_start, resp):
+        """완료/실패 상태면 로그를 남기고 True를 반환한다."""
+        status = data.get("status")
+        elapsed = time.time() - workflow_start
+        if status == "completed":
+            logging.info(f"[Completed] ({self.mode}) Total time from POST to completed: {elapsed:.2f} seconds")
+            resp.success()
+            return True
+        if status == "failed":
+            logging.info(f"[Failed] ({self.mode}) Total time from POST to failed: {elapsed:.2f} seconds")
+            resp.failure(f"Task failed: {data.get('detail')}")
+            return True
+        return False
 
-        # 2. 폴링 (GET /api/task/{taskId})
-        timeout_seconds = 30
-        while time.time() - workflow_start < timeout_seconds:
+    @task
+    def analyze_and_poll(self):
+        # 1. 이미지 업로드 (POST /api/analyze)
+        started = self.upload()
+        if started is None:
+            return
+        task_id, workflow_start = started
+        # 2. 결과 수신
+        self.receive(task_id, workflow_start)
+
+    def receive(self, task_id, workflow_start):
+        # 폴링 (GET /api/task/{taskId})
+        while time.time() - workflow_start < self.timeout_seconds:
             with self.client.get(f"/api/task/{task_id}", name="/api/task/[id]", catch_response=True) as poll_resp:
-                if poll_resp.status_code == 200:
-                    data = poll_resp.json()
-                    status = data.get("status")
-                    if status == "completed":
-                        elapsed = time.time() - workflow_start
-                        logging.info(f"[Completed] Total time from POST to completed: {elapsed:.2f} seconds")
-                        poll_resp.success()
-                        return
-                    elif status == "failed":
-                        elapsed = time.time() - workflow_start
-                        logging.info(f"[Failed] Total time from POST to failed: {elapsed:.2f} seconds")
-                        poll_resp.failure(f"Task failed: {data.get('detail')}")
-                        return
-                    else:
-                        poll_resp.success()
-                else:
+                if poll_resp.status_code != 200:
                     poll_resp.failure(f"Status check failed for {task_id}")
                     return
+                if self.finish(poll_resp.json(), workflow_start, poll_resp):
+                    return
+                poll_resp.success()
             time.sleep(1) # 1초 단위로 polling
         # 타임아웃
         # Locust는 태스크 실행 시간을 기록하므로 별도 실패 처리 없이 종료해도 됩니다.
+
+
+class LongPollUser(AnalyzeImageUser):
+    """`GET /api/task/{id}?wait=`: 서버가 작업이 끝나는 즉시 응답한다."""
+    mode = "wait"
+
+    def receive(self, task_id, workflow_start):
+        while time.time() - workflow_start < self.timeout_seconds:
+            wait = max(1, int(self.timeout_seconds - (time.time() - workflow_start)))
+            with self.client.get(f"/api/task/{task_id}?wait={wait}", name="/api/task/[id]?wait", catch_response=True) as poll_resp:
+                if poll_resp.status_code != 200:
+                    poll_resp.failure(f"Status check failed for {task_id}")
+                    return
+                if self.finish(poll_resp.json(), workflow_start, poll_resp):
+                    return
+                poll_resp.success()
+
+
+class EventStreamUser(AnalyzeImageUser):
+    """`GET /api/task/{id}/events`: 상태가 바뀔 때마다 SSE 이벤트를 받는다."""
+    mode = "sse"
+
+    def receive(self, task_id, workflow_start):
+        with self.client.get(
+            f"/api/task/{task_id}/events", name="/api/task/[id]/events",
+            stream=True, catch_response=True, timeout=self.timeout_seconds,
+        ) as stream:
+            if stream.status_code != 200:
+                stream.failure(f"Event stream failed for {task_id}")
+                return
+            for line in stream.iter_lines(decode_unicode=True):
+                if line and line.startswith("data: ") and self.finish(json.loads(line[len("data: "):]), workflow_start, stream):
+                    return
+            stream.failure("Event stream closed before the task finished")
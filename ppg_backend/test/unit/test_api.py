@@ -211,6 +211,39 @@ def test_analyze_enqueue_fallback_generic_exception(monkeypatch):
     assert calls[0][0] == "fallback-generic-task"
     app.dependency_overrides.clear()
 
+def test_analyze_image_cache_hit_skips_enqueue():
+    """
+    시나리오: 동일한 바이트의 분석 결과가 결과 캐시에 있으면 `/api/analyze`가 큐에 넣지 않고 즉시 태스크를 완료하는지 검증한다.
+
+    절차:
+    1. 업로드할 바이트의 해시로 결과를 미리 저장한 `ResultCache`를 의존성으로 주입한다.
+    2. `enqueue`는 호출 여부를 기록하는 스파이로 대체한다.
+    3. `/api/analyze`를 호출한 뒤 반환된 taskId로 `/api/task/{id}`를 조회한다.
+
+    예상 결과: 202 응답 후 enqueue는 호출되지 않으며, 태스크는 즉시 `completed` 상태로 캐시된 결과를 반환한다.
+    """
+    from app.api.analyze import get_enqueue_fn, get_result_cache_fn
+    from app.services.cache_service import ResultCache, hash_bytes
+
+    img_bytes = b"\x89PNG\r\n\x1a\ncached"
+    cache = ResultCache(max_entries=4, ttl_seconds=60)
+    asyncio.run(cache.put(hash_bytes(img_bytes), [{"name": "onion"}]))
+    calls = []
+
+    async def spy_enqueue(task_id, file_tuple):
+        calls.append(task_id)
+
+    app.dependency_overrides[get_enqueue_fn] = lambda: spy_enqueue
+    app.dependency_overrides[get_result_cache_fn] = lambda: cache
+    resp = client.post("/api/analyze", files={"file": ("cached.png", img_bytes, "image/png")})
+    app.dependency_overrides.clear()
+    assert resp.status_code == 202
+    assert calls == []
+    task = client.get(f"/api/task/{resp.json()['taskId']}").json()
+    assert task["status"] == "completed"
+    assert task["data"] == [{"name": "onion"}]
+    assert cache.stats()["hits"] == 1
+
 # Task Status API
 def test_get_task_status_success(monkeypatch):
     """
@@ -266,3 +299,107 @@ def test_get_task_status_failed(monkeypatch):
     assert resp.status_code == 200
     assert resp.json()["status"] == "failed"
     assert resp.json()["detail"] == "AI error"
+
+
+def test_analyze_rejects_with_retry_after_when_queue_full(monkeypatch):
+    """
+    시나리오: 분석 큐가 가득 찬 상태에서 업로드가 들어오면 작업을 만들거나 임시 파일을 쓰기 전에
+    503과 `Retry-After` 헤더로 거부하는지 검증한다.
+
+    절차:
+    1. 결과 캐시는 항상 miss, 입장 검사는 `QueueFullError(retry_after=7)`를 던지도록 의존성을 대체한다.
+    2. `create_task`는 호출 여부만 기록하도록 모킹한다.
+    3. `/api/analyze`에 이미지를 POST한다.
+
+    예상 결과: 503 응답에 `Retry-After: 7` 헤더가 포함되고, `create_task`는 호출되지 않는다.
+    """
+    from app.api.analyze import get_create_task_fn, get_admission_fn, get_result_cache_fn
+    from app.services.exceptions import QueueFullError
+
+    created = []
+
+    async def mock_create_task(input_meta=None):
+        created.append(input_meta)
+        return "never"
+
+    class MissCache:
+        async def get(self, key):
+            return None
+
+    def full_queue(content_hash, client_id=None):
+        raise QueueFullError(retry_after=7)
+
+    app.dependency_overrides[get_create_task_fn] = lambda: mock_create_task
+    app.dependency_overrides[get_result_cache_fn] = lambda: MissCache()
+    app.dependency_overrides[get_admission_fn] = lambda: full_queue
+    try:
+        resp = client.post("/api/analyze", files={"file": ("test.png", b"\x89PNG\r\n\x1a\n", "image/png")})
+    finally:
+        app.dependency_overrides.clear()
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "7"
+    assert created == []
+
+
+def test_get_task_status_long_poll_and_event_stream_wake_on_update():
+    """
+    시나리오: `GET /api/task/{id}?wait=`(long-poll)와 `GET /api/task/{id}/events`(SSE)가
+    타이머가 아니라 작업 저장소의 상태 변경 알림으로 깨어나 결과를 바로 전달하는지 검증한다.
+
+    절차:
+    1. 메모리 작업 저장소에 작업을 만들고, 다른 스레드에서 0.3초 뒤 완료 결과를 저장하게 한 채 `?wait=10`으로 조회한다.
+    2. 새 작업에 대해 0.2초 뒤 running, 0.4초 뒤 failed로 바꾸게 한 채 `/events` 스트림을 끝까지 읽는다.
+    3. 끝난 작업을 `?wait=10`으로 다시 조회하고, 없는 작업의 `/events`를 요청한다.
+
+    예상 결과:
+    - long-poll은 결과 저장 직후(10초 대기 전) completed와 결과를 돌려준다.
+    - 스트림은 pending → running → failed 순서의 `status` 이벤트를 보내고 failed 뒤에 닫힌다.
+    - 이미 끝난 작업은 기다리지 않고 바로 응답하고, 없는 작업은 404를 돌려준다.
+    """
+    import json
+    import threading
+    import time
+    from app.schemas.task import TaskStatus
+    from app.services.task.task_service import InMemoryTaskStore, get_default_store, set_default_store
+
+    store = InMemoryTaskStore()
+    previous = get_default_store()
+    set_default_store(store)
+    payload = [{"name": "Lily", "image": "https://img/lily.jpg", "description": "Toxic to cats."}]
+
+    def later(delay, coro_fn):
+        timer = threading.Timer(delay, lambda: asyncio.run(coro_fn()))
+        timer.start()
+        return timer
+
+    try:
+        task_id = asyncio.run(store.create_task())
+        timer = later(0.3, lambda: store.save_task_result(task_id, payload))
+        t0 = time.monotonic()
+        resp = client.get(f"/api/task/{task_id}?wait=10")
+        elapsed = time.monotonic() - t0
+        timer.join()
+        assert resp.status_code == 200
+        assert resp.json()["status"] == "completed" and resp.json()["data"] == payload
+        assert 0.25 <= elapsed < 5
+
+        t0 = time.monotonic()
+        assert client.get(f"/api/task/{task_id}?wait=10").json()["status"] == "completed"
+        assert time.monotonic() - t0 < 1
+
+        task_id = asyncio.run(store.create_task())
+        timers = [
+            later(0.2, lambda: store.update_task_status(task_id, TaskStatus.running)),
+            later(0.4, lambda: store.update_task_status(task_id, TaskStatus.failed, detail="boom")),
+        ]
+        with client.stream("GET", f"/api/task/{task_id}/events") as stream:
+            assert stream.headers["content-type"].startswith("text/event-stream")
+            events = [json.loads(line[len("data: "):]) for line in stream.iter_lines() if line.startswith("data: ")]
+        for timer in timers:
+            timer.join()
+        assert [e["status"] for e in events] == ["pending", "running", "failed"]
+        assert events[-1]["detail"] == "boom"
+
+        assert client.get("/api/task/unknown/events").status_code == 404
+    finally:
+        set_default_store(previous)
@@ -0,0 +1,104 @@
+import asyncio
+from app.services.autoscaler import ScalingPolicy
+from app.services.queue_service import QueueManager
+from app.services.worker_service import start_autoscaled_workers, stop_workers, get_worker_supervisor
+
+
+def test_scaling_policy_hysteresis_and_bounds():
+    """
+    시나리오: 워커 수 조절 정책이 일시적인 부하 변화에 흔들리지 않고(연속 측정·쿨다운),
+    범위 [min, max] 안에서만 늘리고 줄이며, 용량이 제한된 단계가 포화되면 늘리지 않는지 검증한다.
+
+    절차:
+    1. up_samples=2, down_samples=3, cooldown=10인 정책에 적체 측정을 한 번, 두 번 넣는다.
+    2. 쿨다운 안에서 적체 측정을 다시 넣는다.
+    3. 쿨다운 이후 유휴 측정을 넣고, 중간에 적체가 끼면 유휴 연속 횟수가 초기화되는지 확인한다.
+    4. 포화된 단계가 있을 때와 범위를 벗어난 크기에서의 결정을 확인한다.
+
+    예상 결과:
+    - 적체 1회는 유지, 2회 연속이면 절반(최소 1)만큼 증가한다.
+    - 쿨다운 중에는 변경하지 않는다.
+    - 유휴는 3회 연속일 때만 1씩 줄이며 사이에 적체가 끼면 다시 센다.
+    - 포화 단계가 있으면 "held" 사유와 함께 유지하고, 범위를 벗어나면 즉시 경계로 맞춘다.
+    """
+    p = ScalingPolicy(1, 8, up_wait=0.5, up_samples=2, down_samples=3, cooldown=10.0)
+    backlog = dict(depth=20, oldest_wait=2.0, utilization=0.9)
+    idle = dict(depth=0, oldest_wait=0.0, utilization=0.1)
+
+    assert p.decide(4, now=0.0, **backlog) == (0, "")
+    delta, reason = p.decide(4, now=1.0, **backlog)
+    assert delta == 2 and reason.startswith("backlog")
+    assert p.decide(6, now=2.0, **backlog)[0] == 0
+    assert p.decide(6, now=3.0, **backlog)[0] == 0  # still cooling down
+
+    assert [p.decide(6, now=t, **idle)[0] for t in (12.0, 13.0)] == [0, 0]
+    assert p.decide(6, now=14.0, **backlog)[0] == 0  # one backlog sample restarts the idle streak
+    assert [p.decide(6, now=t, **idle)[0] for t in (15.0, 16.0, 17.0)] == [0, 0, -1]
+
+    # a busy worker pool is not enough: the queue must be backed up
+    assert p.decide(5, now=40.0, depth=0, oldest_wait=0.0, utilization=1.0)[0] == 0
+
+    p = ScalingPolicy(1, 8, up_samples=1, cooldown=0.0)
+    assert p.decide(2, now=0.0, saturated_stage="embed", **backlog) == (0, "held: stage 'embed' saturated")
+    assert p.decide(8, now=1.0, **backlog)[0] == 0  # already at max
+    assert p.decide(12, now=2.0, **idle)[0] == -4
+    assert p.decide(0, now=3.0, **idle)[0] == 1
+
+
+def test_supervisor_grows_under_backlog_and_shrinks_when_idle():
+    """
+    시나리오: 자동 조절 워커 풀이 큐 적체 시 워커를 늘리고, 큐가 비고 한가해지면 줄이며,
+    결정을 통계(metrics)로 남기는지 실제 `_worker_loop`로 검증한다.
+
+    절차:
+    1. 1~4개 범위, 즉시 반응(up_samples=1, down_samples=1, cooldown=0)하는 정책으로 워커 1개를 시작한다.
+       (자동 틱 간격은 길게 두고 `tick()`을 직접 호출한다.)
+    2. 느린 처리 함수로 작업 12개를 넣고, 워커가 바쁜 상태에서 `tick()`을 여러 번 호출한다.
+    3. 모든 작업을 처리한 뒤 `tick()`을 호출해 줄어드는지 확인하고 워커를 종료한다.
+
+    예상 결과:
+    - 적체 중에는 풀 크기가 최대 4까지 늘어나고 모든 작업이 한 번씩 처리된다.
+    - 유휴 상태에서는 1개씩 줄어 최소 1에서 멈춘다.
+    - 통계에 증가/감소 횟수와 사유가 기록되고, 종료 후 감독자가 해제된다.
+    """
+    async def _runner():
+        qm = QueueManager()
+        processed = []
+        release = asyncio.Event()
+
+        async def proc(task_id, file_tuple):
+            await release.wait()
+            processed.append(task_id)
+
+        policy = ScalingPolicy(1, 4, up_wait=0.0, up_utilization=0.5, up_samples=1, down_samples=1, cooldown=0.0)
+        shutdown = await start_autoscaled_workers(1, policy=policy, qm=qm, process_fn=proc, interval=3600)
+        sup = get_worker_supervisor()
+        assert sup.size == 1
+
+        for i in range(12):
+            await qm.enqueue(f"t{i}", ("/tmp/none", "a.jpg", "image/jpeg"))
+        for _ in range(4):
+            await asyncio.sleep(0.05)
+            sup.tick()
+        assert sup.size == 4
+
+        release.set()
+        await asyncio.wait_for(qm.ensure().join(), timeout=2.0)
+        assert sorted(processed) == sorted(f"t{i}" for i in range(12))
+
+        sizes = []
+        for _ in range(5):
+            await asyncio.sleep(0.05)
+            sup.tick()
+            sizes.append(sup.size)
+        assert sizes == [3, 2, 1, 1, 1]
+
+        stats = sup.stats()
+        assert stats["scale_ups"] >= 2 and stats["scale_downs"] == 3
+        assert stats["decisions"][-1]["reason"].startswith("idle")
+        assert "worker" in stats["last_sample"]["stages"]
+
+        await stop_workers(shutdown, qm=qm, timeout=1.0)
+        assert get_worker_supervisor() is None
+
+    asyncio.run(_runner())
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from app.services.batch_service import MicroBatcher
+
+
+def test_microbatcher_groups_concurrent_submissions():
+    """
+    시나리오: 동시에 제출된 여러 항목이 하나의 배치 호출로 묶이고, 각 호출자가 자신의 결과를 돌려받는지 검증한다.
+
+    절차:
+    1. 입력 리스트를 기록하고 각 항목을 두 배로 반환하는 `run_batch`를 가진 `MicroBatcher`를 만든다.
+    2. 4개의 항목을 동시에 `submit`한다.
+    3. 결과 순서와 배치 호출 횟수를 확인한다.
+
+    예상 결과: 결과는 각 입력의 두 배이며, 4개 항목은 최대 배치 크기(4) 안에서 한 번의 호출로 처리된다.
+    """
+    calls = []
+
+    async def run_batch(items):
+        calls.append(list(items))
+        return [i * 2 for i in items]
+
+    async def _runner():
+        batcher = MicroBatcher(run_batch, max_batch_size=4, max_wait_ms=50)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(4)))
+        stats = batcher.stats()
+        await batcher.stop()
+        return results, stats
+
+    results, stats = asyncio.run(_runner())
+    assert results == [0, 2, 4, 6]
+    assert calls == [[0, 1, 2, 3]]
+    assert stats["batches"] == 1 and stats["items"] == 4
+
+
+def test_microbatcher_respects_max_batch_size_and_propagates_errors():
+    """
+    시나리오: 최대 배치 크기를 넘는 제출은 여러 배치로 나뉘고, `run_batch` 예외는 해당 배치의 모든 호출자에게 전파되는지 검증한다.
+
+    절차:
+    1. `max_batch_size=2`인 배처에 5개 항목을 동시에 제출한다.
+    2. 모든 배치 크기가 2 이하인지 확인한다.
+    3. 항상 예외를 던지는 배처에 2개 항목을 제출하고 두 호출 모두 예외를 받는지 확인한다.
+
+    예상 결과: 배치는 [2, 2, 1]로 나뉘고, 실패한 배치의 호출자는 모두 동일한 예외를 받는다.
+    """
+    sizes = []
+
+    async def run_batch(items):
+        sizes.append(len(items))
+        return items
+
+    async def failing(items):
+        raise RuntimeError("boom")
+
+    async def _runner():
+        batcher = MicroBatcher(run_batch, max_batch_size=2, max_wait_ms=50)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        await batcher.stop()
+
+        bad = MicroBatcher(failing, max_batch_size=4, max_wait_ms=1)
+        errors = await asyncio.gather(bad.submit(1), bad.submit(2), return_exceptions=True)
+        await bad.stop()
+        return results, errors
+
+    results, errors = asyncio.run(_runner())
+    assert results == [0, 1, 2, 3, 4]
+    assert sizes == [2, 2, 1]
+    assert all(isinstance(e, RuntimeError) for e in errors)
+
+    with pytest.raises(ValueError):
+        MicroBatcher(lambda items: items, max_batch_size=0)
+
+
+def test_microbatcher_fails_only_items_with_returned_exceptions():
+    """
+    시나리오: 배치 함수가 일부 항목에 대해 예외 객체를 결과로 돌려주면 그 항목의 호출자만 실패하는지 검증한다.
+
+    절차:
+    1. 음수 항목에는 `ValueError` 객체를 돌려주는 배치 함수로 배처를 만든다.
+    2. 1, -1, 2를 동시에 제출한다.
+
+    예상 결과: 세 항목은 한 배치로 처리되고, -1만 `ValueError`를 받으며 나머지는 정상 결과를 받는다.
+    """
+    async def run_batch(items):
+        return [ValueError(f"bad {i}") if i < 0 else i * 10 for i in items]
+
+    async def _runner():
+        batcher = MicroBatcher(run_batch, max_batch_size=4, max_wait_ms=20)
+        results = await asyncio.gather(batcher.submit(1), batcher.submit(-1), batcher.submit(2), return_exceptions=True)
+        await batcher.stop()
+        return results, batcher.stats()
+
+    (a, b, c), stats = asyncio.run(_runner())
+    assert a == 10 and c == 20 and isinstance(b, ValueError)
+    assert stats["batches"] == 1
@@ -0,0 +1,99 @@
+import asyncio
+import time
+from app.services.cache_service import ResultCache, hash_bytes
+
+
+def test_result_cache_lru_ttl_and_counters():
+    """
+    시나리오: 결과 캐시가 LRU 순서로 항목을 축출하고, TTL이 지난 항목을 미스로 처리하며, 카운터를 올바르게 집계하는지 검증한다.
+
+    절차:
+    1. `max_entries=2` 캐시에 a, b를 넣고 a를 조회해 최근 사용으로 만든다.
+    2. c를 넣어 가장 오래 사용되지 않은 b가 축출되는지 확인한다.
+    3. TTL이 지난 항목이 미스로 처리되는지 확인한다.
+    4. hits/misses/evictions 카운터를 확인한다.
+
+    예상 결과: b만 축출되고, 만료된 항목은 None을 반환하며 카운터가 조회 결과와 일치한다.
+    """
+    async def _runner():
+        cache = ResultCache(max_entries=2, ttl_seconds=60)
+        await cache.put("a", [1])
+        await cache.put("b", [2])
+        assert await cache.get("a") == [1]
+        await cache.put("c", [3])
+        assert await cache.get("b") is None
+        assert await cache.get("c") == [3]
+
+        # force expiry of "a"
+        cache._entries["a"] = (time.time() - 1, [1])
+        assert await cache.get("a") is None
+        return cache.stats()
+
+    stats = asyncio.run(_runner())
+    assert stats["hits"] == 2 and stats["misses"] == 2
+    assert stats["evictions"] == 1 and stats["expirations"] == 1
+    assert len(hash_bytes(b"abc")) == 64
+
+
+def test_result_cache_disk_spill_survives_restart(tmp_path):
+    """
+    시나리오: 디스크 스필이 설정된 캐시에 저장한 결과가 새 캐시 인스턴스(재시작)에서도 조회되는지 검증한다.
+
+    절차:
+    1. SQLite 파일 경로로 캐시를 만들고 결과를 저장한 뒤 닫는다.
+    2. 같은 경로로 새 캐시를 만들어 같은 키를 조회한다.
+
+    예상 결과: 메모리가 비어 있어도 디스크에서 결과를 읽어 히트로 집계된다(`disk_hits` == 1).
+    """
+    path = str(tmp_path / "cache.sqlite")
+
+    async def _runner():
+        first = ResultCache(max_entries=4, ttl_seconds=60, disk_path=path)
+        await first.put("k", [{"name": "onion"}])
+        first.close()
+
+        second = ResultCache(max_entries=4, ttl_seconds=60, disk_path=path)
+        value = await second.get("k")
+        stats = second.stats()
+        second.close()
+        return value, stats
+
+    value, stats = asyncio.run(_runner())
+    assert value == [{"name": "onion"}]
+    assert stats["disk_hits"] == 1 and stats["hits"] == 1
+
+
+def test_result_cache_disk_spill_is_pruned_on_write(tmp_path):
+    """
+    시나리오: 오래 실행되는 프로세스에서도 SQLite 스필 파일이 무한히 커지지 않도록 쓰는 동안 만료된 항목과
+    최대 항목 수를 넘는 항목이 삭제되는지 검증한다.
+
+    절차:
+    1. 디스크 최대 항목 3개, 매 쓰기마다 정리하도록 설정한 캐시에 짧은 TTL로 결과 2개를 저장하고 만료를 기다린다.
+    2. TTL을 늘린 뒤 결과 5개를 더 저장한다.
+    3. 파일의 행 수와 남은 키, 통계를 확인한다.
+
+    예상 결과:
+    - 만료된 두 항목은 삭제되고, 파일에는 가장 늦게 만료되는 3개 항목만 남는다.
+    - 통계의 `disk_pruned`는 삭제된 행 수(4)와 같다.
+    """
+    path = str(tmp_path / "cache.sqlite")
+
+    async def _runner():
+        cache = ResultCache(max_entries=2, ttl_seconds=0.05, disk_path=path, disk_max_entries=3)
+        cache.disk_prune_every = 1
+        await cache.put("old-0", [1])
+        await cache.put("old-1", [1])
+        await asyncio.sleep(0.1)
+        cache.ttl_seconds = 60
+        for i in range(5):
+            await cache.put(f"new-{i}", [i])
+            await asyncio.sleep(0.01)
+        keys = [row[0] for row in cache._disk.execute("SELECT key FROM result_cache ORDER BY key")]
+        stats = cache.stats()
+        cache.close()
+        return keys, stats
+
+    keys, stats = asyncio.run(_runner())
+    assert keys == ["new-2", "new-3", "new-4"]
+    assert stats["disk_pruned"] == 4
@@ -1,7 +1,11 @@
+import asyncio
+import numpy as np
 import pytest
-from app.services.db_service import find_top_k_recipes
+from types import SimpleNamespace
+from app.services import db_service
+from app.services.db_service import find_top_k_recipes, find_poisons_for_embedding, find_poisons_indexed, find_poisons_indexed_batch
 from app.services.exceptions import DBServiceError
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, MagicMock
 
 
 def test_find_top_k_recipes_raises_on_db_error():
@@ -19,4 +23,186 @@ def test_find_top_k_recipes_raises_on_db_error():
     fake_db.execute.side_effect = Exception("db down")
     with pytest.raises(DBServiceError):
         import asyncio
-        asyncio.run(find_top_k_recipes(fake_db, None))
\ No newline at end of file
+        asyncio.run(find_top_k_recipes(fake_db, None))
+
+def _result(rows=None, scalars=None):
+    result = MagicMock()
+    result.fetchall.return_value = rows or []
+    result.scalars.return_value.all.return_value = scalars or []
+    return result
+
+
+def test_find_poisons_for_embedding_uses_two_round_trips():
+    """
+    시나리오: 상위 k개 레시피 검색과 독성 물질 매칭이 레시피 수와 무관하게 두 번의 DB 왕복으로 끝나는지 검증한다.
+
+    절차:
+    1. 첫 번째 `execute`는 (id, distance, ingredients) 행 3개를, 두 번째는 독성 물질 목록을 반환하도록 가짜 세션을 만든다.
+    2. `find_poisons_for_embedding`을 top_k=3으로 호출한다.
+    3. `execute` 호출 횟수와 반환된 독성 물질 목록을 확인한다.
+
+    예상 결과: `execute`는 정확히 2회 호출되고, 결과는 유사도 순서를 따르며 이름 기준으로 중복이 제거된다.
+    빈 이름의 항목은 대체 이름이 일치해도 매칭되지 않는다.
+    """
+    rows = [
+        SimpleNamespace(id="r1", distance=0.1, ingredients=[{"text": "2 Onions"}, {"text": "salt"}]),
+        SimpleNamespace(id="r2", distance=0.2, ingredients=[{"text": "Garlic clove"}]),
+        SimpleNamespace(id="r3", distance=0.3, ingredients=[{"text": "red onion"}]),
+    ]
+    poisons = [
+        SimpleNamespace(name="", alternate_names=["salt"], desktop_thumb="", poison_description=""),
+        SimpleNamespace(name="Onion", alternate_names=[], desktop_thumb="o.png", poison_description="bad"),
+        SimpleNamespace(name="Allium", alternate_names=["garlic"], desktop_thumb="a.png", poison_description="bad"),
+    ]
+    fake_db = AsyncMock()
+    fake_db.execute.side_effect = [_result(rows=rows), _result(scalars=poisons)]
+
+    result = asyncio.run(find_poisons_for_embedding(fake_db, np.zeros(4, dtype=np.float32), top_k=3))
+
+    assert fake_db.execute.await_count == 2
+    assert [p["name"] for p in result] == ["Onion", "Allium"]
+    assert result[0] == {"name": "Onion", "image": "o.png", "description": "bad"}
+
+
+def test_find_poisons_indexed_uses_single_round_trip():
+    """
+    시나리오: 사전 계산된 `recipe_poisons`를 사용하는 조회가 한 번의 DB 왕복으로 끝나고 유사도 순서대로 중복 제거되는지 검증한다.
+
+    절차:
+    1. 가짜 세션의 `execute`가 거리 순으로 정렬된 (distance, name, desktop_thumb, poison_description) 행을 반환하도록 설정한다.
+    2. `find_poisons_indexed`를 호출한다.
+
+    예상 결과: `execute`는 1회만 호출되고, 같은 이름은 가장 유사한 레시피의 항목만 남는다.
+    """
+    rows = [
+        SimpleNamespace(distance=0.1, name="Onion", desktop_thumb="o.png", poison_description="bad"),
+        SimpleNamespace(distance=0.2, name="Grape", desktop_thumb="g.png", poison_description="worse"),
+        SimpleNamespace(distance=0.3, name="Onion", desktop_thumb="o.png", poison_description="bad"),
+    ]
+    fake_db = AsyncMock()
+    fake_db.execute.return_value = _result(rows=rows)
+
+    result = asyncio.run(find_poisons_indexed(fake_db, np.zeros(4, dtype=np.float32), top_k=3))
+
+    assert fake_db.execute.await_count == 1
+    assert result == [
+        {"name": "Onion", "image": "o.png", "description": "bad"},
+        {"name": "Grape", "image": "g.png", "description": "worse"},
+    ]
+
+
+def test_find_poisons_indexed_batch_groups_rows_by_query():
+    """
+    시나리오: 여러 질의 벡터를 한 번의 `unnest`/LATERAL 문장으로 검색한 결과가 질의별로 올바르게 나뉘는지 검증한다.
+
+    절차:
+    1. 가짜 세션이 (ord, distance, name, ...) 행을 질의 순서대로 반환하도록 설정한다. 두 번째 질의에는 행이 없다.
+    2. 질의 3개로 `find_poisons_indexed_batch`를 호출한다.
+
+    예상 결과: `execute`는 1회 호출되고, 질의 벡터는 pgvector 텍스트 리터럴 배열로 전달되며,
+    결과는 질의별 목록(빈 목록 포함)으로 중복 제거되어 반환된다.
+    """
+    rows = [
+        SimpleNamespace(ord=1, distance=0.1, name="Onion", desktop_thumb="o.png", poison_description=""),
+        SimpleNamespace(ord=1, distance=0.2, name="Onion", desktop_thumb="o.png", poison_description=""),
+        SimpleNamespace(ord=3, distance=0.1, name="Grape", desktop_thumb="g.png", poison_description=""),
+    ]
+    fake_db = AsyncMock()
+    fake_db.execute.return_value = _result(rows=rows)
+    queries = np.arange(6, dtype=np.float32).reshape(3, 2)
+
+    result = asyncio.run(find_poisons_indexed_batch(fake_db, queries, top_k=5))
+
+    assert fake_db.execute.await_count == 1
+    params = fake_db.execute.await_args.args[1]
+    assert params == {"qvecs": ["[0.0,1.0]", "[2.0,3.0]", "[4.0,5.0]"], "top_k": 5}
+    assert [[p["name"] for p in r] for r in result] == [["Onion"], [], ["Grape"]]
+
+
+def test_vector_search_settings_applied_on_connect(monkeypatch):
+    """
+    시나리오: 설정된 `ivfflat.probes` / `hnsw.ef_search` 값이 새 DB 커넥션마다 세션 단위로 적용되는지 검증한다.
+
+    절차:
+    1. `vector_search_probes`=20, `vector_search_ef_search`=0으로 설정을 대체한다.
+    2. 접속하지 않은 async 엔진에 `install_vector_search_settings`를 설치하고, 등록된 connect 리스너를 가짜 DBAPI 커넥션으로 호출한다.
+
+    예상 결과: 0 이하의 값은 생략되고 `SET ivfflat.probes = 20`만 실행되며 커서가 닫힌다.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    options = {"vector_search_probes": 20, "vector_search_ef_search": 0}
+    monkeypatch.setattr(db_service, "get_config_option", lambda name, default=None: options.get(name, default))
+    engine = create_async_engine("postgresql+asyncpg://u:p@localhost/db")
+
+    assert db_service.install_vector_search_settings(engine) == {"ivfflat.probes": 20}
+
+    dbapi_conn = MagicMock()
+    [apply] = [fn for fn in engine.sync_engine.pool.dispatch.connect if fn.__name__ == "_apply"]
+    apply(dbapi_conn, None)
+    cursor = dbapi_conn.cursor.return_value
+    cursor.execute.assert_called_once_with("SET ivfflat.probes = 20")
+    cursor.close.assert_called_once()
+
+
+def test_half_precision_search_rescores_candidates(monkeypatch):
+    """
+    시나리오: `vector_search_precision`이 "half"일 때 halfvec 인덱스로 후보를 고른 뒤 float32 거리로 다시 정렬하는지 검증한다.
+
+    절차:
+    1. `vector_search_precision`="half", `vector_rescore_factor`=4로 설정을 대체한다.
+    2. 가짜 세션으로 `find_top_k_recipes`를 호출하고, 실행된 문장을 postgresql 방언으로 컴파일한다.
+
+    예상 결과: 내부 질의는 `HALFVEC(1024)` 캐스트 거리로 정렬되어 top_k * 4개 후보를 가져오고,
+    외부 질의는 원래 정밀도 거리로 정렬해 top_k개만 반환한다.
+    """
+    from sqlalchemy.dialects import postgresql
+
+    options = {"vector_search_precision": "half", "vector_rescore_factor": 4}
+    monkeypatch.setattr(db_service, "get_config_option", lambda name, default=None: options.get(name, default))
+    fake_db = AsyncMock()
+    fake_db.execute.return_value = _result(rows=[SimpleNamespace(id="r1", distance=0.25)])
+
+    result = asyncio.run(find_top_k_recipes(fake_db, np.zeros(4, dtype=np.float32), top_k=5))
+
+    stmt = fake_db.execute.await_args.args[0]
+    compiled = stmt.compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+    assert "ORDER BY CAST(rec_embeds.embedding AS HALFVEC(1024)) <=> CAST(%(qvec)s AS HALFVEC(1024))" in sql
+    assert sorted(v for k, v in compiled.params.items() if k.startswith("param")) == [5, 20]
+    assert result == [("r1", 0.75)]
+
+
+def test_normalized_embeddings_switch_to_inner_product(monkeypatch):
+    """
+    시나리오: `vector_meta`에 `rec_embeds`가 정규화되어 적재되었다고 기록되어 있으면 검색이 내적 연산자(`<#>`)로
+    바뀌되, 호출자에게 반환되는 유사도 값은 코사인 기준 그대로인지 검증한다.
+
+    절차:
+    1. `vector_distance`="auto"로 두고, 가짜 세션이 `vector_meta` 조회에 True를 반환하도록 하여 `detect_normalized_embeddings`를 호출한다.
+    2. 길이가 1이 아닌 질의 벡터로 `find_top_k_recipes`를 호출하고, 실행된 문장과 전달된 질의 벡터를 확인한다.
+
+    예상 결과: 정렬은 `embedding <#> qvec`로, 거리는 `1 + (embedding <#> qvec)`로 계산되며,
+    질의 벡터는 단위 길이로 정규화되어 전달되고 유사도는 `1 - distance`로 반환된다.
+    """
+    from sqlalchemy.dialects import postgresql
+
+    monkeypatch.setattr(db_service, "_embeddings_normalized", False)
+    monkeypatch.setattr(db_service, "get_config_option", lambda name, default=None: default)
+    meta_db = AsyncMock()
+    meta_db.execute.return_value = MagicMock()
+    meta_db.execute.return_value.scalar_one_or_none.return_value = True
+
+    assert asyncio.run(db_service.detect_normalized_embeddings(meta_db)) is True
+    assert db_service.vector_distance() == "ip"
+
+    fake_db = AsyncMock()
+    fake_db.execute.return_value = _result(rows=[SimpleNamespace(id="r1", distance=0.25)])
+    result = asyncio.run(find_top_k_recipes(fake_db, np.array([3.0, 4.0], dtype=np.float32), top_k=5))
+
+    stmt, params = fake_db.execute.await_args.args
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "CAST(1 + (rec_embeds.embedding <#> %(qvec)s) AS FLOAT) AS distance" in sql
+    assert "ORDER BY rec_embeds.embedding <#> %(qvec)s" in sql
+    np.testing.assert_allclose(params["qvec"], [0.6, 0.8])
+    assert result == [("r1", 0.75)]
@@ -0,0 +1,165 @@
+import asyncio
+import time
+from app.services import queue_service
+from app.services.pipeline import StagedPipeline
+
+
+def test_staged_pipeline_overlaps_stages_with_backpressure():
+    """
+    시나리오: decode → infer → db 단계가 제한된 큐로 연결되어 서로 다른 작업이 동시에 다른 단계를 차지하고,
+    뒤 단계가 막히면 앞 단계도 큐 크기만큼만 진행하며(backpressure), 한 작업의 실패가 다른 작업에 영향을 주지 않는지 검증한다.
+
+    절차:
+    1. 각 단계가 0.05초씩 걸리는 파이프라인(decode 1, infer 1, db 4 동시성)에 작업 6개를 동시에 넣고 전체 시간을 잰다.
+    2. decode 단계에서 예외를 내는 작업을 함께 넣는다.
+    3. infer 단계를 이벤트로 막은 큐 크기 1 파이프라인에 작업 10개를 넣고 decode 완료 수를 확인한 뒤 막힘을 푼다.
+
+    예상 결과:
+    - 각 작업은 자기 결과를 받고, 전체 시간은 순차 처리(6 x 0.15초)보다 확연히 짧다.
+    - 실패한 작업만 예외를 받고, 통계의 단계별 완료 수와 점유율(occupancy)이 기록된다.
+    - 막힌 동안 decode는 (실행 중 1 + 대기 큐 1 + 넘겨주려고 대기 1) 이하만 처리하고, 풀린 뒤 모든 작업이 끝난다.
+    """
+    async def _runner():
+        async def decode(x):
+            await asyncio.sleep(0.05)
+            if x == "bad":
+                raise ValueError("cannot decode")
+            return x * 2
+
+        async def infer(x):
+            await asyncio.sleep(0.05)
+            return x + 1
+
+        async def db(x):
+            await asyncio.sleep(0.05)
+            return f"r{x}"
+
+        pipe = StagedPipeline([("t_decode", decode, 1), ("t_infer", infer, 1), ("t_db", db, 4)], queue_size=4)
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(pipe.submit(i) for i in range(6)), pipe.submit("bad"), return_exceptions=True)
+        elapsed = time.perf_counter() - t0
+        assert results[:6] == [f"r{i * 2 + 1}" for i in range(6)]
+        assert isinstance(results[6], ValueError)
+        assert elapsed < 0.6
+        stats = pipe.stats()
+        assert stats["submitted"] == 7 and stats["failed"] == 1
+        assert stats["stages"]["t_infer"]["completed"] == 6
+        assert 0 < stats["stages"]["t_infer"]["occupancy"] <= 1
+        await pipe.stop()
+
+        gate = asyncio.Event()
+        decoded = []
+
+        async def count_decode(x):
+            decoded.append(x)
+            return x
+
+        async def blocked_infer(x):
+            await gate.wait()
+            return x
+
+        async def passthrough(x):
+            return x
+
+        pipe = StagedPipeline([("b_decode", count_decode, 1), ("b_infer", blocked_infer, 1), ("b_db", passthrough, 1)], queue_size=1)
+        pending = asyncio.gather(*(pipe.submit(i) for i in range(10)))
+        await asyncio.sleep(0.05)
+        assert len(decoded) <= 3
+        gate.set()
+        assert await asyncio.wait_for(pending, timeout=2.0) == list(range(10))
+        await pipe.stop()
+
+    asyncio.run(_runner())
+
+
+def test_request_ai_analysis_uses_pipeline(monkeypatch):
+    """
+    시나리오: `pipeline_stages`가 켜지면 `request_ai_analysis`가 세마포어 경로 대신 decode → infer → db 파이프라인을 거치는지 검증한다.
+
+    절차:
+    1. `pipeline_enabled`를 True로, 단계 함수(decode_image, embed_decoded_batch, find_poisons)를 가짜로 바꾸고 파이프라인을 초기화한다.
+    2. 두 이미지를 동시에 `request_ai_analysis`로 처리한다.
+    3. 파이프라인을 종료한다.
+
+    예상 결과: 각 호출은 자기 이미지의 결과를 받고, 가짜 단계 함수가 순서대로(decode → embed → find) 호출되며 top_k가 전달된다.
+    """
+    calls = []
+
+    async def fake_decode(path):
+        calls.append(("decode", path))
+        return f"tensor:{path}"
+
+    async def fake_embed(batch):
+        for decoded in batch:
+            calls.append(("embed", decoded))
+        return [f"emb:{decoded}" for decoded in batch]
+
+    async def fake_find(emb, top_k=10):
+        calls.append(("find", emb, top_k))
+        return [{"name": emb, "toxic": False}]
+
+    monkeypatch.setattr(queue_service, "pipeline_enabled", lambda: True)
+    monkeypatch.setattr(queue_service, "decode_image", fake_decode)
+    monkeypatch.setattr(queue_service, "embed_decoded_batch", fake_embed)
+    monkeypatch.setattr(queue_service, "find_poisons", fake_find)
+    monkeypatch.setattr(queue_service, "_analysis_pipeline", None)
+
+    async def _runner():
+        try:
+            return await asyncio.gather(
+                queue_service.request_ai_analysis("/tmp/a.jpg", top_k=5),
+                queue_service.request_ai_analysis("/tmp/b.jpg", top_k=5),
+            )
+        finally:
+            await queue_service.stop_analysis_pipeline()
+
+    a, b = asyncio.run(_runner())
+    assert a == [{"name": "emb:tensor:/tmp/a.jpg", "toxic": False}]
+    assert b == [{"name": "emb:tensor:/tmp/b.jpg", "toxic": False}]
+    assert [c for c in calls if "a.jpg" in c[1]] == [
+        ("decode", "/tmp/a.jpg"),
+        ("embed", "tensor:/tmp/a.jpg"),
+        ("find", "emb:tensor:/tmp/a.jpg", 5),
+    ]
+
+
+
+def test_batched_stage_takes_waiting_items_in_one_call():
+    """
+    시나리오: 배치 단계(batch_size > 1)의 실행기 하나가 큐에 이미 대기 중인 항목을 batch_size개까지 한 번에 처리하고,
+    배치 결과 중 예외 항목은 해당 작업만 실패시키는지 검증한다.
+
+    절차:
+    1. 이벤트로 막은 batch_size 4, 동시성 1의 infer 단계를 가진 파이프라인에 작업 9개를 한꺼번에 넣는다.
+    2. 막힘을 풀고 결과와 배치 크기, 통계를 확인한다. 값 5는 배치 함수가 예외 인스턴스로 돌려준다.
+
+    예상 결과: 대기 중인 항목이 최대 4개씩 묶여 처리된다(4, 4, 1).
+    5번 작업만 예외를 받고, 통계에 batch_size와 평균 배치 크기(3.0)가 표시된다.
+    """
+    async def _runner():
+        gate = asyncio.Event()
+        sizes = []
+
+        async def passthrough(x):
+            return x
+
+        async def infer(batch):
+            sizes.append(len(batch))
+            await gate.wait()
+            return [ValueError("bad image") if x == 5 else x * 10 for x in batch]
+
+        pipe = StagedPipeline([("bt_decode", passthrough, 1), ("bt_infer", infer, 1, 4)], queue_size=16)
+        pending = asyncio.gather(*(pipe.submit(i) for i in range(9)), return_exceptions=True)
+        await asyncio.sleep(0.05)
+        gate.set()
+        results = await asyncio.wait_for(pending, timeout=2.0)
+        stats = pipe.stats()
+        await pipe.stop()
+        return results, sizes, stats
+
+    results, sizes, stats = asyncio.run(_runner())
+    assert sizes == [4, 4, 1]
+    assert [r for i, r in enumerate(results) if i != 5] == [i * 10 for i in range(9) if i != 5]
+    assert isinstance(results[5], ValueError)
+    assert stats["failed"] == 1
+    assert stats["stages"]["bt_infer"]["batch_size"] == 4 and stats["stages"]["bt_infer"]["avg_batch_size"] == 3.0
@@ -0,0 +1,69 @@
+import asyncio
+import random
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.db_service import match_recipes
+from app.services.poison_matcher import PoisonMatcher
+
+
+def _poison(name, alternate_names=()):
+    return SimpleNamespace(name=name, alternate_names=list(alternate_names), desktop_thumb=f"{name}.png", poison_description="")
+
+
+def test_matcher_matches_reference_loop():
+    """
+    시나리오: Aho-Corasick 기반 `PoisonMatcher`가 기존 부분 문자열 매칭 루프(`match_recipes`)와 같은 결과를 내는지 검증한다.
+
+    절차:
+    1. 서로 겹치는 이름/대체 이름(접두사, 접미사 포함)과 빈 이름 항목을 가진 독성 물질 목록을 만든다.
+    2. 무작위 재료 문장으로 레시피 200개를 생성한다.
+    3. 레시피별로 두 구현의 결과를 비교하고, 전체 목록에 대한 중복 제거 결과도 비교한다.
+
+    예상 결과: 모든 레시피에서 첫 번째 매칭(테이블 순서)과 이름 기준 중복 제거 결과가 동일하다.
+    """
+    poisons = [
+        _poison("", ["salt"]),
+        _poison("Grape", ["raisin", "sultana"]),
+        _poison("Onion", ["shallot", "scallion"]),
+        _poison("Garlic", ["garlic powder"]),
+        _poison("Chocolate", ["cocoa", "cacao"]),
+        _poison("Apple Seeds", ["ape"]),
+        _poison("Nutmeg", []),
+    ]
+    matcher = PoisonMatcher(poisons)
+    words = ["Red", "onions", "grapefruit", "SALT", "cocoa", "Garlic", "powder", "rice", "shallots", "apex", "nut", "meg", "nutmeg", "water"]
+    rng = random.Random(0)
+    recipes = [[{"text": " ".join(rng.choices(words, k=rng.randint(0, 4)))} for _ in range(rng.randint(0, 3))] for _ in range(200)]
+
+    for recipe in recipes:
+        assert matcher.match_recipes([recipe]) == match_recipes([recipe], poisons)
+    assert matcher.match_recipes(recipes) == match_recipes(recipes, poisons)
+    assert matcher.match_recipes([None, [{"text": "plain rice"}]]) == []
+
+
+def test_reload_swaps_snapshot():
+    """
+    시나리오: `reload`가 DB에서 새 독성 물질 목록을 읽어 매처 상태를 교체하는지 검증한다.
+
+    절차:
+    1. "Onion"만 가진 매처를 만든다.
+    2. 가짜 세션 팩토리가 "Onion", "Xylitol"을 반환하도록 설정하고 `reload`를 호출한다.
+    3. 이후 "xylitol" 재료가 매칭되고 버전이 증가했는지 확인한다.
+
+    예상 결과: 새 스냅샷이 적용되어 추가된 항목이 매칭되며 `stats()`의 버전/재적재 횟수가 갱신된다.
+    """
+    matcher = PoisonMatcher([_poison("Onion")])
+    assert matcher.match("sugar-free gum with xylitol") is None
+
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = [_poison("Onion"), _poison("Xylitol")]
+    session = AsyncMock()
+    session.execute.return_value = result
+    session.__aenter__.return_value = session
+
+    asyncio.run(matcher.reload(lambda: session))
+
+    assert matcher.match("sugar-free gum with xylitol")["name"] == "Xylitol"
+    stats = matcher.stats()
+    assert stats["version"] == 2 and stats["reloads"] == 1 and stats["poisons"] == 2
@@ -0,0 +1,36 @@
+import pytest
+from PIL import Image
+from app.services.preprocess import ImagePreprocessor
+from app.services.exceptions import AIServiceError
+
+
+def test_preprocessor_output_and_pixel_limit(tmp_path):
+    """
+    시나리오: 전처리기가 다양한 크기/형식의 이미지를 (3, 224, 224) 텐서로 변환하고,
+    픽셀 수 제한을 초과한 이미지는 디코딩 전에 거부하는지 검증한다.
+
+    절차:
+    1. 큰 JPEG(1600x1200, draft 디코딩 경로)와 작은 PNG(300x200, 일반 경로)를 만든다.
+    2. `load`의 출력 텐서 크기와 dtype을 확인한다.
+    3. `max_pixels`를 작게 설정한 전처리기로 같은 JPEG를 로드해 `AIServiceError`가 발생하는지 확인한다.
+    4. 이미지가 아닌 바이트도 `AIServiceError`로 보고되는지 확인한다.
+
+    예상 결과: 정상 이미지는 모두 (3, 224, 224) float32 텐서로 변환되고, 제한 초과/손상 파일은 도메인 예외로 거부된다.
+    """
+    jpg = tmp_path / "big.jpg"
+    Image.new("RGB", (1600, 1200), (120, 200, 40)).save(jpg)
+    png = tmp_path / "small.png"
+    Image.new("RGBA", (300, 200), (10, 20, 30, 255)).save(png)
+    bad = tmp_path / "bad.jpg"
+    bad.write_bytes(b"not-a-real-image")
+
+    pre = ImagePreprocessor()
+    for p in (jpg, png):
+        t = pre.load(str(p))
+        assert tuple(t.shape) == (3, 224, 224)
+        assert str(t.dtype) == "torch.float32"
+
+    with pytest.raises(AIServiceError, match="too large"):
+        ImagePreprocessor(max_pixels=1_000_000).load(str(jpg))
+    with pytest.raises(AIServiceError):
+        pre.load(str(bad))
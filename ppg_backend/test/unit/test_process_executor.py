@@ -0,0 +1,152 @@
+import asyncio
+import numpy as np
+import pytest
+from multiprocessing.shared_memory import SharedMemory
+from PIL import Image
+from app.services.process_executor import ProcessInferenceExecutor, _slot_view
+from app.services.exceptions import AIServiceError
+
+EMB_DIM = 4
+
+
+def load_tiny_model(config_path=None):
+    """워커 프로세스용 모델 로더: 체크포인트 대신 작은 고정 모델을 올린다 (spawn으로 pickle되도록 모듈 최상위에 둔다)."""
+    import torch
+    from app.services import ai_service
+
+    class MeanColor(torch.nn.Module):
+        def forward(self, x):
+            means = x.mean(dim=(2, 3))  # (B, 3)
+            return torch.cat([means, torch.ones(x.shape[0], 1)], dim=1)
+
+    ai_service.model = MeanColor()
+    ai_service.device = torch.device("cpu")
+
+
+def load_slow_green_model(config_path=None):
+    """워커 프로세스용 모델 로더: 초록 이미지에서만 1초 걸리는 작은 고정 모델을 올린다."""
+    import time
+    import torch
+    from app.services import ai_service
+
+    class SlowOnGreen(torch.nn.Module):
+        def forward(self, x):
+            means = x.mean(dim=(2, 3))  # (B, 3)
+            if bool((means[:, 1] > means[:, 0]).any()):
+                time.sleep(1.0)
+            return torch.cat([means, torch.ones(x.shape[0], 1)], dim=1)
+
+    ai_service.model = SlowOnGreen()
+    ai_service.device = torch.device("cpu")
+
+
+def test_slot_layout_and_unstarted_executor():
+    """
+    시나리오: 공유 메모리 슬롯이 (배치, 임베딩 차원) 출력 영역만 갖고, 시작되지 않은 실행기는 `AIServiceError`를 던지는지 검증한다.
+
+    절차:
+    1. 배치 2, 임베딩 차원 4 크기의 슬롯을 생성하고 출력 뷰에 값을 쓴다.
+    2. `start()` 없이 `embed_paths`를 호출해 `AIServiceError`가 발생하는지 확인한다.
+    3. 최대 배치 크기를 초과한 입력은 `ValueError`로 거부되는지 확인한다.
+
+    예상 결과: 슬롯 크기는 `slot_bytes`와 일치하고, 잘못된 사용은 명확한 예외로 보고된다.
+    """
+    ex = ProcessInferenceExecutor(num_workers=1, max_batch_size=2, emb_dim=4)
+    assert ex.slot_bytes == 2 * 4 * 4
+    shm = SharedMemory(create=True, size=ex.slot_bytes)
+    try:
+        outputs = _slot_view(shm.buf, 2, 4)
+        assert outputs.shape == (2, 4)
+        outputs[:] = 2.0
+        assert np.all(outputs == 2.0)
+        del outputs
+    finally:
+        shm.close()
+        shm.unlink()
+
+    with pytest.raises(AIServiceError):
+        asyncio.run(ex.embed_paths(["a.jpg"]))
+    with pytest.raises(ValueError):
+        asyncio.run(ex.embed_paths(["a.jpg", "b.jpg", "c.jpg"]))
+
+
+def test_worker_process_round_trip_fails_only_bad_images(tmp_path):
+    """
+    시나리오: 실제 워커 프로세스를 띄워 이미지 경로 배치를 보내고, 임베딩이 공유 메모리를 거쳐 돌아오며
+    디코딩할 수 없는 이미지는 같은 배치의 다른 이미지에 영향을 주지 않는지 검증한다.
+
+    절차:
+    1. 작은 고정 모델을 올리는 로더로 워커 1개짜리 실행기를 시작한다.
+    2. 빨간 이미지, 손상된 파일, 파란 이미지를 한 배치로 `embed_paths`에 보낸다.
+    3. 빨간 이미지는 `embed_path`로 단독 실행하고, 손상된 파일도 단독 실행한다.
+
+    예상 결과:
+    - 배치 결과는 세 항목이며 정상 이미지는 (4,) 임베딩(채널별 평균이 색을 반영), 손상된 파일은 `AIServiceError`다.
+    - 단독 실행 결과는 배치 안의 결과와 같고, 손상된 파일은 `AIServiceError`를 던진다.
+    """
+    red, blue, bad = tmp_path / "red.png", tmp_path / "blue.png", tmp_path / "bad.jpg"
+    Image.new("RGB", (64, 48), (255, 0, 0)).save(red)
+    Image.new("RGB", (64, 48), (0, 0, 255)).save(blue)
+    bad.write_bytes(b"not an image")
+
+    ex = ProcessInferenceExecutor(num_workers=1, max_batch_size=4, emb_dim=EMB_DIM, model_loader=load_tiny_model)
+    ex.start()
+    try:
+        async def _runner():
+            batch = await ex.embed_paths([str(red), str(bad), str(blue)])
+            single = await ex.embed_path(str(red))
+            with pytest.raises(AIServiceError):
+                await ex.embed_path(str(bad))
+            return batch, single
+
+        (r, b, bl), single = asyncio.run(_runner())
+    finally:
+        ex.shutdown()
+
+    assert isinstance(b, AIServiceError)
+    assert r.shape == (EMB_DIM,) and bl.shape == (EMB_DIM,)
+    assert r[0] > r[2] and bl[2] > bl[0] and r[3] == 1.0
+    np.testing.assert_allclose(single, r, rtol=1e-5)
+
+
+def test_cancelled_call_keeps_slot_until_worker_finishes(tmp_path):
+    """
+    시나리오: 워커가 실행 중인 호출이 취소되어도, 워커가 결과를 다 쓸 때까지 그 공유 메모리 슬롯이 다른 호출에 재사용되지 않는지 검증한다.
+
+    절차:
+    1. 초록 이미지에서만 1초 걸리는 모델 로더로 워커 1개(슬롯 2개)짜리 실행기를 시작하고 빨간 이미지로 예열한다.
+    2. 초록 이미지 호출을 시작하고, 워커가 실행 중일 때 취소한다.
+    3. 취소 직후와 워커가 끝난 뒤의 빈 슬롯 수를 확인하고, 이어서 빨간 이미지를 다시 임베딩한다.
+
+    예상 결과: 취소가 호출자에게 전달된 뒤에도 빈 슬롯은 1개로 유지되고, 워커가 끝난 뒤 2개로 돌아오며,
+    이후 호출은 올바른 임베딩을 받는다.
+    """
+    red, green = tmp_path / "red.png", tmp_path / "green.png"
+    Image.new("RGB", (32, 32), (255, 0, 0)).save(red)
+    Image.new("RGB", (32, 32), (0, 255, 0)).save(green)
+
+    ex = ProcessInferenceExecutor(num_workers=1, max_batch_size=1, emb_dim=EMB_DIM, model_loader=load_slow_green_model)
+    ex.start()
+    try:
+        async def _runner():
+            warm = await ex.embed_path(str(red))
+            call = asyncio.create_task(ex.embed_paths([str(green)]))
+            await asyncio.sleep(0.3)  # the worker is inside the slow forward pass
+            call.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await call
+            free_after_cancel = ex._free.qsize()
+            for _ in range(50):
+                if ex._free.qsize() == 2:
+                    break
+                await asyncio.sleep(0.05)
+            free_after_worker = ex._free.qsize()
+            again = await ex.embed_path(str(red))
+            return warm, free_after_cancel, free_after_worker, again
+
+        warm, free_after_cancel, free_after_worker, again = asyncio.run(_runner())
+    finally:
+        ex.shutdown()
+
+    assert free_after_cancel == 1 and free_after_worker == 2
+    np.testing.assert_allclose(again, warm, rtol=1e-5)
@@ -1,7 +1,9 @@
 import asyncio
 import pytest
+from app.schemas.task import TaskStatus
 from app.services.queue_service import QueueManager, enqueue, process_task_item
-from app.services.worker_service import start_workers, stop_workers
+from app.services.worker_service import start_workers, stop_workers, start_db_workers, stop_db_workers
+from app.services.task.pg_task_store import write_task_input
 
 
 class Dummy:
@@ -59,4 +61,399 @@ def test_enqueue_and_worker_process(tmp_path):
         # shutdown workers
         await stop_workers(shutdown, qm=qm)
 
-    asyncio.run(_runner())
\ No newline at end of file
+    asyncio.run(_runner())
+
+def test_single_flight_coalesces_identical_uploads(tmp_path, monkeypatch):
+    """
+    시나리오: 같은 콘텐츠 해시의 분석이 이미 대기/실행 중일 때, 이후 도착한 태스크는 큐에 들어가지 않고
+    실행 중인 계산에 합류하여 각자의 task id로 같은 결과를 받는지 검증한다.
+
+    절차:
+    1. 테스트 전용 `QueueManager`와 `InFlightRegistry`를 기본 인스턴스로 주입한다.
+    2. 같은 해시를 가진 `TaskInput` 3개를 `enqueue`한다.
+    3. 큐에는 첫 번째(리더)만 들어가고, 후속 태스크의 임시 파일은 즉시 삭제되는지 확인한다.
+    4. 리더를 `process_task_item`으로 처리하고 저장 콜백 호출 내역을 확인한다.
+
+    예상 결과: AI 요청은 한 번만 수행되고, 세 개의 task id 모두 동일한 결과로 저장되며 레지스트리는 비워진다.
+    """
+    from app.schemas.task import TaskInput
+    from app.services import queue_service
+    from app.services.cache_service import ResultCache
+
+    qm = QueueManager()
+    registry = queue_service.InFlightRegistry()
+    monkeypatch.setattr(queue_service, "_default_queue_manager", qm)
+    monkeypatch.setattr(queue_service, "_default_inflight", registry)
+
+    ai_calls = []
+    saved = []
+
+    async def fake_request_ai(tmp_path, timeout=15.0, top_k=10):
+        ai_calls.append(tmp_path)
+        return [{"name": "onion"}]
+
+    async def fake_save(task_id, result):
+        saved.append((task_id, result))
+
+    async def _runner():
+        paths = []
+        for i in range(3):
+            f = tmp_path / f"img{i}.jpg"
+            f.write_bytes(b"same-bytes")
+            paths.append(f)
+            await enqueue(f"t{i}", TaskInput(str(f), f.name, "image/jpeg", "samehash"))
+        assert qm.ensure().qsize() == 1
+        assert paths[0].exists() and not paths[1].exists() and not paths[2].exists()
+
+        task_id, file_tuple = await qm.get()
+        await process_task_item(
+            task_id, file_tuple,
+            request_ai_fn=fake_request_ai, save_fn=fake_save,
+            result_cache=ResultCache(), inflight=registry,
+        )
+
+    asyncio.run(_runner())
+    assert len(ai_calls) == 1
+    assert sorted(saved) == [(f"t{i}", [{"name": "onion"}]) for i in range(3)]
+    assert registry.stats() == {"in_flight": 0, "waiting_followers": 0, "coalesced": 2}
+
+
+def test_single_flight_entry_released_when_leader_is_cancelled(tmp_path):
+    """
+    시나리오: 리더 분석이 취소(`CancelledError`)되어도 single-flight 항목이 남지 않고, 합류한 후속 태스크가
+    영원히 대기하지 않고 실패로 처리되는지 검증한다.
+
+    절차:
+    1. 리더를 등록하고 후속 태스크 하나를 합류시킨다.
+    2. AI 요청에서 멈추는 `process_task_item`을 실행한 뒤 취소한다.
+
+    예상 결과: 취소가 호출자에게 전달되고, 리더와 후속 태스크가 `analysis cancelled`로 실패 처리되며
+    레지스트리와 임시 파일이 비워진다.
+    """
+    from app.schemas.task import TaskInput
+    from app.services import queue_service
+
+    registry = queue_service.InFlightRegistry()
+    registry.begin("h")
+    registry.attach("h", "follower")
+    f = tmp_path / "img.jpg"
+    f.write_bytes(b"bytes")
+    statuses = []
+
+    async def fake_update(task_id, status, **kwargs):
+        statuses.append((task_id, status, kwargs.get("last_error")))
+
+    async def _runner():
+        started = asyncio.Event()
+
+        async def stuck_request_ai(tmp_path, timeout=15.0, top_k=10):
+            started.set()
+            await asyncio.sleep(60)
+
+        job = asyncio.create_task(process_task_item(
+            "leader", TaskInput(str(f), f.name, "image/jpeg", "h"),
+            request_ai_fn=stuck_request_ai, update_status_fn=fake_update, inflight=registry,
+        ))
+        await started.wait()
+        job.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await job
+
+    asyncio.run(_runner())
+    assert statuses == [
+        ("leader", TaskStatus.failed, "analysis cancelled"),
+        ("follower", TaskStatus.failed, "analysis cancelled"),
+    ]
+    assert registry.stats()["in_flight"] == 0 and not f.exists()
+
+
+def test_failed_follower_save_affects_only_that_follower(tmp_path):
+    """
+    시나리오: 리더의 결과를 합류한 후속 태스크에 저장하다가 하나가 실패해도, 리더와 나머지 후속 태스크의 결과는
+    그대로 저장되고 실패한 후속 태스크만 실패 처리되는지 검증한다.
+
+    절차:
+    1. 리더 L을 등록하고 후속 태스크 f1, f2를 합류시킨다.
+    2. f1 저장에서만 예외를 내는 저장 콜백으로 `process_task_item`을 실행한다.
+
+    예상 결과: L과 f2는 결과가 저장되고 상태 변경이 없으며, f1만 저장 오류로 실패 처리되고 레지스트리는 비워진다.
+    """
+    from app.schemas.task import TaskInput
+    from app.services import queue_service
+    from app.services.cache_service import ResultCache
+
+    registry = queue_service.InFlightRegistry()
+    registry.begin("h")
+    registry.attach("h", "f1")
+    registry.attach("h", "f2")
+    f = tmp_path / "img.jpg"
+    f.write_bytes(b"bytes")
+    saved, statuses = [], []
+
+    async def fake_request_ai(tmp_path, timeout=15.0, top_k=10):
+        return [{"name": "onion"}]
+
+    async def flaky_save(task_id, result):
+        if task_id == "f1":
+            raise RuntimeError("db down")
+        saved.append(task_id)
+
+    async def fake_update(task_id, status, **kwargs):
+        statuses.append((task_id, status, kwargs.get("last_error")))
+
+    asyncio.run(process_task_item(
+        "L", TaskInput(str(f), f.name, "image/jpeg", "h"),
+        request_ai_fn=fake_request_ai, save_fn=flaky_save, update_status_fn=fake_update,
+        result_cache=ResultCache(), inflight=registry,
+    ))
+    assert saved == ["L", "f2"]
+    assert statuses == [("f1", TaskStatus.failed, "db down")]
+    assert registry.stats()["in_flight"] == 0 and not f.exists()
+
+
+def test_search_collector_merges_concurrent_lookups(monkeypatch):
+    """
+    시나리오: 검색 수집기가 동시에 도착한 임베딩들을 모아 한 번의 다중 질의 검색으로 처리하는지 검증한다.
+
+    절차:
+    1. `search_batch_size`를 4로 설정하고, `find_poisons_many`를 호출 기록용 가짜 함수로 교체한다.
+    2. 서로 다른 임베딩 4개로 `find_poisons`를 동시에 호출한다.
+
+    예상 결과: `find_poisons_many`는 4개 질의를 담은 배치로 1회 호출되고, 각 호출자는 자신의 결과를 받는다.
+    """
+    import numpy as np
+    from app.services import queue_service
+    from app.services.batch_service import MicroBatcher
+
+    calls = []
+
+    async def fake_many(query_embs, top_k=10):
+        calls.append((query_embs.shape, top_k))
+        return [[{"name": f"p{int(q[0])}"}] for q in query_embs]
+
+    monkeypatch.setattr(queue_service, "find_poisons_many", fake_many)
+    monkeypatch.setattr(queue_service, "search_batching_enabled", lambda: True)
+    monkeypatch.setattr(
+        queue_service, "_search_batcher",
+        MicroBatcher(queue_service._find_poisons_batch, max_batch_size=4, max_wait_ms=50, name="search"),
+    )
+
+    async def _runner():
+        embs = [np.full(3, i, dtype=np.float32) for i in range(4)]
+        results = await asyncio.gather(*(queue_service.find_poisons(e, top_k=10) for e in embs))
+        await queue_service.stop_search_batcher()
+        return results
+
+    results = asyncio.run(_runner())
+    assert calls == [((4, 3), 10)]
+    assert [r[0]["name"] for r in results] == ["p0", "p1", "p2", "p3"]
+
+
+def test_bounded_queue_rejects_with_retry_after(monkeypatch):
+    """
+    시나리오: 최대 깊이가 설정된 큐가 가득 차면 새 작업을 거부하고, 최근 처리율로 계산한 재시도 대기 시간을 알려주는지 검증한다.
+
+    절차:
+    1. `max_depth`=2인 `QueueManager`에 작업 2개를 넣고, 세 번째 `enqueue`를 시도한다.
+    2. 시계를 고정한 채 워커가 10초 동안 작업 5개를 꺼낸 것으로 처리율을 기록한다.
+    3. 다시 큐를 채운 뒤 `admit`을 호출해 거부 사유와 통계를 확인한다.
+
+    예상 결과: 가득 찬 큐는 `QueueFullError`를 던지고 거부 수가 늘어난다. 처리율은 초당 0.5개이므로
+    대기 2개에 대해 `retry_after`는 4초이며, 통계에 깊이·처리율·거부 수가 노출된다.
+    """
+    from app.services import queue_service
+    from app.services.exceptions import QueueFullError
+
+    now = [1000.0]
+    monkeypatch.setattr(queue_service.time, "monotonic", lambda: now[0])
+    qm = QueueManager(max_depth=2, drain_window=30.0, max_retry_after=60)
+
+    async def _runner():
+        await qm.enqueue("a", ("a.jpg", "a.jpg", "image/jpeg"))
+        await qm.enqueue("b", ("b.jpg", "b.jpg", "image/jpeg"))
+        with pytest.raises(QueueFullError) as exc:
+            await qm.enqueue("c", ("c.jpg", "c.jpg", "image/jpeg"))
+        # nothing drained yet: the hint falls back to the cap
+        assert exc.value.retry_after == 60
+
+        await qm.get()
+        await qm.get()
+        for _ in range(3):
+            qm.note_dequeued()
+        now[0] += 10.0
+        await qm.enqueue("d", ("d.jpg", "d.jpg", "image/jpeg"))
+        await qm.enqueue("e", ("e.jpg", "e.jpg", "image/jpeg"))
+        with pytest.raises(QueueFullError) as exc:
+            qm.admit()
+        assert exc.value.retry_after == 4
+
+    asyncio.run(_runner())
+    stats = qm.stats()
+    assert stats["depth"] == 2 and stats["max_depth"] == 2
+    assert stats["drain_rate"] == pytest.approx(0.5)
+    assert stats["rejected"] == 2 and stats["enqueued"] == 4 and stats["dequeued"] == 5
+
+
+def test_shared_admission_uses_task_table_depth(monkeypatch):
+    """
+    시나리오: `task_backend: "postgres"`에서는 프로세스 내 큐가 비어 있으므로, 공유 `tasks` 테이블의 대기 작업 수로
+    입장 제어를 하고 완료 속도로 재시도 대기 시간을 계산하는지 검증한다.
+
+    절차:
+    1. `max_depth`=3인 `QueueManager`와, 대기 작업 수와 처리율을 돌려주는 가짜 저장소를 주입한다.
+    2. 대기 작업이 2개일 때와 3개일 때 `check_shared_admission`을 호출한다.
+
+    예상 결과: 2개일 때는 통과하고, 3개일 때는 초당 0.5개 처리율로 계산한 6초의 `retry_after`로 거부되며 거부 수가 1이 된다.
+    """
+    from app.services import queue_service
+    from app.services.exceptions import QueueFullError
+
+    class FakeSharedStore:
+        depth = 2
+
+        async def queue_depth(self):
+            return self.depth
+
+        async def drain_rate(self, window_seconds):
+            assert window_seconds == 30.0
+            return 0.5
+
+    store = FakeSharedStore()
+    qm = QueueManager(max_depth=3, drain_window=30.0, max_retry_after=60)
+    monkeypatch.setattr(queue_service, "_default_queue_manager", qm)
+    monkeypatch.setattr(queue_service, "get_default_store", lambda: store)
+
+    async def _runner():
+        await queue_service.check_shared_admission("h")
+        store.depth = 3
+        with pytest.raises(QueueFullError) as exc:
+            await queue_service.check_shared_admission("h")
+        return exc.value.retry_after
+
+    assert asyncio.run(_runner()) == 6
+    assert qm.stats()["rejected"] == 1
+
+
+def test_db_workers_claim_process_and_requeue(tmp_path):
+    """
+    시나리오: `task_backend: "postgres"`의 DB 워커가 공유 작업 저장소에서 작업을 claim해 처리하고,
+    주기적으로 오래된 claim을 되돌리는(requeue_stale) 흐름을 DB 없이 가짜 저장소로 검증한다.
+
+    절차:
+    1. 첫 claim에서 작업 하나(업로드 바이트를 임시 파일로 되살린 `TaskInput`)를 돌려주고 이후에는 빈 목록을 돌려주는 가짜 저장소를 만든다.
+    2. `start_db_workers`로 워커 2개를 짧은 폴링 간격으로 시작한다.
+    3. 처리 함수가 호출될 때까지 기다린 뒤 `stop_db_workers`로 종료한다.
+
+    예상 결과:
+    - 작업은 정확히 한 번 처리되고, 처리 함수가 받은 파일에는 원래 업로드 바이트와 메타가 들어 있다.
+    - 워커 식별자는 `host:pid:index` 형식이다.
+    - 종료 전 `requeue_stale`이 설정한 타임아웃과 재시도 한도로 호출된다.
+    """
+    async def _runner():
+        class FakeStore:
+            channel = ""
+
+            def __init__(self):
+                self.pending = [("t1", b"img-bytes", {"filename": "a.png", "content_type": "image/png", "priority": 3})]
+                self.claimed_by = []
+                self.requeued = []
+
+            async def claim(self, worker_id, limit=1):
+                self.claimed_by.append(worker_id)
+                items, self.pending = self.pending[:limit], self.pending[limit:]
+                return [(tid, write_task_input(tid, blob, meta)) for tid, blob, meta in items]
+
+            async def requeue_stale(self, timeout_seconds, max_retries=3):
+                self.requeued.append((timeout_seconds, max_retries))
+                return 0
+
+        store = FakeStore()
+        seen = []
+        done = asyncio.Event()
+
+        async def proc(task_id, task_input):
+            with open(task_input.tmp_path, "rb") as f:
+                seen.append((task_id, f.read(), task_input.filename, task_input.priority))
+            done.set()
+
+        shutdown = await start_db_workers(2, store, process_fn=proc, poll_interval=0.01, stale_timeout=30.0, max_retries=5)
+        await asyncio.wait_for(done.wait(), timeout=2.0)
+        await asyncio.sleep(0.05)
+        await stop_db_workers(shutdown, timeout=1.0)
+
+        assert seen == [("t1", b"img-bytes", "a.png", 3)]
+        assert store.claimed_by[0].count(":") == 2
+        assert store.requeued and store.requeued[0] == (30.0, 5)
+
+    asyncio.run(_runner())
+
+
+def test_db_worker_writes_are_fenced_by_claim(monkeypatch):
+    """
+    시나리오: 오래 걸려 재할당(requeue)된 작업을 원래 워커가 뒤늦게 끝내도, claim을 잃은 워커의 결과·실패 기록이
+    새 상태를 덮어쓰지 않는지 검증한다.
+
+    절차:
+    1. 가짜 세션으로 `PostgresTaskStore.save_task_result`를 `claimed_by`와 함께 호출하고 실행된 UPDATE 문을 확인한다.
+    2. claim을 잃은(갱신 행 0개) 저장소로 `_process_claimed`를 실행해 성공 결과를 저장하게 한다.
+    3. 같은 저장소로 AI 요청이 실패하는 작업을 처리하게 한다.
+
+    예상 결과:
+    - UPDATE 문의 조건에 `claimed_by`와 `status = 'running'`이 들어가고, 0행이면 False를 돌려준다.
+    - 결과 저장과 실패 기록은 모두 claim한 워커 id로 요청되고, 실패 기록이 거부되면 재시도 횟수는 올리지 않는다.
+    """
+    from app.schemas.task import TaskInput
+    from app.services import queue_service, worker_service
+    from app.services.task.pg_task_store import PostgresTaskStore
+
+    statements = []
+
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def execute(self, stmt):
+            statements.append(stmt)
+            return type("Result", (), {"rowcount": 0})()
+
+        async def commit(self):
+            pass
+
+    pg = PostgresTaskStore(FakeSession, channel="")
+    tid = "2b1f6a3e-8c4d-4f1e-9a7b-5d6c7e8f9a0b"
+    assert asyncio.run(pg.save_task_result(tid, [], claimed_by="node:1:0")) is False
+    where = str(statements[0].whereclause)
+    assert "claimed_by" in where and "tasks.status" in where
+
+    calls, retried = [], []
+
+    class LostClaimStore:
+        async def save_task_result(self, task_id, result, error=None, claimed_by=None):
+            calls.append(("save", task_id, claimed_by))
+            return False
+
+        async def update_task_status(self, task_id, status, *, claimed_by=None, **kwargs):
+            calls.append(("update", task_id, claimed_by))
+            return False
+
+    async def ok_ai(tmp_path, timeout=15.0, top_k=10):
+        return [{"name": "onion"}]
+
+    async def failing_ai(tmp_path, timeout=15.0, top_k=10):
+        raise RuntimeError("model crashed")
+
+    async def record_retry(task_id):
+        retried.append(task_id)
+
+    monkeypatch.setattr(queue_service, "increment_retries", record_retry)
+    task_input = TaskInput("/nonexistent.png", "a.png", "image/png", claimed_by="node:1:0")
+    monkeypatch.setattr(queue_service, "request_ai_analysis", ok_ai)
+    asyncio.run(worker_service._process_claimed(LostClaimStore(), "t1", task_input))
+    monkeypatch.setattr(queue_service, "request_ai_analysis", failing_ai)
+    asyncio.run(worker_service._process_claimed(LostClaimStore(), "t2", task_input))
+
+    assert calls == [("save", "t1", "node:1:0"), ("update", "t2", "node:1:0")]
+    assert retried == []
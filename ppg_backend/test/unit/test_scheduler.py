@@ -0,0 +1,113 @@
+import asyncio
+from app.schemas.task import TaskInput
+from app.services.queue_service import QueueManager
+from app.services.scheduler import FairShareQueue
+from app.services.worker_service import start_workers, stop_workers
+
+
+def _item(task_id, client=None, priority=0, size=0):
+    return (task_id, TaskInput(f"/tmp/{task_id}", None, "image/jpeg", client_id=client, priority=priority, size=size))
+
+
+def _drain(q):
+    return [q.get_nowait()[0] for _ in range(q.qsize())]
+
+
+def test_fair_share_queue_interleaves_clients_by_weight_and_priority():
+    """
+    시나리오: 한 클라이언트가 큐를 가득 채워도 다른 클라이언트가 가중치에 따라 번갈아 처리되고,
+    높은 우선순위 작업과 작은 업로드(SJF)가 먼저 처리되는지 검증한다.
+
+    절차:
+    1. 가중치 {"big": 2}인 `FairShareQueue`에 big 6개, small 2개를 넣고 꺼내는 순서를 확인한다.
+    2. 같은 큐에 우선순위 0 작업 뒤에 우선순위 5 작업을 넣고 순서를 확인한다.
+    3. `shortest_first` 큐에 크기가 다른 한 클라이언트의 작업을 넣고 순서를 확인한다.
+
+    예상 결과: big은 한 차례에 2개, small은 1개씩 번갈아 처리되고, 우선순위 5가 먼저 나오며,
+    SJF 큐는 크기 오름차순(같은 크기는 도착 순)으로 처리한다.
+    """
+    q = FairShareQueue(weights={"big": 2})
+    for i in range(6):
+        q.put_nowait(_item(f"b{i}", "big"))
+    q.put_nowait(_item("s0", "small"))
+    q.put_nowait(_item("s1", "small"))
+    assert q.stats() == {"clients_waiting": 2, "max_client_depth": 6}
+    assert _drain(q) == ["b0", "b1", "s0", "b2", "b3", "s1", "b4", "b5"]
+    assert q.empty()
+
+    q.put_nowait(_item("low", "a"))
+    q.put_nowait(_item("high", "b", priority=5))
+    assert _drain(q) == ["high", "low"]
+
+    sjf = FairShareQueue(shortest_first=True)
+    for task_id, size in [("large", 900), ("small", 10), ("mid", 300), ("small2", 10)]:
+        sjf.put_nowait(_item(task_id, "c", size=size))
+    assert _drain(sjf) == ["small", "small2", "mid", "large"]
+
+
+def test_workers_consume_from_fair_share_queue():
+    """
+    시나리오: `start_workers`/`_worker_loop`가 호출 측 변경 없이 `FairShareQueue`를 감싼 `QueueManager`에서 작업을 소비하는지 검증한다.
+
+    절차:
+    1. `FairShareQueue`로 `QueueManager`를 만들고 두 클라이언트의 작업을 `enqueue`한다.
+    2. 워커 1개를 시작해 처리 순서를 기록하고, 큐가 비면 워커를 종료한다.
+
+    예상 결과: 모든 작업이 처리되고 두 클라이언트가 번갈아 처리되며, 드레인 통계에 반영된다.
+    """
+    qm = QueueManager(queue=FairShareQueue())
+    seen = []
+
+    async def process(task_id, file_tuple):
+        seen.append(task_id)
+
+    async def _runner():
+        for task_id, client in [("a0", "a"), ("a1", "a"), ("a2", "a"), ("b0", "b")]:
+            await qm.enqueue(*_item(task_id, client))
+        shutdown = await start_workers(num_workers=1, qm=qm, process_fn=process)
+        await asyncio.wait_for(qm.ensure().join(), timeout=2.0)
+        await stop_workers(shutdown, qm=qm)
+
+    asyncio.run(_runner())
+    assert seen == ["a0", "b0", "a1", "a2"]
+    assert qm.stats()["dequeued"] == 4
+    assert qm.stats()["scheduler"] == {"clients_waiting": 0, "max_client_depth": 0}
+
+
+def test_per_client_cap_and_untrusted_priority(monkeypatch):
+    """
+    시나리오: 한 클라이언트가 큐를 독점하지 못하도록 클라이언트별 대기 작업 수를 제한하고,
+    `queue_priority_clients`에 없는 클라이언트의 우선순위 요청은 무시되는지 검증한다.
+
+    절차:
+    1. `max_per_client`=2인 `QueueManager`에 클라이언트 a의 작업 2개를 넣고 세 번째를 시도한다.
+    2. 다른 클라이언트 b의 작업을 넣고, a의 작업 하나를 꺼낸 뒤 a의 작업을 다시 넣는다.
+    3. `queue_priority_clients`를 ["trusted"]로 두고 `effective_priority`를 호출한다.
+
+    예상 결과:
+    - a의 세 번째 작업은 `QueueFullError`로 거부되지만 b는 받아들여지고, a는 작업 하나가 빠진 뒤 다시 넣을 수 있다.
+    - trusted의 우선순위는 그대로, 그 밖의 클라이언트는 0으로 처리된다.
+    """
+    import pytest
+    from app.api import analyze
+    from app.services.exceptions import QueueFullError
+
+    qm = QueueManager(queue=FairShareQueue(), max_depth=10, max_per_client=2)
+
+    async def _runner():
+        await qm.enqueue(*_item("a0", "a"))
+        await qm.enqueue(*_item("a1", "a"))
+        with pytest.raises(QueueFullError):
+            await qm.enqueue(*_item("a2", "a"))
+        await qm.enqueue(*_item("b0", "b"))
+        assert await qm.get() == _item("a0", "a")
+        await qm.enqueue(*_item("a3", "a"))
+
+    asyncio.run(_runner())
+    stats = qm.stats()
+    assert stats["rejected"] == 1 and stats["clients_queued"] == 2
+    assert qm.client_depth("a") == 2 and qm.client_depth("b") == 1
+
+    monkeypatch.setattr(analyze, "get_config_option", lambda name, default=None: ["trusted"] if name == "queue_priority_clients" else default)
+    assert analyze.effective_priority("trusted", 9) == 9
+    assert analyze.effective_priority("ip:10.0.0.9", 9) == 0
@@ -159,4 +159,168 @@ def test_validation_errors_and_cleanup_args():
     with pytest.raises(ValueError):
         run(cleanup_tasks(-1))
 
-    reset_default_store()
\ No newline at end of file
+    reset_default_store()
+
+def test_snapshots_are_immutable_and_striped_updates_are_atomic():
+    """
+    시나리오: 상태 조회가 잠금 없이 불변 스냅샷을 돌려주고, 샤드별 잠금으로 보호되는 갱신은
+    여러 스레드에서 동시에 호출해도 유실되지 않는지 검증한다.
+
+    절차:
+    1. 샤드 4개인 스토어에 태스크를 만들고 `get_task`로 스냅샷을 받은 뒤 상태를 갱신한다.
+    2. 이전 스냅샷과 새 스냅샷, `list_tasks` 결과를 비교하고 스냅샷 수정을 시도한다.
+    3. 8개 스레드가 같은 태스크에 `increment_retries`를 각각 200번 호출한다.
+
+    예상 결과:
+    - 이전 스냅샷은 pending 그대로이고 새 스냅샷은 completed이며, `list_tasks`는 같은 스냅샷 객체를 공유한다.
+    - 스냅샷 수정은 TypeError를 일으킨다.
+    - 재시도 횟수는 정확히 1600이다.
+    """
+    import threading
+
+    store = InMemoryTaskStore(shards=4)
+    task_id = run(store.create_task({"filename": "a.png"}))
+    before = run(store.get_task(task_id))
+    assert run(store.save_task_result(task_id, [{"name": "x"}]))
+    after = run(store.get_task(task_id))
+    assert before["status"] == TaskStatus.pending and before["result"] is None
+    assert after["status"] == TaskStatus.completed and after["result"] == [{"name": "x"}]
+    assert run(store.list_tasks())[task_id] is after
+    with pytest.raises(TypeError):
+        after["status"] = TaskStatus.failed
+
+    def bump():
+        for _ in range(200):
+            asyncio.run(store.increment_retries(task_id))
+
+    threads = [threading.Thread(target=bump) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert run(store.get_task(task_id))["retries"] == 1600
+
+
+def test_ttl_expiry_and_caps_evict_finished_tasks_first():
+    """
+    시나리오: 끝난 작업은 TTL이 지나면 힙 순서대로 만료되고, 작업 수·바이트 상한을 넘으면
+    끝난 작업부터 제거되며, 상주 작업 수와 바이트가 통계에 보고되는지 검증한다.
+
+    절차:
+    1. ttl=10, max_age=100인 스토어에 작업 3개를 만들고 2개를 완료/실패 처리한 뒤 시각을 바꿔가며 `expire(now)`를 호출한다.
+    2. max_tasks=3인 스토어에 작업 3개를 만들고 가운데 작업만 완료한 뒤 작업 2개를 더 만든다.
+    3. max_bytes 상한이 작은 스토어에 큰 결과를 저장한다.
+
+    예상 결과:
+    - TTL 전에는 아무것도 만료되지 않고, TTL 후에는 끝난 작업 2개만, max_age 후에는 나머지도 만료된다.
+    - 상한 초과 시 완료된 작업이 먼저, 그다음 가장 오래된 작업이 제거된다.
+    - 바이트 상한을 넘는 결과를 저장하면 먼저 끝난 작업이 제거되고 대기 중인 작업은 남으며, 통계의 bytes는 상한 이하이다.
+    """
+    store = InMemoryTaskStore(ttl=10, max_age=100)
+    a, b, c = (run(store.create_task({"n": i})) for i in range(3))
+    run(store.save_task_result(a, [{"name": "x"}]))
+    run(store.save_task_result(b, None, error="boom"))
+    finished_at = run(store.get_task(a))["updated_at"]
+    assert store.stats()["tasks"] == 3 and store.stats()["finished"] == 2
+    assert store.expire(now=finished_at + 5) == 0
+    assert store.expire(now=finished_at + 11) == 2
+    assert run(store.get_task(a)) is None and run(store.get_task(c)) is not None
+    assert store.expire(now=finished_at + 101) == 1
+    assert store.stats()["tasks"] == 0 and store.stats()["bytes"] == 0 and store.stats()["expired"] == 3
+
+    store = InMemoryTaskStore(max_tasks=3)
+    old, done, new = (run(store.create_task()) for _ in range(3))
+    run(store.save_task_result(done, []))
+    run(store.create_task())
+    assert run(store.get_task(done)) is None and run(store.get_task(old)) is not None
+    run(store.create_task())
+    assert run(store.get_task(old)) is None and run(store.get_task(new)) is not None
+    assert store.stats()["tasks"] == 3 and store.stats()["evicted"] == 2
+
+    store = InMemoryTaskStore(max_bytes=4000)
+    pending = run(store.create_task())
+    small = run(store.create_task())
+    run(store.save_task_result(small, [{"name": "x"}]))
+    big = run(store.create_task())
+    run(store.save_task_result(big, [{"name": "x" * 3000}]))
+    assert run(store.get_task(small)) is None
+    assert run(store.get_task(pending)) is not None and run(store.get_task(big)) is not None
+    assert 0 < store.stats()["bytes"] <= 4000
+
+
+def test_poison_results_are_interned_and_expanded_on_read():
+    """
+    시나리오: 독극물 페이로드(`name`, `image`, `description`) 목록 결과가 공유 페이로드 테이블의 id로 저장되고,
+    `get_task_status`가 응답을 만들 때 원래 형태로 펼쳐지는지 검증한다.
+
+    절차:
+    1. 같은 페이로드를 담은 결과를 두 태스크에 서로 다른 dict 복사본으로 저장한다.
+    2. 두 레코드의 저장 형태(compact_result)와 읽은 결과, `get_task_status` 응답을 비교한다.
+    3. 읽은 결과를 수정한 뒤 다시 읽고, 다른 형태의 결과(`{"name": ...}`만 있는 dict)를 저장한다.
+
+    예상 결과:
+    - 저장 형태는 정수 id 튜플이고 두 태스크가 같은 id를 가리킨다.
+    - 읽은 결과와 응답 data는 저장한 페이로드와 같고, 읽을 때마다 새 dict라 수정이 저장된 값에 영향을 주지 않는다.
+    - 다른 형태의 결과는 그대로 저장된다.
+    """
+    from app.api.analyze import get_task_status
+
+    payload = {"name": "Lily", "image": "https://img/lily.jpg", "description": "Toxic to cats."}
+    store = InMemoryTaskStore()
+    a = run(store.create_task({"filename": "a.png", "content_type": "image/png"}))
+    b = run(store.create_task())
+    run(store.save_task_result(a, [dict(payload)]))
+    run(store.save_task_result(b, [dict(payload)]))
+    rec_a, rec_b = run(store.get_task(a)), run(store.get_task(b))
+    assert isinstance(rec_a.compact_result, tuple) and rec_a.compact_result == rec_b.compact_result
+    assert rec_a["result"] == [payload] and dict(rec_a)["result"] == [payload]
+    rec_a["result"][0]["name"] = "changed"
+    assert rec_a["result"] == [payload]
+    resp = run(get_task_status(a, wait=0, get_task_fn=store.get_task))
+    assert resp.status == TaskStatus.completed and resp.data == [payload]
+
+    other = run(store.create_task())
+    run(store.save_task_result(other, [{"name": "x"}]))
+    assert run(store.get_task(other))["result"] == [{"name": "x"}]
+
+
+def test_wait_for_update_wakes_on_change_and_removal():
+    """
+    시나리오: `wait_for_update`가 해당 작업이 바뀌거나 제거될 때만 깨어나고, 아니면 timeout 뒤 기존 스냅샷을 돌려주는지 검증한다.
+
+    절차:
+    1. 작업을 만들고 변경 없이 0.05초 기다린다.
+    2. 다른 작업을 갱신하는 동안, 그리고 대상 작업의 재시도 횟수를 올리는 동안 기다린다.
+    3. 대상 작업이 만료로 제거되는 동안 기다린다.
+
+    예상 결과:
+    - 변경이 없거나 다른 작업만 바뀌면 timeout 뒤 같은 스냅샷을 돌려준다.
+    - 대상 작업이 바뀌면 timeout(5초) 전에 새 스냅샷을, 제거되면 None을 돌려주고, 남은 대기자는 없다.
+    """
+    async def _runner():
+        store = InMemoryTaskStore(max_age=60)
+        task_id = await store.create_task()
+        other = await store.create_task()
+        seen = await store.get_task(task_id)
+        assert await store.wait_for_update(task_id, seen, 0.05) is seen
+
+        async def touch(coro):
+            await asyncio.sleep(0.05)
+            await coro
+
+        waiter = asyncio.ensure_future(store.wait_for_update(task_id, seen, 0.2))
+        await touch(store.increment_retries(other))
+        assert await waiter is seen
+
+        waiter = asyncio.ensure_future(store.wait_for_update(task_id, seen, 5))
+        await touch(store.increment_retries(task_id))
+        updated = await asyncio.wait_for(waiter, 1)
+        assert updated is not seen and updated["retries"] == 1
+
+        waiter = asyncio.ensure_future(store.wait_for_update(task_id, updated, 5))
+        await asyncio.sleep(0.05)
+        store.expire(now=updated["created_at"] + 61)
+        assert await asyncio.wait_for(waiter, 1) is None
+        assert store.stats()["waiting"] == 0
+
+    run(_runner())
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import numpy as np
+import pytest
+from app.services.exceptions import DBServiceError
+from app.services.vector_search import InProcessVectorBackend
+
+
+def _write_index(path, emb, ids, dtype):
+    emb = emb / np.linalg.norm(emb, axis=1, keepdims=True)
+    np.save(path / "embeddings.npy", emb.astype(dtype))
+    np.save(path / "ids.npy", np.asarray(ids))
+    (path / "meta.json").write_text(json.dumps({"count": emb.shape[0], "dim": emb.shape[1], "dtype": dtype, "normalized": True}))
+    return emb
+
+
+@pytest.mark.parametrize("dtype,tol", [("float32", 1e-5), ("float16", 2e-3)])
+def test_inprocess_search_matches_brute_force(tmp_path, dtype, tol):
+    """
+    시나리오: 메모리 매핑된 인덱스에 대한 블록 단위 top-k 검색이 전체 코사인 유사도 정렬 결과와 일치하는지 검증한다.
+
+    절차:
+    1. 무작위 임베딩 1000개(차원 32)를 정규화해 인덱스 디렉터리에 저장한다.
+    2. 블록 크기 128로 인덱스를 로드하고 질의 5개를 한 번에 `search_batch`로 검색한다.
+    3. numpy 전체 정렬로 계산한 top-10 id, 유사도와 비교한다.
+
+    예상 결과: float32는 id 순서까지 동일하고, float16은 허용 오차 내에서 유사도가 일치한다.
+    """
+    rng = np.random.default_rng(0)
+    emb = _write_index(tmp_path, rng.standard_normal((1000, 32)), [f"r{i}" for i in range(1000)], dtype)
+    queries = rng.standard_normal((5, 32)).astype(np.float32) * 3.0
+    backend = InProcessVectorBackend.load(str(tmp_path), block_rows=128)
+
+    results = asyncio.run(backend.search_batch(queries, top_k=10))
+
+    q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    expected = q @ emb.T
+    for row, result in zip(expected, results):
+        top = np.argsort(-row)[:10]
+        assert len(result) == 10
+        np.testing.assert_allclose([s for _, s in result], row[top], atol=tol)
+        if dtype == "float32":
+            assert [rid for rid, _ in result] == [f"r{i}" for i in top]
+    assert backend.search_sync(queries[0], top_k=2000)[0][0] == results[0][0][0]
+    assert len(backend.search_sync(queries[0], top_k=2000)) == 1000
+
+
+def test_load_rejects_unnormalized_index(tmp_path):
+    """
+    시나리오: 정규화되지 않은 인덱스나 누락된 파일을 로드하면 `DBServiceError`가 발생하는지 검증한다.
+
+    절차:
+    1. 빈 디렉터리를 로드한다.
+    2. meta.json의 `normalized`가 false인 인덱스를 로드한다.
+
+    예상 결과: 두 경우 모두 `DBServiceError`로 보고된다.
+    """
+    with pytest.raises(DBServiceError):
+        InProcessVectorBackend.load(str(tmp_path))
+    _write_index(tmp_path, np.ones((2, 4)), ["a", "b"], "float32")
+    (tmp_path / "meta.json").write_text(json.dumps({"count": 2, "dim": 4, "dtype": "float32", "normalized": False}))
+    with pytest.raises(DBServiceError):
+        InProcessVectorBackend.load(str(tmp_path))
+
+
+def test_two_stage_pca_search_reranks_exactly(tmp_path):
+    """
+    시나리오: PCA 축소 벡터로 후보를 고른 뒤 원래 차원 코사인으로 재정렬하는 2단계 검색을 검증한다.
+
+    절차:
+    1. 저차원 구조(랭크 8)에 잡음을 더한 임베딩 500개(차원 32)를 정규화해 저장하고, 8차원 PCA와 축소 행렬을 함께 기록한다.
+    2. 후보 수 50과 500(전체)으로 각각 인덱스를 로드해 같은 질의를 검색한다.
+
+    예상 결과: 후보가 전체 행이면 완전 탐색과 id·유사도가 (부동소수 오차 내에서) 같고, 후보 50개일 때도 반환 유사도는 정확한 코사인 값이며
+    top-5가 완전 탐색 결과와 일치한다.
+    """
+    rng = np.random.default_rng(1)
+    emb = rng.standard_normal((500, 8)) @ rng.standard_normal((8, 32)) + 0.05 * rng.standard_normal((500, 32))
+    emb = _write_index(tmp_path, emb, [f"r{i}" for i in range(500)], "float32").astype(np.float32)
+    mean = emb.mean(axis=0)
+    components = np.linalg.svd(emb - mean, full_matrices=False)[2][:8].astype(np.float32)
+    np.savez(tmp_path / "pca.npz", mean=mean, components=components)
+    np.save(tmp_path / "reduced.npy", ((emb - mean) @ components.T).astype(np.float32))
+    (tmp_path / "meta.json").write_text(json.dumps({"count": 500, "dim": 32, "dtype": "float32", "normalized": True, "pca_dim": 8}))
+    queries = emb[:4] + 0.05 * rng.standard_normal((4, 32)).astype(np.float32)
+
+    exact = InProcessVectorBackend.load(str(tmp_path), block_rows=64).search_batch_sync(queries, top_k=5)
+    full = InProcessVectorBackend.load(str(tmp_path), block_rows=64, candidates=500)
+    coarse = InProcessVectorBackend.load(str(tmp_path), block_rows=64, candidates=50)
+
+    assert full.two_stage and coarse.two_stage
+    for result, expected in zip(full.search_batch_sync(queries, top_k=5), exact):
+        assert [rid for rid, _ in result] == [rid for rid, _ in expected]
+        np.testing.assert_allclose([s for _, s in result], [s for _, s in expected], atol=1e-5)
+    q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    for query, result, expected in zip(q, coarse.search_batch_sync(queries, top_k=5), exact):
+        assert [rid for rid, _ in result] == [rid for rid, _ in expected]
+        rows = emb[[int(rid[1:]) for rid, _ in result]]
+        np.testing.assert_allclose([s for _, s in result], rows @ query, atol=1e-5)
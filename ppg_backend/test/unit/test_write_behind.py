@@ -0,0 +1,142 @@
+import asyncio
+import time
+import pytest
+from app.schemas.task import TaskStatus
+from app.services.task.write_behind import INTERRUPTED, SQLiteTaskSink, WriteBehindTaskStore
+
+
+def test_write_behind_store_flushes_in_batches_and_reloads(tmp_path):
+    """
+    시나리오: 쓰기 지연(write-behind) 저장소가 갱신을 메모리에서만 처리하고 변경된 작업을 모아 SQLite에 쓰며,
+    재시작 후 완료된 결과를 복원하고 대기 중이던 작업은 실패로 복원하는지 검증한다.
+
+    절차:
+    1. SQLite 싱크를 쓰는 저장소(batch_size 2, 최대 작업 2개)에 실패한 작업을 만들고 flush 전후 파일의 행 수를 확인한다.
+    2. 작업 2개를 더 만들어 실패한 작업이 상한으로 제거되게 하고, 하나는 여러 번 갱신한 뒤 완료한다.
+    3. 다시 flush해 통계를 확인하고 저장소를 닫는다.
+    4. 같은 파일로 새 저장소를 만들어 `load()`한다.
+
+    예상 결과:
+    - flush 전에는 파일에 행이 없고, 한 번의 flush는 작업당 한 행만 쓴다(갱신 여러 번이 한 행으로 합쳐지고, 제거된 작업은 행 삭제).
+    - 새 저장소에는 완료된 작업의 결과가 그대로 있고, 대기 중이던 작업은 `interrupted by restart`로 실패 처리되며 제거된 작업은 없다.
+    - 복원 후 바로 flush하면 실패로 바뀐 작업 한 행만 다시 쓴다.
+    """
+    path = str(tmp_path / "db" / "tasks.sqlite3")
+    payload = [{"name": "Lily", "image": "https://img/lily.jpg", "description": "Toxic to cats."}]
+
+    async def _before_restart():
+        store = WriteBehindTaskStore(SQLiteTaskSink(path), flush_interval=60, batch_size=2, max_tasks=2)
+        gone = await store.create_task()
+        await store.update_task_status(gone, TaskStatus.failed, detail="x")
+        rows_before = len(await store.sink.load())
+        first = await store.flush()
+        rows_after = len(await store.sink.load())
+        done = await store.create_task({"filename": "a.png"})
+        pending = await store.create_task({"filename": "b.png"})  # evicts the finished `gone`
+        await store.update_task_status(done, TaskStatus.running)
+        await store.increment_retries(done)
+        await store.save_task_result(done, payload)
+        written = await store.flush()
+        stats = store.stats()
+        await store.close()
+        return (rows_before, first, rows_after), written, stats, done, pending, gone
+
+    async def _after_restart():
+        store = WriteBehindTaskStore(SQLiteTaskSink(path), flush_interval=60)
+        loaded = await store.load()
+        rewritten = await store.flush()
+        tasks = {tid: dict(t) for tid, t in (await store.list_tasks()).items()}
+        await store.close()
+        return loaded, rewritten, tasks
+
+    rows, written, stats, done, pending, gone = asyncio.run(_before_restart())
+    assert rows == (0, 1, 1)
+    assert written == 3 and stats["flushes"] == 2 and stats["flushed_rows"] == 4 and stats["dirty"] == 0
+
+    loaded, rewritten, tasks = asyncio.run(_after_restart())
+    assert loaded == 2 and set(tasks) == {done, pending}
+    assert tasks[done]["status"] == TaskStatus.completed and tasks[done]["result"] == payload
+    assert tasks[done]["retries"] == 1
+    assert tasks[pending]["status"] == TaskStatus.failed and tasks[pending]["detail"] == INTERRUPTED
+    assert rewritten == 1
+
+
+def test_write_behind_store_keeps_changes_dirty_when_sink_fails():
+    """
+    시나리오: 저장소 쓰기가 실패하면 변경된 작업이 버려지지 않고 다음 flush에서 다시 쓰이는지 검증한다.
+
+    절차:
+    1. 첫 번째 write 호출에서 예외를 내는 싱크로 저장소를 만들고 작업 2개를 만든다.
+    2. flush를 호출해 예외를 확인하고, 다시 flush한다.
+
+    예상 결과: 첫 flush는 예외를 전달하고 통계에 오류가 기록되며, 두 번째 flush가 두 작업을 모두 쓴다.
+    """
+    class FlakySink:
+        def __init__(self):
+            self.calls = 0
+            self.rows = {}
+
+        async def load(self):
+            return []
+
+        async def write(self, upserts, deletes):
+            self.calls += 1
+            if self.calls == 1:
+                raise OSError("disk full")
+            self.rows.update({r["id"]: r for r in upserts})
+
+        async def close(self):
+            pass
+
+    async def _runner():
+        sink = FlakySink()
+        store = WriteBehindTaskStore(sink, flush_interval=60)
+        ids = [await store.create_task(), await store.create_task()]
+        with pytest.raises(OSError):
+            await store.flush()
+        assert store.stats()["flush_errors"] == 1 and store.stats()["dirty"] == 2
+        assert await store.flush() == 2
+        return sink, ids
+
+    sink, ids = asyncio.run(_runner())
+    assert set(sink.rows) == set(ids) and sink.rows[ids[0]]["status"] == "pending"
+
+
+def test_reloaded_finished_tasks_expire_by_ttl(tmp_path):
+    """
+    시나리오: 재시작 후 복원된 완료 작업도 완료 작업 목록과 TTL 만료 일정에 등록되어, 보존 기간이 지나면 제거되는지 검증한다.
+
+    절차:
+    1. TTL 60초 저장소에서 작업 하나를 완료하고 다른 하나는 대기 상태로 둔 채 flush하고 닫는다.
+    2. 같은 파일과 TTL로 새 저장소를 만들어 `load()`하고 통계를 확인한다.
+    3. 30초 뒤, 61초 뒤 시각으로 `expire`를 호출하고 다시 flush한다.
+
+    예상 결과:
+    - 복원된 두 작업(완료, 실패로 바뀐 대기 작업)이 모두 완료 작업으로 집계된다.
+    - 30초 뒤에는 아무것도 제거되지 않고, 61초 뒤에는 두 작업이 제거되며 flush가 두 행을 삭제한다.
+    """
+    path = str(tmp_path / "tasks.sqlite3")
+
+    async def _before_restart():
+        store = WriteBehindTaskStore(SQLiteTaskSink(path), flush_interval=60, ttl=60)
+        done = await store.create_task()
+        await store.save_task_result(done, [])
+        await store.create_task()
+        await store.flush()
+        await store.close()
+
+    async def _after_restart():
+        store = WriteBehindTaskStore(SQLiteTaskSink(path), flush_interval=60, ttl=60)
+        await store.load()
+        await store.flush()
+        finished = store.stats()["finished"]
+        now = time.time()
+        early = store.expire(now + 30)
+        late = store.expire(now + 61)
+        await store.flush()
+        rows = len(await store.sink.load())
+        await store.close()
+        return finished, early, late, rows
+
+    asyncio.run(_before_restart())
+    assert asyncio.run(_after_restart()) == (2, 0, 2, 0)
@@ -0,0 +1,98 @@
+"""Standalone analysis worker for the postgres task backend.
+
+Claims tasks from the shared `tasks` table (``FOR UPDATE SKIP LOCKED``) and
+runs the same analysis pipeline as the API process, so analysis capacity
+can be added on any machine that reaches the database:
+
+    python worker.py --workers 4
+
+Requires ``"task_backend": "postgres"`` in config.json; API processes then
+only enqueue (set `num_workers` to 0 there to keep them inference-free).
+"""
+
+import argparse
+import asyncio
+import logging
+import signal
+import sys
+from typing import List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("ppg.worker")
+
+
+async def run(num_workers: int) -> None:
+    from app.services.ai_service import (
+        load_model,
+        stop_embedding_batcher,
+        inference_mode,
+        start_process_executor,
+        shutdown_process_executor,
+    )
+    from app.services.worker_service import start_db_workers, stop_db_workers
+    from app.services.poison_matcher import start_poison_matcher, stop_poison_matcher
+    from app.services.db_service import poison_lookup, install_vector_search_settings, detect_normalized_embeddings
+    from app.models.db_session import engine, AsyncSessionLocal
+    from app.services.vector_search import get_vector_backend
+    from app.services.queue_service import stop_search_batcher, stop_analysis_pipeline
+    from app.services.task.task_service import set_default_store
+    from app.services.task.pg_task_store import PostgresTaskStore, db_worker_options
+
+    if inference_mode() == "process":
+        start_process_executor()
+    else:
+        load_model()
+    install_vector_search_settings(engine)
+    async with AsyncSessionLocal() as db:
+        await detect_normalized_embeddings(db)
+    get_vector_backend()
+    if poison_lookup() != "index":
+        await start_poison_matcher()
+
+    store = PostgresTaskStore(AsyncSessionLocal)
+    set_default_store(store)
+    shutdown_event = await start_db_workers(num_workers, store, **db_worker_options())
+    logger.info("%d DB worker(s) running; waiting for tasks", num_workers)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    logger.info("Shutting down workers")
+    try:
+        await stop_db_workers(shutdown_event, timeout=30.0)
+    except Exception:
+        logger.exception("Error during worker shutdown")
+    await stop_embedding_batcher()
+    await stop_poison_matcher()
+    await stop_search_batcher()
+    await stop_analysis_pipeline()
+    shutdown_process_executor()
+    await engine.dispose()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from app.services.task.pg_task_store import task_backend
+    from app.services.utils import get_config_option
+
+    parser = argparse.ArgumentParser(description="Pet Poison Guard analysis worker")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="concurrent tasks claimed by this process (default: num_workers from config)",
+    )
+    args = parser.parse_args(argv)
+    if task_backend() != "postgres":
+        logger.error('worker.py requires "task_backend": "postgres" in config.json')
+        return 2
+    num_workers = args.workers if args.workers is not None else int(get_config_option("num_workers", 2))
+    if num_workers < 1:
+        logger.error("--workers must be >= 1")
+        return 2
+    asyncio.run(run(num_workers))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
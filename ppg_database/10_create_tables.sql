@@ -13,6 +13,14 @@ CREATE TABLE rec_embeds (
     embedding vector(1024)
 );
 
+-- 벡터 테이블 적재 정보 (load_tables.py가 기록, 백엔드가 시작 시 읽어 검색 연산자를 결정)
+CREATE TABLE vector_meta (
+    table_name TEXT PRIMARY KEY,
+    normalized BOOLEAN NOT NULL,
+    dim INTEGER,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
 -- 애완동물 중독 정보 테이블 생성
 CREATE TABLE pet_poisons (
     id SERIAL PRIMARY KEY,
@@ -20,4 +28,48 @@ CREATE TABLE pet_poisons (
     alternate_names TEXT[],
     poison_description TEXT,
     desktop_thumb TEXT
-);
\ No newline at end of file
+);
+
+-- 레시피별 첫 번째로 매칭되는 중독 물질 (load_tables.py가 적재 후 생성, --reindex로 재생성)
+CREATE TABLE recipe_poisons (
+    recipe_id TEXT PRIMARY KEY REFERENCES recipe_data(id) ON DELETE CASCADE,
+    poison_id INTEGER NOT NULL REFERENCES pet_poisons(id) ON DELETE CASCADE
+);
+
+-- 분석 작업 저장소 겸 큐 (백엔드 task_backend: "postgres")
+-- 대기 중인 작업은 input_blob에 업로드 이미지를 담고, 워커가 FOR UPDATE SKIP LOCKED로 가져간다.
+CREATE TABLE tasks (
+    id UUID PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',
+    input_meta JSONB,
+    input_blob BYTEA,
+    priority INTEGER NOT NULL DEFAULT 0,
+    result JSONB,
+    detail TEXT,
+    retries INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    claimed_by TEXT,
+    claimed_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- 대기열 조회용 부분 인덱스 (대기 중이면서 입력이 있는 작업만)
+CREATE INDEX idx_tasks_queue ON tasks (priority DESC, created_at)
+    WHERE status = 'pending' AND input_blob IS NOT NULL;
+CREATE INDEX idx_tasks_running ON tasks (claimed_at) WHERE status = 'running';
+-- retention: finished tasks expire by updated_at, any task by created_at
+CREATE INDEX idx_tasks_finished ON tasks (updated_at) WHERE status IN ('completed', 'failed');
+CREATE INDEX idx_tasks_created ON tasks (created_at);
+
+-- pet_poisons 변경 시 백엔드의 메모리 내 매처가 즉시 재적재하도록 알림
+CREATE OR REPLACE FUNCTION notify_pet_poisons_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('pet_poisons_changed', TG_OP);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER pet_poisons_changed
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON pet_poisons
+FOR EACH STATEMENT EXECUTE FUNCTION notify_pet_poisons_changed();
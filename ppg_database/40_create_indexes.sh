@@ -0,0 +1,120 @@
+#!/bin/bash
+set -e
+
+# rec_embeds.embedding 벡터 인덱스를 데이터 적재 후 생성한다.
+# /docker-entrypoint-initdb.d/에서 10_*, 20_* 이후에 실행되며, 수동으로 다시 실행해
+# 인덱스 종류나 빌드 파라미터를 바꿀 수도 있다 (다른 종류의 인덱스는 삭제된다).
+#
+#   VECTOR_INDEX_TYPE          ivfflat | hnsw            (기본값: ivfflat)
+#   VECTOR_INDEX_PRECISION     full | half               (기본값: full)
+#   VECTOR_DIM                 임베딩 차원                (기본값: 1024)
+#   VECTOR_DISTANCE            auto | cosine | ip        (기본값: auto)
+#   IVFFLAT_LISTS              ivfflat lists 수           (기본값: 1000, 대략 rows / 1000)
+#   HNSW_M                     hnsw 노드당 연결 수         (기본값: 16)
+#   HNSW_EF_CONSTRUCTION       hnsw 빌드 시 후보 목록 크기  (기본값: 64)
+#   INDEX_MAINTENANCE_WORK_MEM 빌드용 maintenance_work_mem (기본값: 1GB)
+#
+# half는 embedding::halfvec(VECTOR_DIM) 식(expression) 인덱스를 만든다. 테이블에는 float32
+# 원본이 그대로 남아 최종 top-k를 원래 정밀도로 다시 계산하는 데 쓰이고, 인덱스 크기만
+# 절반으로 줄어 shared_buffers에 더 오래 머문다. 백엔드 config.json의
+# vector_search_precision을 "half"로 맞춰야 이 인덱스가 사용된다.
+#
+# ip는 내적(<#>)용 *_ip_ops 인덱스를 만든다. load_tables.py가 정규화해 적재했다고
+# vector_meta에 기록했으면 auto가 ip를 고른다. 단위 벡터에서는 코사인과 순위가 같고
+# 계산이 더 싸다. 백엔드도 같은 vector_meta를 읽어 연산자를 맞춘다.
+#
+# 질의 시점의 ivfflat.probes / hnsw.ef_search는 백엔드 config.json의
+# vector_search_probes / vector_search_ef_search로 설정한다.
+#
+# CREATE INDEX CONCURRENTLY는 트랜잭션 밖에서 실행되어야 하므로 psql 문장을 하나씩 실행한다.
+
+VECTOR_INDEX_TYPE="${VECTOR_INDEX_TYPE:-ivfflat}"
+IVFFLAT_LISTS="${IVFFLAT_LISTS:-1000}"
+HNSW_M="${HNSW_M:-16}"
+HNSW_EF_CONSTRUCTION="${HNSW_EF_CONSTRUCTION:-64}"
+INDEX_MAINTENANCE_WORK_MEM="${INDEX_MAINTENANCE_WORK_MEM:-1GB}"
+VECTOR_INDEX_PRECISION="${VECTOR_INDEX_PRECISION:-full}"
+VECTOR_DIM="${VECTOR_DIM:-1024}"
+VECTOR_DISTANCE="${VECTOR_DISTANCE:-auto}"
+PSQL="psql -v ON_ERROR_STOP=1 --username ${POSTGRES_USER:-postgres} --dbname ${POSTGRES_DB:-postgres}"
+
+if [ "$VECTOR_DISTANCE" = "auto" ]; then
+    NORMALIZED=$($PSQL -tA -c "SELECT normalized FROM vector_meta WHERE table_name = 'rec_embeds'" 2>/dev/null || true)
+    if [ "$NORMALIZED" = "t" ]; then
+        VECTOR_DISTANCE="ip"
+    else
+        VECTOR_DISTANCE="cosine"
+    fi
+fi
+
+case "$VECTOR_DISTANCE" in
+    cosine)
+        OPS_SUFFIX="cosine_ops"
+        DISTANCE_SUFFIX=""
+        ;;
+    ip)
+        OPS_SUFFIX="ip_ops"
+        DISTANCE_SUFFIX="_ip"
+        ;;
+    *)
+        echo "Unknown VECTOR_DISTANCE: ${VECTOR_DISTANCE} (expected auto, cosine or ip)" >&2
+        exit 1
+        ;;
+esac
+
+case "$VECTOR_INDEX_PRECISION" in
+    full)
+        INDEX_SUFFIX=""
+        INDEX_EXPR="embedding vector_${OPS_SUFFIX}"
+        ;;
+    half)
+        INDEX_SUFFIX="_half"
+        INDEX_EXPR="(embedding::halfvec(${VECTOR_DIM})) halfvec_${OPS_SUFFIX}"
+        ;;
+    *)
+        echo "Unknown VECTOR_INDEX_PRECISION: ${VECTOR_INDEX_PRECISION} (expected full or half)" >&2
+        exit 1
+        ;;
+esac
+
+case "$VECTOR_INDEX_TYPE" in
+    ivfflat)
+        INDEX_OPTIONS="lists = ${IVFFLAT_LISTS}"
+        ;;
+    hnsw)
+        INDEX_OPTIONS="m = ${HNSW_M}, ef_construction = ${HNSW_EF_CONSTRUCTION}"
+        ;;
+    *)
+        echo "Unknown VECTOR_INDEX_TYPE: ${VECTOR_INDEX_TYPE} (expected ivfflat or hnsw)" >&2
+        exit 1
+        ;;
+esac
+
+INDEX_NAME="idx_rec_embeds_embedding_${VECTOR_INDEX_TYPE}${INDEX_SUFFIX}${DISTANCE_SUFFIX}"
+CREATE_INDEX="CREATE INDEX CONCURRENTLY IF NOT EXISTS ${INDEX_NAME}
+    ON rec_embeds USING ${VECTOR_INDEX_TYPE} (${INDEX_EXPR})
+    WITH (${INDEX_OPTIONS});"
+
+# 종류/정밀도/거리가 다른 기존 인덱스는 모두 삭제한다
+DROP_INDEXES=""
+for kind in ivfflat hnsw; do
+    for precision in "" _half; do
+        for distance in "" _ip; do
+            name="idx_rec_embeds_embedding_${kind}${precision}${distance}"
+            if [ "$name" != "$INDEX_NAME" ]; then
+                DROP_INDEXES="${DROP_INDEXES}DROP INDEX CONCURRENTLY IF EXISTS ${name};
+"
+            fi
+        done
+    done
+done
+
+echo "Creating ${VECTOR_INDEX_TYPE} (${VECTOR_INDEX_PRECISION} precision, ${VECTOR_DISTANCE}) index on rec_embeds.embedding..."
+$PSQL <<-EOSQL
+    SET maintenance_work_mem = '${INDEX_MAINTENANCE_WORK_MEM}';
+    ${DROP_INDEXES}
+    ${CREATE_INDEX}
+    RESET maintenance_work_mem;
+    ANALYZE rec_embeds;
+EOSQL
+echo "Index creation completed."
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Export rec_embeds.pkl / rec_ids.pkl as a memory-mappable vector index.
+
+The backend's in-process search (`vector_backend: "inprocess"`) maps the
+output directory:
+
+    embeddings.npy  (N, D) float32 or float16, rows L2-normalized
+    ids.npy         (N,) unicode recipe ids in the same order
+    meta.json       {"count", "dim", "dtype", "normalized", "pca_dim"}
+
+Rows are normalized here so a dot product equals pgvector's cosine
+similarity (1 - <=>).
+
+With --pca-dim a PCA projection is fitted on a sample of the normalized
+rows and two more files are written for the backend's two-stage search
+(coarse search on the reduced rows, exact rerank of the candidates):
+
+    pca.npz         mean (D,), components (pca_dim, D), float32
+    reduced.npy     (N, pca_dim) float32 projections of the rows
+"""
+import argparse
+import json
+import os
+import pickle
+
+import numpy as np
+from tqdm import tqdm
+
+
+def fit_pca(rows: np.ndarray, dim: int):
+    """Return `(mean, components)` of the top-`dim` principal axes of `rows`."""
+    rows = np.asarray(rows, dtype=np.float32)
+    if not 0 < dim < rows.shape[1]:
+        raise ValueError(f"pca dim must be between 1 and {rows.shape[1] - 1}")
+    mean = rows.mean(axis=0)
+    # right singular vectors of the centered sample are the principal axes
+    _, _, vt = np.linalg.svd(rows - mean, full_matrices=False)
+    return mean.astype(np.float32), np.ascontiguousarray(vt[:dim], dtype=np.float32)
+
+
+def export_pca(emb: np.ndarray, out_dir: str, dim: int, sample_rows: int = 100000, chunk_rows: int = 65536, seed: int = 0):
+    """Fit PCA on up to `sample_rows` rows of `emb` and write pca.npz / reduced.npy."""
+    rng = np.random.default_rng(seed)
+    sample = np.sort(rng.choice(emb.shape[0], size=min(sample_rows, emb.shape[0]), replace=False))
+    mean, components = fit_pca(emb[sample], dim)
+    np.savez(os.path.join(out_dir, "pca.npz"), mean=mean, components=components)
+    reduced = np.lib.format.open_memmap(
+        os.path.join(out_dir, "reduced.npy"), mode="w+", dtype=np.float32, shape=(emb.shape[0], dim)
+    )
+    for start in tqdm(range(0, emb.shape[0], chunk_rows)):
+        block = np.asarray(emb[start:start + chunk_rows], dtype=np.float32)
+        reduced[start:start + chunk_rows] = (block - mean) @ components.T
+    reduced.flush()
+    del reduced
+
+
+def export_index(embeds: np.ndarray, ids, out_dir: str, dtype: str = "float32", chunk_rows: int = 65536,
+                 pca_dim: int = 0, pca_sample_rows: int = 100000):
+    embeds = np.asarray(embeds)
+    ids = np.asarray([i.decode() if isinstance(i, bytes) else str(i) for i in ids])
+    if embeds.ndim != 2 or embeds.shape[0] != len(ids):
+        raise ValueError(f"embeddings {embeds.shape} do not match {len(ids)} ids")
+    os.makedirs(out_dir, exist_ok=True)
+    out = np.lib.format.open_memmap(
+        os.path.join(out_dir, "embeddings.npy"), mode="w+", dtype=np.dtype(dtype), shape=embeds.shape
+    )
+    for start in tqdm(range(0, embeds.shape[0], chunk_rows)):
+        block = embeds[start:start + chunk_rows].astype(np.float32)
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        out[start:start + chunk_rows] = block / np.where(norms > 0, norms, 1.0)
+    out.flush()
+    if pca_dim:
+        export_pca(out, out_dir, pca_dim, sample_rows=pca_sample_rows, chunk_rows=chunk_rows)
+    del out
+    np.save(os.path.join(out_dir, "ids.npy"), ids)
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump({
+            "count": int(embeds.shape[0]), "dim": int(embeds.shape[1]), "dtype": dtype, "normalized": True,
+            "pca_dim": int(pca_dim),
+        }, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export recipe embeddings for in-process search")
+    parser.add_argument("--embeds", default="/app/rec_embeds.pkl")
+    parser.add_argument("--ids", default="/app/rec_ids.pkl")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--pca-dim", type=int, default=0,
+                        help="Also write PCA-reduced rows of this dimension for two-stage search (0: off)")
+    parser.add_argument("--pca-sample", type=int, default=100000, help="Rows sampled to fit the PCA")
+    args = parser.parse_args()
+
+    with open(args.embeds, "rb") as f:
+        embeds = pickle.load(f)
+    with open(args.ids, "rb") as f:
+        ids = pickle.load(f)
+    print(f"{args.embeds}: Embedding shape={np.shape(embeds)}")
+    export_index(embeds, ids, args.out, dtype=args.dtype, pca_dim=args.pca_dim, pca_sample_rows=args.pca_sample)
+    pca = f", pca {args.pca_dim}-d" if args.pca_dim else ""
+    print(f"Vector index written to {args.out} ({args.dtype}{pca}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import argparse
 import os
 import pickle
 import numpy as np
@@ -106,11 +107,34 @@ async def insert_petpoison_data_json(json_path: str):
     except Exception as e:
         print(f"Error: {e}")
 
+# Marks rec_embeds as normalized only if every stored row has unit length,
+# so rows left over from an earlier unnormalized load keep it off. The
+# backend reads this row at startup to switch from <=> to <#>.
+RECORD_VECTOR_META_SQL = """
+INSERT INTO vector_meta (table_name, normalized, dim)
+SELECT 'rec_embeds', coalesce(bool_and(abs(vector_norm(embedding) - 1) < 1e-3), false), $1
+FROM rec_embeds
+ON CONFLICT (table_name) DO UPDATE
+SET normalized = EXCLUDED.normalized, dim = EXCLUDED.dim, updated_at = now()
+RETURNING normalized
+"""
+
+def normalize_rows(embeds) -> np.ndarray:
+    """L2-normalize each row (float32); all-zero rows are left as is."""
+    embeds = np.asarray(embeds, dtype=np.float32)
+    norms = np.linalg.norm(embeds, axis=1, keepdims=True)
+    return embeds / np.where(norms > 0, norms, 1.0)
+
 async def insert_recipe_pkl(rec_embeds_path: str, rec_ids_path: str):
+    """Insert recipe embeddings L2-normalized and record that in vector_meta.
+
+    On unit vectors the negative inner product (<#>) ranks exactly like the
+    cosine distance (<=>) and is cheaper, see 40_create_indexes.sh.
+    """
     try:
         with open(rec_embeds_path, 'rb') as f:
-            rec_embeds = pickle.load(f)
-        print(f"{rec_embeds_path}: Embedding shape={rec_embeds.shape}")
+            rec_embeds = normalize_rows(pickle.load(f))
+        print(f"{rec_embeds_path}: Embedding shape={rec_embeds.shape} (normalized)")
         pool = await asyncpg.create_pool(
             host=DB_HOST,
             port=DB_PORT,
@@ -136,16 +160,69 @@ async def insert_recipe_pkl(rec_embeds_path: str, rec_ids_path: str):
         tasks = [insert_entry(idx, rid) for idx, rid in enumerate(rec_ids)]
         for _ in tqdm(asyncio.as_completed(tasks), total=len(tasks)):
             await _
+        async with pool.acquire() as conn:
+            normalized = await conn.fetchval(RECORD_VECTOR_META_SQL, int(rec_embeds.shape[1]))
         await pool.close()
-        print(f"{rec_embeds_path}: Embedding data inserted into DB.")
+        print(f"{rec_embeds_path}: Embedding data inserted into DB (vector_meta normalized={normalized}).")
+    except Exception as e:
+        print(f"Error: {e}")
+
+# Same rule as the backend matcher: the ingredient texts joined with ', ' and
+# lower-cased; a recipe maps to the lowest-id poison whose name or any
+# alternate name is a substring; poisons without a name never match.
+BUILD_RECIPE_POISONS_SQL = """
+INSERT INTO recipe_poisons (recipe_id, poison_id)
+SELECT DISTINCT ON (r.id) r.id, p.id
+FROM recipe_data r
+CROSS JOIN LATERAL (
+    SELECT lower(string_agg(i.elem->>'text', ', ' ORDER BY i.ord)) AS txt
+    FROM jsonb_array_elements(r.data->'ingredients') WITH ORDINALITY AS i(elem, ord)
+) ing
+JOIN pet_poisons p
+  ON p.name <> ''
+ AND (strpos(ing.txt, lower(p.name)) > 0
+      OR EXISTS (SELECT 1 FROM unnest(p.alternate_names) AS a(alt)
+                 WHERE a.alt <> '' AND strpos(ing.txt, lower(a.alt)) > 0))
+ORDER BY r.id, p.id
+"""
+
+async def build_recipe_poisons():
+    """(Re)materialize recipe_poisons from recipe_data and pet_poisons.
+
+    Runs entirely on the server in one transaction, so readers see either the
+    old or the new mapping. Re-run with `--reindex` whenever pet_poisons
+    changes.
+    """
+    try:
+        conn = await asyncpg.connect(
+            host=DB_HOST,
+            port=DB_PORT,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+        )
+        try:
+            async with conn.transaction():
+                await conn.execute("DELETE FROM recipe_poisons")
+                status = await conn.execute(BUILD_RECIPE_POISONS_SQL)
+            await conn.execute("ANALYZE recipe_poisons")
+        finally:
+            await conn.close()
+        print(f"recipe_poisons rebuilt ({status.split()[-1]} recipes with a poison).")
     except Exception as e:
         print(f"Error: {e}")
 
 
 async def main():
-    await insert_recipe_pkl('/app/rec_embeds.pkl', '/app/rec_ids.pkl')
-    await insert_layer_json('/app/layer1.json')
-    await insert_petpoison_data_json('/app/petpoison_data.json')
+    parser = argparse.ArgumentParser(description="Load Pet Poison Guard tables")
+    parser.add_argument("--reindex", action="store_true",
+                        help="Only rebuild recipe_poisons from the already loaded tables")
+    args = parser.parse_args()
+    if not args.reindex:
+        await insert_recipe_pkl('/app/rec_embeds.pkl', '/app/rec_ids.pkl')
+        await insert_layer_json('/app/layer1.json')
+        await insert_petpoison_data_json('/app/petpoison_data.json')
+    await build_recipe_poisons()
 
 if __name__ == "__main__":
     asyncio.run(main())